@@ -0,0 +1,172 @@
+import atexit
+import copy
+import json
+import logging
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+)
+import os
+import queue
+import threading
+import time
+
+from typing import (
+    Dict,
+    Tuple,
+)
+
+# Operator logs are written by a QueueListener thread so that formatting
+# and disk I/O stay off the anchoring and signing threads.
+# Extra structured information is passed to a record with
+# logger.info(msg, extra={'fields': {...}}).
+
+_listeners: Dict[str, QueueListener] = {}
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one json object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log = {
+            "level": record.levelname,
+            "time": self.formatTime(record),
+            "thread": record.threadName,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+        log.update(getattr(record, 'fields', {}))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log["traceback"] = record.exc_text
+        return json.dumps(log, default=str, ensure_ascii=False)
+
+
+class FieldsFormatter(logging.Formatter):
+    """Human readable format, structured fields are appended as json."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        msg = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            msg += " " + json.dumps(fields, default=str, ensure_ascii=False)
+        return msg
+
+
+class SamplingFilter(logging.Filter):
+    """Let through the first of identical warnings (same message, arguments,
+    fields and exception type) every `interval` seconds and count the
+    suppressed ones.
+
+    The number of suppressed records is added to the next record let
+    through as the 'suppressed' field. Warnings not seen for an interval
+    are forgotten, so changing arguments don't grow the filter.
+    """
+
+    def __init__(
+        self,
+        interval: float = 60,
+        level: int = logging.WARNING
+    ) -> None:
+        super().__init__()
+        self.interval = interval
+        self.level = level
+        self._lock = threading.Lock()
+        # (msg, args and fields, exception type) -> (last time let through,
+        # nb suppressed)
+        self._seen: Dict[Tuple[str, str, str], Tuple[float, int]] = {}
+        self._next_prune = 0.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level:
+            return True
+        exc_type = ""
+        if record.exc_info and record.exc_info[0] is not None:
+            exc_type = record.exc_info[0].__qualname__
+        key = (str(record.msg),
+               str(record.args) + str(getattr(record, 'fields', None)),
+               exc_type)
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            last, suppressed = self._seen.get(key, (0.0, 0))
+            if now - last < self.interval:
+                self._seen[key] = (last, suppressed + 1)
+                return False
+            self._seen[key] = (now, 0)
+        if suppressed > 0:
+            fields = dict(getattr(record, 'fields', {}))
+            fields["suppressed"] = suppressed
+            record.fields = fields
+        return True
+
+    def _prune(self, now: float) -> None:
+        # called with self._lock held, suppressed counts are kept one more
+        # interval to be reported if the warning comes back
+        self._seen = {
+            key: (last, suppressed)
+            for key, (last, suppressed) in self._seen.items()
+            if now - last < self.interval
+            or (suppressed > 0 and now - last < 2 * self.interval)
+        }
+        self._next_prune = now + self.interval
+
+
+class StructuredQueueHandler(QueueHandler):
+    """Queue records with their message merged with args but keep the
+    structured fields and traceback separate for the formatters.
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(
+    logger: logging.Logger,
+    log_file_path: str,
+    stream_format: str = '%(message)s',
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    sampling_interval: float = 60,
+) -> None:
+    """Attach a non blocking logging pipeline to logger: records are put
+    in a queue and written by a background thread to a size rotated json
+    log file and to the console.
+    Calling setup_logging again on the same logger has no effect.
+    """
+    with _setup_lock:
+        if logger.name in _listeners:
+            return
+        os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_file_path, maxBytes=max_bytes, backupCount=backup_count)
+        file_handler.setFormatter(JsonFormatter())
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(FieldsFormatter(stream_format))
+
+        log_queue: queue.Queue = queue.Queue(-1)
+        queue_handler = StructuredQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(sampling_interval))
+        listener = QueueListener(
+            log_queue, file_handler, stream_handler,
+            respect_handler_level=True
+        )
+        logger.addHandler(queue_handler)
+        logger.setLevel(logging.INFO)
+        listener.start()
+        # flush remaining records when the process exits
+        atexit.register(listener.stop)
+        _listeners[logger.name] = listener
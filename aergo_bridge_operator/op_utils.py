@@ -1,38 +1,160 @@
+import hashlib
+import threading
+import weakref
+
 from typing import (
+    Dict,
     List,
+    Tuple,
 )
 
 import aergo.herapy as herapy
 
+from aergo_wallet.smt import (
+    audit_path,
+    compute_root,
+    leaf_hash,
+)
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.keys: List[str] = []
+        self.done = threading.Event()
+        self.values: Dict[str, object] = {}
+        self.root = b''
+        self.error = None
+
+
+class StateReader:
+    """ Read contract state variables, coalescing the reads of the same
+    contract made by concurrent threads within window seconds into one
+    query_sc_state call. A read made while no other read is in flight is
+    queried right away.
+
+    Reads without a root are made at the latest state and return the state
+    root they were made at (recomputed from the contract account proof, so
+    it costs no extra query): pass it to the next reads to get a consistent
+    view of the contract.
+    """
+
+    def __init__(self, aergo: herapy.Aergo, window: float = 0.005) -> None:
+        self.aergo = aergo
+        self.window = window
+        self._lock = threading.Lock()
+        # (contract, root) -> batch being collected
+        self._batches: Dict[Tuple[str, bytes], _Batch] = {}
+        # number of reads not returned yet
+        self._in_flight = 0
+
+    def read(
+        self,
+        contract: str,
+        storage_keys: List[str],
+        root: bytes = b'',
+    ) -> Tuple[List, bytes]:
+        """ Return the variable proofs of storage_keys in contract and the
+        state root they were read at.
+        """
+        with self._lock:
+            self._in_flight += 1
+            # wait for other reads to join only when reads are concurrent
+            wait = self.window > 0 and self._in_flight > 1
+            batch = self._batches.get((contract, root))
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._batches[(contract, root)] = batch
+            for key in storage_keys:
+                if key not in batch.keys:
+                    batch.keys.append(key)
+        try:
+            if leader:
+                if wait:
+                    batch.done.wait(self.window)
+                with self._lock:
+                    del self._batches[(contract, root)]
+                self._query(contract, root, batch)
+            batch.done.wait()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        if batch.error is not None:
+            raise batch.error
+        return [batch.values[key] for key in storage_keys], batch.root
+
+    def _query(self, contract: str, root: bytes, batch: _Batch) -> None:
+        try:
+            state = self.aergo.query_sc_state(contract, batch.keys, root=root)
+            batch.values = dict(zip(batch.keys, state.var_proofs))
+            if len(root) == 0:
+                root = _state_root(state.account.state_proof)
+            batch.root = root
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+
+def _state_root(state_proof) -> bytes:
+    """ Return the state root an account proof was made against, or b''
+    if the account doesn't exist.
+    """
+    if not state_proof.inclusion:
+        return b''
+    trie_key = hashlib.sha256(state_proof.key).digest()
+    value_hash = hashlib.sha256(
+        state_proof.state.SerializeToString()).digest()
+    path = audit_path(state_proof.auditPath, state_proof.bitmap,
+                      state_proof.height)
+    return compute_root(trie_key, leaf_hash(trie_key, value_hash, len(path)),
+                        path)
+
+
+_readers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_readers_lock = threading.Lock()
+
+
+def state_reader(aergo: herapy.Aergo) -> StateReader:
+    """ Return the StateReader shared by all the reads made with aergo."""
+    with _readers_lock:
+        reader = _readers.get(aergo)
+        if reader is None:
+            reader = StateReader(aergo)
+            _readers[aergo] = reader
+    return reader
+
+
+def _string(var_proof) -> str:
+    return var_proof.value.decode('utf-8')[1:-1]
+
 
 def query_tempo(
     aergo: herapy.Aergo,
     bridge: str,
     args: List[str]
 ) -> List[int]:
-    result_q = aergo.query_sc_state(bridge, args)
-    result = [int(res.value) for res in result_q.var_proofs]
+    var_proofs, _ = state_reader(aergo).read(bridge, args)
+    result = [int(res.value) for res in var_proofs]
     return result
 
 
 def query_validators(aergo: herapy.Aergo, oracle: str) -> List[str]:
-    nb_validators_q = aergo.query_sc_state(oracle,
-                                           ["_sv__validatorsCount"])
-    nb_validators = int(nb_validators_q.var_proofs[0].value)
+    reader = state_reader(aergo)
+    nb_validators_q, root = reader.read(oracle, ["_sv__validatorsCount"])
+    nb_validators = int(nb_validators_q[0].value)
     args = ["_sv__validators-" + str(i + 1) for i in range(nb_validators)]
-    validators_q = aergo.query_sc_state(oracle, args)
-    validators = [val.value.decode('utf-8')[1:-1]
-                  for val in validators_q.var_proofs]
+    # read the validators at the root of the count
+    validators_q, _ = reader.read(oracle, args, root)
+    validators = [_string(val) for val in validators_q]
     return validators
 
 
 def query_id(aergo: herapy.Aergo, oracle: str) -> str:
-    id_q = aergo.query_sc_state(oracle, ["_sv__contractId"])
-    id = id_q.var_proofs[0].value.decode('utf-8')[1:-1]
-    return id
+    id_q, _ = state_reader(aergo).read(oracle, ["_sv__contractId"])
+    return _string(id_q[0])
 
 
 def query_oracle(aergo: herapy.Aergo, bridge: str) -> str:
-    oracle_q = aergo.query_sc_state(bridge, ["_sv__oracle"])
-    oracle = oracle_q.var_proofs[0].value.decode('utf-8')[1:-1]
-    return oracle
+    oracle_q, _ = state_reader(aergo).read(bridge, ["_sv__oracle"])
+    return _string(oracle_q[0])
@@ -10,9 +10,7 @@ import logging
 from multiprocessing.dummy import (
     Pool,
 )
-import os
 import threading
-import traceback
 import time
 
 from typing import (
@@ -30,6 +28,9 @@ from aergo.herapy.utils.signature import (
 from aergo.herapy.errors.general_exception import (
     GeneralException as HeraException,
 )
+from aergo.herapy.utils.encoding import (
+    decode_address,
+)
 
 from aergo_bridge_operator.bridge_operator_pb2_grpc import (
     BridgeOperatorStub,
@@ -46,28 +47,30 @@ from aergo_bridge_operator.op_utils import (
     query_id,
     query_oracle,
 )
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-file_formatter = logging.Formatter(
-    '{"level": "%(levelname)s", "time": "%(asctime)s", '
-    '"thread": "%(threadName)s", '
-    '"function": "%(funcName)s", "message": %(message)s}'
+from aergo_bridge_operator.log_utils import (
+    setup_logging,
+)
+from aergo_wallet.exceptions import (
+    InvalidMerkleProofError,
+)
+from aergo_wallet.smt import (
+    verify_state_proof,
+)
+from aergo_wallet.proof_cache import (
+    ProofCache,
+)
+from aergo_wallet.metrics import (
+    MetricsRegistry,
+    MetricsServer,
+    default_registry,
+)
+from aergo_wallet.node_provider import (
+    NodeProvider,
+    network_ips,
 )
-stream_formatter = logging.Formatter('%(threadName)s: %(message)s')
-
 
+logger = logging.getLogger(__name__)
 log_file_path = 'logs/proposer.log'
-os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
-file_handler = logging.FileHandler(log_file_path)
-file_handler.setFormatter(file_formatter)
-
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(stream_formatter)
-
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
 
 
 class ValidatorMajorityError(Exception):
@@ -107,9 +110,12 @@ class ProposerClient(threading.Thread):
         anchoring_on: bool = False,
         auto_update: bool = False,
         oracle_update: bool = False,
-        bridge_anchoring: bool = True
+        bridge_anchoring: bool = True,
+        metrics: MetricsRegistry = None,
     ) -> None:
         threading.Thread.__init__(self, name=aergo_to + " proposer")
+        setup_logging(
+            logger, log_file_path, stream_format='%(threadName)s: %(message)s')
         self.config_file_path = config_file_path
         self.config_data = self.load_config_data()
         self.is_from_mainnet = is_from_mainnet
@@ -120,11 +126,20 @@ class ProposerClient(threading.Thread):
         self.aergo_from = aergo_from
         self.aergo_to = aergo_to
 
-        self.hera_from = herapy.Aergo()
-        self.hera_to = herapy.Aergo()
+        # node calls are recorded in metrics (process default registry)
+        self.hera_from = NodeProvider(
+            aergo_from, network_ips(self.config_data['networks'][aergo_from]),
+            metrics
+        )
+        self.hera_to = NodeProvider(
+            aergo_to, network_ips(self.config_data['networks'][aergo_to]),
+            metrics
+        )
 
-        self.hera_from.connect(self.config_data['networks'][aergo_from]['ip'])
-        self.hera_to.connect(self.config_data['networks'][aergo_to]['ip'])
+        self.hera_from.connect()
+        self.hera_to.connect()
+        # finalized roots and bridge proofs reused when an anchor is retried
+        self.proof_cache = ProofCache(aergo_from, max_entries=64)
 
         self.bridge_from = \
             (self.config_data['networks'][aergo_from]['bridges'][aergo_to]
@@ -138,7 +153,7 @@ class ProposerClient(threading.Thread):
         self.oracle_to_id = query_id(self.hera_to, self.oracle_to)
 
         validators = query_validators(self.hera_to, self.oracle_to)
-        logger.info("\"%s Validators: %s\"", self.aergo_to, validators)
+        logger.info("%s Validators: %s", self.aergo_to, validators)
         # create all channels with validators
         self.channels: List[grpc._channel.Channel] = []
         self.stubs: List[BridgeOperatorStub] = []
@@ -164,7 +179,7 @@ class ProposerClient(threading.Thread):
             self.hera_to, self.oracle_to, ["_sv__tAnchor", "_sv__tFinal"]
         )
         logger.info(
-            "\"%s (t_final=%s) -> %s  : t_anchor=%s\"", aergo_from,
+            "%s (t_final=%s) -> %s  : t_anchor=%s", aergo_from,
             self.t_final, aergo_to, self.t_anchor
         )
 
@@ -173,7 +188,7 @@ class ProposerClient(threading.Thread):
             # system
             return
 
-        logger.info("\"Set Sender Account\"")
+        logger.info("Set Sender Account")
         if privkey_name is None:
             privkey_name = 'proposer'
         keystore_path = self.config_data['wallet'][privkey_name]['keystore']
@@ -188,12 +203,12 @@ class ProposerClient(threading.Thread):
                         keystore, privkey_pwd)
                     break
                 except HeraException:
-                    logger.info("\"Wrong password, try again\"")
+                    logger.info("Wrong password, try again")
         else:
             self.hera_to.import_account_from_keystore(keystore, privkey_pwd)
 
         logger.info(
-            "\"%s Proposer Address: %s\"", aergo_to,
+            "%s Proposer Address: %s", aergo_to,
             self.hera_to.account.address
         )
 
@@ -237,27 +252,27 @@ class ProposerClient(threading.Thread):
             approval = getattr(self.stubs[index], rpc_service)(request)
         except grpc.RpcError as e:
             logger.warning(
-                "\"%s on [is_from_mainnet=%s]: Failed to connect to validator "
-                "%s (RpcError: %s)\"",
+                "%s on [is_from_mainnet=%s]: Failed to connect to validator "
+                "%s (RpcError: %s)",
                 rpc_service, request.is_from_mainnet, index, e.code()
             )
             return None
         if approval.error:
             logger.warning(
-                "\"%s on [is_from_mainnet=%s]: %s by validator %s\"",
+                "%s on [is_from_mainnet=%s]: %s by validator %s",
                 rpc_service, request.is_from_mainnet, approval.error, index
             )
             return None
         if approval.address != self.config_data['validators'][index]['addr']:
             # check nothing is wrong with validator address
             logger.warning(
-                "\"Unexpected validator %s address: %s\"", index,
+                "Unexpected validator %s address: %s", index,
                 approval.address
             )
             return None
         # validate signature
         if not verify_sig(h, approval.sig, approval.address):
-            logger.warning("\"Invalid signature from validator %s\"", index)
+            logger.warning("Invalid signature from validator %s", index)
             return None
         return approval
 
@@ -291,7 +306,7 @@ class ProposerClient(threading.Thread):
         wait = (merged_height + self.t_anchor) - lib + 1
         while wait > 0:
             logger.info(
-                "\"\u23F0 waiting new anchor time : %ss ...\"", wait)
+                "\u23F0 waiting new anchor time : %ss ...", wait)
             self.monitor_settings_and_sleep(wait)
             # Wait lib > last merged block height + t_anchor
             lib = self.hera_from.get_status().consensus_info.status['LibNo']
@@ -313,25 +328,25 @@ class ProposerClient(threading.Thread):
         )
         if result.status != herapy.CommitStatus.TX_OK:
             logger.warning(
-                "\"Anchor on aergo Tx commit failed : %s\"", result.json())
+                "Anchor on aergo Tx commit failed : %s", result.json())
             return
 
         result = self.hera_to.wait_tx_result(tx.tx_hash)
         if result is None:
             logger.warning(
-                "\"Transaction not found. Tx hash: %s\"", tx.tx_hash)
+                "Transaction not found. Tx hash: %s", tx.tx_hash)
             return
         if result.status != herapy.TxResultStatus.SUCCESS:
             logger.warning(
-                "\"Anchor failed: already anchored, or invalid "
-                "signature: %s\"", result.json()
+                "Anchor failed: already anchored, or invalid "
+                "signature: %s", result.json()
             )
         else:
             logger.info(
-                "\"\u2693 Anchor success, \u23F0 wait until next anchor "
-                "time: %ss...\"", self.t_anchor
+                "\u2693 Anchor success, \u23F0 wait until next anchor "
+                "time: %ss...", self.t_anchor
             )
-            logger.info("\"\u26fd Aergo gas used: %s\"", result.gas_used)
+            logger.info("\u26fd Aergo gas used: %s", result.gas_used)
 
     def new_state_and_bridge_anchor(
         self,
@@ -351,25 +366,25 @@ class ProposerClient(threading.Thread):
         )
         if result.status != herapy.CommitStatus.TX_OK:
             logger.warning(
-                "\"Anchor on aergo Tx commit failed : %s\"", result.json())
+                "Anchor on aergo Tx commit failed : %s", result.json())
             return
 
         result = self.hera_to.wait_tx_result(tx.tx_hash)
         if result is None:
             logger.warning(
-                "\"Transaction not found. Tx hash: %s\"", tx.tx_hash)
+                "Transaction not found. Tx hash: %s", tx.tx_hash)
             return
         if result.status != herapy.TxResultStatus.SUCCESS:
             logger.warning(
-                "\"Anchor failed: already anchored, or invalid "
-                "signature: %s\"", result.json()
+                "Anchor failed: already anchored, or invalid "
+                "signature: %s", result.json()
             )
         else:
             logger.info(
-                "\"\u2693 Anchor success, \u23F0 wait until next anchor "
-                "time: %ss...\"", self.t_anchor
+                "\u2693 Anchor success, \u23F0 wait until next anchor "
+                "time: %ss...", self.t_anchor
             )
-            logger.info("\"\u26fd Aergo gas used: %s\"", result.gas_used)
+            logger.info("\u26fd Aergo gas used: %s", result.gas_used)
 
     def run(
         self,
@@ -392,8 +407,8 @@ class ProposerClient(threading.Thread):
                 root_from = status.var_proofs[0].value
 
                 logger.info(
-                    "\"Current %s -> %s \u2693 anchor: "
-                    "height: %s, root: %s, nonce: %s\"",
+                    "Current %s -> %s \u2693 anchor: "
+                    "height: %s, root: %s, nonce: %s",
                     self.aergo_from, self.aergo_to, merged_height_from,
                     root_from.decode('utf-8')[1:-1], nonce_to
                 )
@@ -401,26 +416,25 @@ class ProposerClient(threading.Thread):
                 # Wait for the next anchor time
                 next_anchor_height = self.wait_next_anchor(merged_height_from)
                 # Get root of next anchor to broadcast
-                block = self.hera_from.get_block_headers(
-                    block_height=next_anchor_height, list_size=1)
-                root_bytes = block[0].blocks_root_hash
+                root_bytes = self.proof_cache.block_root(
+                    self.hera_from, next_anchor_height)
                 root = "0x" + root_bytes.hex()
                 if len(root_bytes) == 0:
-                    logger.info("\"waiting deployment finalization...\"")
+                    logger.info("waiting deployment finalization...")
                     time.sleep(5)
                     continue
 
                 if not self.anchoring_on and not self.auto_update:
                     logger.info(
-                        "\"Anchoring height reached waiting for anchor...\""
+                        "Anchoring height reached waiting for anchor..."
                     )
                     time.sleep(30)
                     continue
 
                 if self.anchoring_on:
                     logger.info(
-                        "\"\U0001f58b Gathering validator signatures for: "
-                        "root: %s, height: %s'\"", root, next_anchor_height
+                        "\U0001f58b Gathering validator signatures for: "
+                        "root: %s, height: %s", root, next_anchor_height
                     )
 
                     nonce_to = int(
@@ -434,8 +448,8 @@ class ProposerClient(threading.Thread):
                         )
                     except ValidatorMajorityError:
                         logger.warning(
-                            "\"Failed to gather 2/3 validators signatures, "
-                            "\u23F0 waiting for next anchor...\""
+                            "Failed to gather 2/3 validators signatures, "
+                            "\u23F0 waiting for next anchor..."
                         )
                         self.monitor_settings_and_sleep(self.t_anchor)
                         continue
@@ -446,8 +460,8 @@ class ProposerClient(threading.Thread):
                     merged_height = int(last_merge.var_proofs[0].value)
                     if merged_height + self.t_anchor >= next_anchor_height:
                         logger.warning(
-                            "\"Not yet anchor time, maybe another proposer "
-                            "already anchored\""
+                            "Not yet anchor time, maybe another proposer "
+                            "already anchored"
                         )
                         wait = \
                             merged_height + self.t_anchor - next_anchor_height
@@ -474,27 +488,15 @@ class ProposerClient(threading.Thread):
                     time.sleep(self.t_anchor)
 
             except herapy.errors.exception.CommunicationException:
-                logger.warning(
-                    "%s",
-                    {
-                        "Hera CommunicationException":
-                            json.dumps(traceback.format_exc())
-                    }
-                )
+                logger.warning("Hera CommunicationException", exc_info=True)
                 time.sleep(self.t_anchor / 10)
             except TypeError:
                 # This TypeError can be raised when the aergo node is
                 # restarting and lib is None
-                logger.warning(
-                    "%s",
-                    {"LIB == None?": json.dumps(traceback.format_exc())}
-                )
+                logger.warning("LIB == None?", exc_info=True)
                 time.sleep(self.t_anchor / 10)
             except:
-                logger.warning(
-                    "%s",
-                    {"UNKNOWN ERROR": json.dumps(traceback.format_exc())}
-                )
+                logger.warning("UNKNOWN ERROR", exc_info=True)
                 time.sleep(self.t_anchor / 10)
 
     def monitor_settings_and_sleep(self, sleeping_time):
@@ -527,12 +529,12 @@ class ProposerClient(threading.Thread):
                            [self.aergo_from]['t_anchor'])
         if t_anchor != config_t_anchor:
             logger.info(
-                '\"Anchoring periode update requested: %s\"', config_t_anchor)
+                'Anchoring periode update requested: %s', config_t_anchor)
             self.update_t_anchor(config_t_anchor)
         config_t_final = (config_data['networks'][self.aergo_to]['bridges']
                           [self.aergo_from]['t_final'])
         if t_final != config_t_final:
-            logger.info('\"Finality update requested: %s\"', config_t_final)
+            logger.info('Finality update requested: %s', config_t_final)
             self.update_t_final(config_t_final)
         if self.oracle_update:
             validators = query_validators(self.hera_to, self.oracle_to)
@@ -540,7 +542,7 @@ class ProposerClient(threading.Thread):
                 [val['addr'] for val in config_data['validators']]
             if validators != config_validators:
                 logger.info(
-                    '\"Validator set update requested: %s\"',
+                    'Validator set update requested: %s',
                     config_validators
                 )
                 if self.update_validators(config_validators):
@@ -550,7 +552,7 @@ class ProposerClient(threading.Thread):
             config_oracle = (config_data['networks'][self.aergo_to]['bridges']
                              [self.aergo_from]['oracle'])
             if oracle != config_oracle:
-                logger.info('\"Oracle change requested: %s\"', config_oracle)
+                logger.info('Oracle change requested: %s', config_oracle)
                 self.update_oracle(config_oracle)
 
     def update_validator_connections(self):
@@ -575,7 +577,7 @@ class ProposerClient(threading.Thread):
             sigs, validator_indexes = self.get_new_validators_signatures(
                 new_validators)
         except ValidatorMajorityError:
-            logger.warning("\"Failed to gather 2/3 validators signatures\"")
+            logger.warning("Failed to gather 2/3 validators signatures")
             return False
         # broadcast transaction
         return self.set_validators(new_validators, validator_indexes, sigs)
@@ -614,7 +616,7 @@ class ProposerClient(threading.Thread):
         )
         if result.status != herapy.CommitStatus.TX_OK:
             logger.warning(
-                "\"Set new validators Tx commit failed : %s\"",
+                "Set new validators Tx commit failed : %s",
                 result.json()
             )
             return False
@@ -622,16 +624,16 @@ class ProposerClient(threading.Thread):
         result = self.hera_to.wait_tx_result(tx.tx_hash)
         if result is None:
             logger.warning(
-                "\"Transaction not found. Tx hash: %s\"", tx.tx_hash)
+                "Transaction not found. Tx hash: %s", tx.tx_hash)
             return
         if result.status != herapy.TxResultStatus.SUCCESS:
             logger.warning(
-                "\"Set new validators failed : nonce already used, or "
-                "invalid signature: %s\"", result.json()
+                "Set new validators failed : nonce already used, or "
+                "invalid signature: %s", result.json()
             )
             return False
         else:
-            logger.info("\"\U0001f58b New validators update success\"")
+            logger.info("\U0001f58b New validators update success")
         return True
 
     def update_t_anchor(self, t_anchor):
@@ -643,7 +645,7 @@ class ProposerClient(threading.Thread):
             sigs, validator_indexes = self.get_tempo_signatures(
                 t_anchor, "GetTAnchorSignature", "A")
         except ValidatorMajorityError:
-            logger.warning("\"Failed to gather 2/3 validators signatures\"")
+            logger.warning("Failed to gather 2/3 validators signatures")
             return
         # broadcast transaction
         self.set_tempo(t_anchor, validator_indexes, sigs, "tAnchorUpdate")
@@ -657,7 +659,7 @@ class ProposerClient(threading.Thread):
             sigs, validator_indexes = self.get_tempo_signatures(
                 t_final, "GetTFinalSignature", "F")
         except ValidatorMajorityError:
-            logger.warning("\"Failed to gather 2/3 validators signatures\"")
+            logger.warning("Failed to gather 2/3 validators signatures")
             return
         # broadcast transaction
         self.set_tempo(t_final, validator_indexes, sigs, "tFinalUpdate")
@@ -700,7 +702,7 @@ class ProposerClient(threading.Thread):
         )
         if result.status != herapy.CommitStatus.TX_OK:
             logger.warning(
-                "\"Set %s Tx commit failed : %s\"",
+                "Set %s Tx commit failed : %s",
                 contract_function, result.json()
             )
             return False
@@ -708,18 +710,18 @@ class ProposerClient(threading.Thread):
         result = self.hera_to.wait_tx_result(tx.tx_hash)
         if result is None:
             logger.warning(
-                "\"Transaction not found. Tx hash: %s\"", tx.tx_hash)
+                "Transaction not found. Tx hash: %s", tx.tx_hash)
             return False
         if result.status != herapy.TxResultStatus.SUCCESS:
             logger.warning(
-                "\"Set %s failed: nonce already used, or invalid "
-                "signature: %s\"",
+                "Set %s failed: nonce already used, or invalid "
+                "signature: %s",
                 contract_function, result.json()
             )
             return False
         else:
             logger.info(
-                "\"\u231B %s success\"", contract_function)
+                "\u231B %s success", contract_function)
         return True
 
     def update_oracle(self, oracle):
@@ -731,7 +733,7 @@ class ProposerClient(threading.Thread):
             sigs, validator_indexes = \
                 self.get_new_oracle_signatures(oracle)
         except ValidatorMajorityError:
-            logger.warning("\"Failed to gather 2/3 validators signatures\"")
+            logger.warning("Failed to gather 2/3 validators signatures")
             return
         # broadcast transaction
         self.set_oracle(oracle, validator_indexes, sigs)
@@ -768,7 +770,7 @@ class ProposerClient(threading.Thread):
         )
         if result.status != herapy.CommitStatus.TX_OK:
             logger.warning(
-                "\"Set new oracle Tx commit failed : %s\"",
+                "Set new oracle Tx commit failed : %s",
                 result.json()
             )
             return False
@@ -776,16 +778,16 @@ class ProposerClient(threading.Thread):
         result = self.hera_to.wait_tx_result(tx.tx_hash)
         if result is None:
             logger.warning(
-                "\"Transaction not found. Tx hash: %s\"", tx.tx_hash)
+                "Transaction not found. Tx hash: %s", tx.tx_hash)
             return
         if result.status != herapy.TxResultStatus.SUCCESS:
             logger.warning(
-                "\"Set new oracle failed : nonce already used, or "
-                "invalid signature: %s\"", result.json()
+                "Set new oracle failed : nonce already used, or "
+                "invalid signature: %s", result.json()
             )
             return False
         else:
-            logger.info("\"\U0001f58b New oracle update success\"")
+            logger.info("\U0001f58b New oracle update success")
         return True
 
     def buildBridgeAnchorArgs(
@@ -795,10 +797,19 @@ class ProposerClient(threading.Thread):
         """Build arguments to derive bridge storage root from the anchored
         state root with a merkle proof
         """
-        state = self.hera_from.get_account(
-            address=self.bridge_from, proof=True, root=root, compressed=False)
+        state = self.proof_cache.get_account(
+            self.hera_from, self.bridge_from, root, compressed=False)
+        proto_bytes = state.state_proof.state.SerializeToString()
+        # check the proof like the oracle contract will before paying for
+        # the anchor tx
+        trie_key = hashlib.sha256(decode_address(self.bridge_from)).digest()
+        if not verify_state_proof(root, trie_key, proto_bytes,
+                                  state.state_proof.auditPath):
+            raise InvalidMerkleProofError(
+                "Unable to verify bridge state proof at root {}"
+                .format(root.hex()))
         merkle_proof = [node.hex() for node in state.state_proof.auditPath]
-        proto = "0x" + state.state_proof.state.SerializeToString().hex()
+        proto = "0x" + proto_bytes.hex()
         return proto, merkle_proof
 
     def load_config_data(self) -> Dict:
@@ -807,7 +818,7 @@ class ProposerClient(threading.Thread):
         return config_data
 
     def shutdown(self):
-        logger.info("\"Shutting down %s proposer\"", self.aergo_to)
+        logger.info("Shutting down %s proposer", self.aergo_to)
         self.hera_from.disconnect()
         self.hera_to.disconnect()
         for channel in self.channels:
@@ -828,20 +839,31 @@ class BridgeProposerClient:
         anchoring_on: bool = False,
         auto_update: bool = False,
         oracle_update: bool = False,
-        bridge_anchoring: bool = True
+        bridge_anchoring: bool = True,
+        metrics_port: int = None,
     ) -> None:
+        """ If metrics_port is set, the node calls of both proposers are
+        served over http on /metrics (prometheus text format) and
+        /metrics.json.
+        """
+        self.metrics = default_registry
         self.t_proposer1 = ProposerClient(
             config_file_path, aergo_sidechain, aergo_mainnet, False,
             privkey_name, privkey_pwd, anchoring_on, auto_update,
-            oracle_update, bridge_anchoring
+            oracle_update, bridge_anchoring, self.metrics
         )
         self.t_proposer2 = ProposerClient(
             config_file_path, aergo_mainnet, aergo_sidechain, True,
             privkey_name, privkey_pwd, anchoring_on, auto_update,
-            oracle_update, bridge_anchoring
+            oracle_update, bridge_anchoring, self.metrics
         )
+        self.metrics_server = None
+        if metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metrics, metrics_port)
 
     def run(self):
+        if self.metrics_server is not None:
+            self.metrics_server.start()
         self.t_proposer1.start()
         self.t_proposer2.start()
 
@@ -884,6 +906,10 @@ if __name__ == '__main__':
         help='Update bridge contract when validators or oracle addr '
              'change in config file'
     )
+    parser.add_argument(
+        '--metrics_port', type=int, required=False,
+        help='Serve proposer metrics over http on this port'
+    )
 
     args = parser.parse_args()
 
@@ -893,6 +919,7 @@ if __name__ == '__main__':
         privkey_pwd=args.privkey_pwd,
         anchoring_on=args.anchoring_on,
         auto_update=args.auto_update,
-        oracle_update=args.oracle_update
+        oracle_update=args.oracle_update,
+        metrics_port=args.metrics_port
     )
     proposer.run()
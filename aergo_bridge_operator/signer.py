@@ -0,0 +1,153 @@
+from concurrent.futures import (
+    Future,
+)
+import itertools
+import multiprocessing
+import queue
+import threading
+
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+from aergo.herapy.account import (
+    Account,
+)
+from aergo.herapy.errors.general_exception import (
+    GeneralException as HeraException,
+)
+
+# maximum number of hashes signed before results are sent back
+_MAX_BATCH_SIZE = 64
+# keystore decryption is slow by design (scrypt)
+_STARTUP_TIMEOUT = 120
+
+
+def _signing_process(
+    keystore: str,
+    password: str,
+    requests: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    max_batch_size: int,
+) -> None:
+    """ Runs in the worker process: decrypt the key and sign hashes until
+    None is received. Requests that are already queued are drained and
+    signed together so results cross the process boundary in batches.
+    """
+    try:
+        account = Account.decrypt_from_keystore(keystore, password)
+    except HeraException as e:
+        results.put(("error", e.error_msg))
+        return
+    except Exception as e:
+        results.put(("error", str(e)))
+        return
+    del password
+    results.put(("ready", str(account.address)))
+    private_key = account.private_key
+    stop = False
+    while not stop:
+        batch = [requests.get()]
+        while len(batch) < max_batch_size:
+            try:
+                batch.append(requests.get_nowait())
+            except queue.Empty:
+                break
+        signed: List[Tuple[int, bytes, str]] = []
+        for item in batch:
+            if item is None:
+                stop = True
+                continue
+            request_id, h = item
+            try:
+                signed.append((request_id, private_key.sign_msg(h), None))
+            except Exception as e:
+                signed.append((request_id, None, str(e)))
+        if len(signed) > 0:
+            results.put(("signed", signed))
+
+
+class SigningWorker:
+    """ Holds the validator private key in a dedicated process.
+
+    Hashes are sent to the worker through a multiprocessing queue and
+    signatures are returned as futures resolved by a dispatcher thread,
+    so signing doesn't hold the GIL of the grpc request handlers and the
+    decrypted key never lives in the server process.
+    """
+
+    def __init__(
+        self,
+        keystore: str,
+        password: str,
+        max_batch_size: int = _MAX_BATCH_SIZE,
+    ) -> None:
+        """ Start the worker and wait for it to decrypt the keystore.
+        Raises a herapy GeneralException if the password is wrong.
+        """
+        # spawn: don't fork a process holding grpc threads
+        ctx = multiprocessing.get_context('spawn')
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._process = ctx.Process(
+            target=_signing_process,
+            args=(keystore, password, self._requests, self._results,
+                  max_batch_size),
+            name="signing worker", daemon=True
+        )
+        self._process.start()
+        try:
+            status, value = self._results.get(timeout=_STARTUP_TIMEOUT)
+        except queue.Empty:
+            self._process.terminate()
+            raise HeraException("Signing worker failed to start")
+        if status == "error":
+            self._process.join()
+            raise HeraException(value)
+        self.address = value
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="signing dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self) -> None:
+        """ Resolve the futures of signed hashes."""
+        while True:
+            status, value = self._results.get()
+            if status == "stopped":
+                break
+            for request_id, sig, err in value:
+                with self._lock:
+                    future = self._pending.pop(request_id)
+                if err is not None:
+                    future.set_exception(HeraException(err))
+                else:
+                    future.set_result(sig)
+
+    def submit(self, h: bytes) -> Future:
+        """ Queue a hash for signing and return a future of the signature."""
+        future: Future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        self._requests.put((request_id, h))
+        return future
+
+    def sign(self, h: bytes, timeout: float = 10) -> bytes:
+        return self.submit(h).result(timeout)
+
+    def shutdown(self) -> None:
+        """ Stop the worker process after pending hashes are signed."""
+        self._requests.put(None)
+        self._process.join()
+        self._results.put(("stopped", None))
+        self._dispatcher.join()
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            future.set_exception(HeraException("Signing worker stopped"))
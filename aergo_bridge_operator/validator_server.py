@@ -1,9 +1,13 @@
 import argparse
+from collections import (
+    OrderedDict,
+)
 from concurrent import (
     futures,
 )
 from functools import (
     partial,
+    wraps,
 )
 from getpass import getpass
 import grpc
@@ -13,7 +17,7 @@ import logging
 from multiprocessing.dummy import (
     Pool,
 )
-import os
+import threading
 import time
 
 from typing import (
@@ -39,35 +43,72 @@ from aergo_bridge_operator.op_utils import (
     query_id,
     query_oracle,
 )
+from aergo_wallet.metrics import (
+    MetricsRegistry,
+    MetricsServer,
+)
+from aergo_wallet.node_provider import (
+    NodeProvider,
+    network_ips,
+)
+from aergo_bridge_operator.log_utils import (
+    setup_logging,
+)
+from aergo_bridge_operator.signer import (
+    SigningWorker,
+)
 
 _ONE_DAY_IN_SECONDS = 60 * 60 * 24
+# number of finalized block roots kept in memory
+_ROOT_CACHE_SIZE = 128
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-file_formatter = logging.Formatter(
-    '{"level": "%(levelname)s", "time": "%(asctime)s", '
-    '"service": "%(funcName)s", "message": %(message)s}'
-)
-stream_formatter = logging.Formatter('%(message)s')
-
-
 log_file_path = 'logs/validator.log'
-os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
-file_handler = logging.FileHandler(log_file_path)
-file_handler.setFormatter(file_formatter)
 
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(stream_formatter)
 
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+def _describe_metrics(metrics: MetricsRegistry) -> None:
+    metrics.describe(
+        "validator_rpc_requests_total",
+        "Number of rpc requests by rpc and outcome (approved, rejected, error)"
+    )
+    metrics.describe(
+        "validator_rpc_latency_seconds", "Latency of rpc requests")
+    metrics.describe(
+        "validator_node_call_latency_seconds",
+        "Latency of aergo node calls made while validating an anchor"
+    )
+    metrics.describe(
+        "validator_rejections_total",
+        "Number of rejected requests by message type and reason"
+    )
+    metrics.describe(
+        "validator_cache_requests_total",
+        "Lookups in the finalized block root cache by result (hit, miss)"
+    )
+    metrics.describe(
+        "validator_signing_seconds", "Time taken to sign an approval")
+
 
-log_template = \
-    '{\"val_index\": %s, \"signed\": %s, \"type\": \"%s\", '\
-    '\"destination\": \"%s\"'
-success_log_template = log_template + ', \"value\": %s, \"nonce\": %s}'
-error_log_template = log_template + ', \"error\": \"%s\"}'
+def _rpc_metrics(rpc):
+    """Record the count and latency of a ValidatorService rpc."""
+    @wraps(rpc)
+    def wrapper(self, request, context):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            approval = rpc(self, request, context)
+            status = "rejected" if approval.error else "approved"
+            return approval
+        finally:
+            self.metrics.observe(
+                "validator_rpc_latency_seconds", time.perf_counter() - start,
+                rpc=rpc.__name__
+            )
+            self.metrics.inc(
+                "validator_rpc_requests_total", rpc=rpc.__name__,
+                status=status
+            )
+    return wrapper
 
 
 class ValidatorService(BridgeOperatorServicer):
@@ -84,23 +125,35 @@ class ValidatorService(BridgeOperatorServicer):
         anchoring_on: bool = False,
         auto_update: bool = False,
         oracle_update: bool = False,
+        metrics: MetricsRegistry = None,
     ) -> None:
         """
         aergo1 is considered to be the mainnet side of the bridge.
         Proposers should set anchor.is_from_mainnet accordingly
         """
+        setup_logging(logger, log_file_path)
+        if metrics is None:
+            metrics = MetricsRegistry()
+        self.metrics = metrics
+        _describe_metrics(metrics)
+        # finalized block roots never change: (id(aergo_from), height) -> root
+        self.root_cache: OrderedDict = OrderedDict()
+        # rpcs are served by a thread pool
+        self._root_cache_lock = threading.Lock()
         self.config_file_path = config_file_path
         config_data = self.load_config_data()
         self.aergo1 = aergo1
         self.aergo2 = aergo2
-        self.hera1 = herapy.Aergo()
-        self.hera2 = herapy.Aergo()
+        self.hera1 = NodeProvider(
+            aergo1, network_ips(config_data['networks'][aergo1]), metrics)
+        self.hera2 = NodeProvider(
+            aergo2, network_ips(config_data['networks'][aergo2]), metrics)
         self.anchoring_on = anchoring_on
         self.auto_update = auto_update
         self.oracle_update = oracle_update
 
-        self.hera1.connect(config_data['networks'][aergo1]['ip'])
-        self.hera2.connect(config_data['networks'][aergo2]['ip'])
+        self.hera1.connect()
+        self.hera2.connect()
 
         self.validator_index = validator_index
         self.bridge1 = \
@@ -119,7 +172,7 @@ class ValidatorService(BridgeOperatorServicer):
         validators2 = query_validators(self.hera2, self.oracle2)
         assert validators1 == validators2, \
             "Validators should be the same on both sides of bridge"
-        logger.info("\"Bridge validators : %s\"", validators1)
+        logger.info("Bridge validators : %s", validators1)
 
         # get the current t_anchor and t_final for both sides of bridge
         t_anchor1, t_final1 = query_tempo(
@@ -129,39 +182,39 @@ class ValidatorService(BridgeOperatorServicer):
             self.hera2, self.oracle2, ["_sv__tAnchor", "_sv__tFinal"]
         )
         logger.info(
-            "\"%s <- %s (t_final=%s) : t_anchor=%s\"", aergo1, aergo2,
+            "%s <- %s (t_final=%s) : t_anchor=%s", aergo1, aergo2,
             t_final1, t_anchor1
         )
         logger.info(
-            "\"%s (t_final=%s) -> %s : t_anchor=%s\"", aergo1, t_final2,
+            "%s (t_final=%s) -> %s : t_anchor=%s", aergo1, t_final2,
             aergo2, t_anchor2
         )
         if auto_update:
             logger.warning(
-                "\"WARNING: This validator will vote for settings update in "
-                "config.json\""
+                "WARNING: This validator will vote for settings update in "
+                "config.json"
             )
             if len(validators1) != len(validators2):
                 logger.warning(
-                    "\"WARNING: different number of validators on both sides "
-                    "of the bridge\""
+                    "WARNING: different number of validators on both sides "
+                    "of the bridge"
                 )
             if len(config_data['validators']) != len(validators1):
                 logger.warning(
-                    "\"WARNING: This validator is voting for a new set of %s "
-                    "validators\"", aergo1
+                    "WARNING: This validator is voting for a new set of %s "
+                    "validators", aergo1
                 )
             if len(config_data['validators']) != len(validators2):
                 logger.warning(
-                    "\"WARNING: This validator is voting for a new set of %s "
-                    "validators\"", aergo2
+                    "WARNING: This validator is voting for a new set of %s "
+                    "validators", aergo2
                 )
             for i, validator in enumerate(config_data['validators']):
                 try:
                     if validator['addr'] != validators1[i]:
                         logger.warning(
-                            "\"WARNING: This validator is voting for a new set"
-                            " of %s validators\"", aergo1
+                            "WARNING: This validator is voting for a new set"
+                            " of %s validators", aergo1
                         )
                 except IndexError:
                     # new validators index larger than current validators
@@ -169,8 +222,8 @@ class ValidatorService(BridgeOperatorServicer):
                 try:
                     if validator['addr'] != validators2[i]:
                         logger.warning(
-                            "\"WARNING: This validator is voting for a new set"
-                            " of %s validators\"", aergo2
+                            "WARNING: This validator is voting for a new set"
+                            " of %s validators", aergo2
                         )
                 except IndexError:
                     # new validators index larger than current validators
@@ -186,23 +239,23 @@ class ValidatorService(BridgeOperatorServicer):
                           [aergo1]['t_final'])
             if t_anchor1_c != t_anchor1:
                 logger.warning(
-                    "\"WARNING: This validator is voting to update anchoring"
-                    " periode of %s on %s\"", aergo2, aergo1
+                    "WARNING: This validator is voting to update anchoring"
+                    " periode of %s on %s", aergo2, aergo1
                 )
             if t_final1_c != t_final1:
                 logger.warning(
-                    "\"WARNING: This validator is voting to update finality "
-                    " of %s on %s\"", aergo2, aergo1
+                    "WARNING: This validator is voting to update finality "
+                    " of %s on %s", aergo2, aergo1
                 )
             if t_anchor2_c != t_anchor2:
                 logger.warning(
-                    "\"WARNING: This validator is voting to update anchoring"
-                    " periode of %s on %s\"", aergo1, aergo2
+                    "WARNING: This validator is voting to update anchoring"
+                    " periode of %s on %s", aergo1, aergo2
                 )
             if t_final2_c != t_final2:
                 logger.warning(
-                    "\"WARNING: This validator is voting to update finality "
-                    " of %s on %s\"", aergo1, aergo2
+                    "WARNING: This validator is voting to update finality "
+                    " of %s on %s", aergo1, aergo2
                 )
 
         if privkey_name is None:
@@ -210,29 +263,28 @@ class ValidatorService(BridgeOperatorServicer):
         keystore_path = config_data['wallet'][privkey_name]['keystore']
         with open(keystore_path, "r") as f:
             keystore = f.read()
+        # the private key is only decrypted inside the signing process
         if privkey_pwd is None:
             while True:
                 try:
                     privkey_pwd = getpass("Decrypt exported private key '{}'\n"
                                           "Password: ".format(privkey_name))
-                    self.hera1.import_account_from_keystore(
-                        keystore, privkey_pwd)
-                    self.hera2.import_account_from_keystore(
-                        keystore, privkey_pwd)
+                    self.signer = SigningWorker(keystore, privkey_pwd)
                     break
                 except HeraException:
-                    logger.info("\"Wrong password, try again\"")
+                    logger.info("Wrong password, try again")
         else:
-            self.hera1.import_account_from_keystore(keystore, privkey_pwd)
-            self.hera2.import_account_from_keystore(keystore, privkey_pwd)
-        self.address = str(self.hera1.account.address)
-        logger.info("\"Validator Address: %s\"", self.address)
+            self.signer = SigningWorker(keystore, privkey_pwd)
+        self.address = self.signer.address
+        logger.info("Validator Address: %s", self.address)
 
+    @_rpc_metrics
     def GetAnchorSignature(self, anchor, context):
         """ Verifies the anchors are valid and signes them
             aergo1 and aergo2 must be trusted.
         """
         if not self.anchoring_on:
+            self.count_rejection("anchor", "disabled")
             return Approval(error="Anchoring not enabled")
         destination = ""
         bridge_id = ""
@@ -248,10 +300,7 @@ class ValidatorService(BridgeOperatorServicer):
             destination = self.aergo1
             bridge_id = self.id1
         if err_msg is not None:
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\u2693 anchor", destination, err_msg
-            )
+            self.log_rejection("\u2693 anchor", destination, err_msg)
             return Approval(error=err_msg)
 
         # sign anchor and return approval
@@ -260,13 +309,11 @@ class ValidatorService(BridgeOperatorServicer):
             + str(anchor.destination_nonce) + bridge_id + "R", 'utf-8'
         )
         h = hashlib.sha256(msg).digest()
-        sig = self.hera1.account.private_key.sign_msg(h)
+        sig = self.sign(h, "anchor")
         approval = Approval(address=self.address, sig=sig)
-        logger.info(
-            success_log_template, self.validator_index, "true",
+        self.log_approval(
             "\u2693 anchor", destination,
-            "{{\"root\": \"0x{}\", \"height\": {}}}"
-            .format(anchor.root, anchor.height),
+            {"root": "0x" + anchor.root, "height": anchor.height},
             anchor.destination_nonce
         )
         return approval
@@ -286,48 +333,122 @@ class ValidatorService(BridgeOperatorServicer):
         """
         # 1- get the last block height and check anchor height > LIB
         # lib = best_height - finalized_from
-        lib = aergo_from.get_status().consensus_info.status['LibNo']
+        with self.metrics.timer("validator_node_call_latency_seconds",
+                                call="get_status"):
+            lib = aergo_from.get_status().consensus_info.status['LibNo']
         if anchor.height > lib:
+            self.count_rejection("anchor", "not_final")
             return ("anchor height not finalized, got: {}, expected: {}"
                     .format(anchor.height, lib))
 
         # 2- get blocks state root at origin_height
         # and check equals anchor root
-        block = aergo_from.get_block_headers(
-            block_height=int(anchor.height), list_size=1)
-        root = block[0].blocks_root_hash.hex()
+        root = self.get_finalized_root(aergo_from, int(anchor.height))
         if root != anchor.root:
+            self.count_rejection("anchor", "root_mismatch")
             return ("root doesn't match height {}, got: {}, expected: {}"
                     .format(lib, anchor.root, root))
 
         # 3-4 setup
-        status = aergo_to.query_sc_state(
-            oracle_to, ["_sv__anchorHeight", "_sv__tAnchor", "_sv__nonce"])
+        with self.metrics.timer("validator_node_call_latency_seconds",
+                                call="query_sc_state"):
+            status = aergo_to.query_sc_state(
+                oracle_to,
+                ["_sv__anchorHeight", "_sv__tAnchor", "_sv__nonce"]
+            )
         last_merged_height_from, t_anchor, last_nonce_to = \
             [int(proof.value) for proof in status.var_proofs]
         # 3- check merkle bridge nonces are correct
         if last_nonce_to != anchor.destination_nonce:
+            self.count_rejection("anchor", "nonce")
             return ("anchor nonce invalid, got: {}, expected: {}"
                     .format(anchor.destination_nonce, last_nonce_to))
 
         # 4- check anchored height comes after the previous one and t_anchor is
         # passed
         if last_merged_height_from + t_anchor > anchor.height:
+            self.count_rejection("anchor", "too_soon")
             return ("anchor height too soon, got: {}, expected: {}"
                     .format(anchor.height, last_merged_height_from + t_anchor))
         return None
 
+    def get_finalized_root(self, aergo_from: herapy.Aergo, height: int) -> str:
+        """ Get the blocks state root of a finalized height, from cache if
+        the same height was already validated.
+        """
+        key = (id(aergo_from), height)
+        with self._root_cache_lock:
+            root = self.root_cache.get(key)
+            if root is not None:
+                self.root_cache.move_to_end(key)
+        if root is not None:
+            self.metrics.inc("validator_cache_requests_total", result="hit")
+            return root
+        self.metrics.inc("validator_cache_requests_total", result="miss")
+        with self.metrics.timer("validator_node_call_latency_seconds",
+                                call="get_block_headers"):
+            block = aergo_from.get_block_headers(
+                block_height=height, list_size=1)
+        root = block[0].blocks_root_hash.hex()
+        # concurrent rpcs may insert the same root, that is harmless
+        with self._root_cache_lock:
+            self.root_cache[key] = root
+            while len(self.root_cache) > _ROOT_CACHE_SIZE:
+                self.root_cache.popitem(last=False)
+        return root
+
+    def log_approval(
+        self,
+        msg_type: str,
+        destination: str,
+        value,
+        nonce: int
+    ) -> None:
+        logger.info(
+            "%s signed", msg_type,
+            extra={'fields': {
+                "val_index": self.validator_index, "signed": True,
+                "type": msg_type, "destination": destination,
+                "value": value, "nonce": nonce
+            }}
+        )
+
+    def log_rejection(
+        self,
+        msg_type: str,
+        destination: str,
+        err_msg: str
+    ) -> None:
+        logger.warning(
+            "%s rejected", msg_type,
+            extra={'fields': {
+                "val_index": self.validator_index, "signed": False,
+                "type": msg_type, "destination": destination,
+                "error": err_msg
+            }}
+        )
+
+    def count_rejection(self, msg_type: str, reason: str) -> None:
+        self.metrics.inc(
+            "validator_rejections_total", type=msg_type, reason=reason)
+
+    def sign(self, h: bytes, msg_type: str) -> bytes:
+        with self.metrics.timer("validator_signing_seconds", type=msg_type):
+            return self.signer.sign(h)
+
     def load_config_data(self) -> Dict:
         with open(self.config_file_path, "r") as f:
             config_data = json.load(f)
         return config_data
 
+    @_rpc_metrics
     def GetTAnchorSignature(self, tempo_msg, context):
         """Get a vote(signature) from the validator to update the t_anchor
         setting in the Aergo bridge contract
 
         """
         if not self.auto_update:
+            self.count_rejection("tempo", "disabled")
             return Approval(error="Setting update not enabled")
         if tempo_msg.is_from_mainnet:
             current_tempo = query_tempo(self.hera2, self.oracle2,
@@ -344,12 +465,14 @@ class ValidatorService(BridgeOperatorServicer):
                 self.id1, tempo_msg, 't_anchor', "A", current_tempo
             )
 
+    @_rpc_metrics
     def GetTFinalSignature(self, tempo_msg, context):
         """Get a vote(signature) from the validator to update the t_final
         setting in the Aergo bridge contract
 
         """
         if not self.auto_update:
+            self.count_rejection("tempo", "disabled")
             return Approval(error="Setting update not enabled")
         if tempo_msg.is_from_mainnet:
             current_tempo = query_tempo(self.hera2, self.oracle2,
@@ -384,12 +507,10 @@ class ValidatorService(BridgeOperatorServicer):
                 oracle_to, ["_sv__nonce"]).var_proofs[0].value
         )
         if nonce != tempo_msg.destination_nonce:
+            self.count_rejection(tempo_str, "nonce")
             err_msg = ("Incorrect Nonce, got: {}, expected: {}"
                        .format(tempo_msg.destination_nonce, nonce))
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\u231B " + tempo_str, aergo_to, err_msg
-            )
+            self.log_rejection("\u231B " + tempo_str, aergo_to, err_msg)
             return Approval(error=err_msg)
         config_data = self.load_config_data()
         tempo = (config_data['networks'][aergo_to]['bridges']
@@ -397,20 +518,16 @@ class ValidatorService(BridgeOperatorServicer):
         # 2 - check new tempo is different from current one to prevent
         # update spamming
         if current_tempo == tempo:
+            self.count_rejection(tempo_str, "no_change")
             err_msg = "Not voting for a new {}".format(tempo_str)
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\u231B " + tempo_str, aergo_to, err_msg
-            )
+            self.log_rejection("\u231B " + tempo_str, aergo_to, err_msg)
             return Approval(error=err_msg)
         # 3 - check tempo matches the one in config
         if tempo != tempo_msg.tempo:
+            self.count_rejection(tempo_str, "config_mismatch")
             err_msg = ("Invalid {}, got: {}, expected: {}"
                        .format(tempo_str, tempo_msg.tempo, tempo))
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\u231B " + tempo_str, aergo_to, err_msg
-            )
+            self.log_rejection("\u231B " + tempo_str, aergo_to, err_msg)
             return Approval(error=err_msg)
         # sign anchor and return approval
         msg = bytes(
@@ -418,17 +535,18 @@ class ValidatorService(BridgeOperatorServicer):
             'utf-8'
         )
         h = hashlib.sha256(msg).digest()
-        sig = hera.account.private_key.sign_msg(h)
+        sig = self.sign(h, tempo_str)
         approval = Approval(address=self.address, sig=sig)
-        logger.info(
-            success_log_template, self.validator_index, "true",
+        self.log_approval(
             "\u231B " + tempo_str, aergo_to, tempo_msg.tempo,
             tempo_msg.destination_nonce
         )
         return approval
 
+    @_rpc_metrics
     def GetValidatorsSignature(self, val_msg, context):
         if not (self.auto_update and self.oracle_update):
+            self.count_rejection("validators", "disabled")
             return Approval(error="Oracle validators update not enabled")
         if val_msg.is_from_mainnet:
             return self.get_validators(
@@ -453,12 +571,10 @@ class ValidatorService(BridgeOperatorServicer):
                 oracle_to, ["_sv__nonce"]).var_proofs[0].value
         )
         if nonce != val_msg.destination_nonce:
+            self.count_rejection("validators", "nonce")
             err_msg = ("Incorrect Nonce, got: {}, expected: {}"
                        .format(val_msg.destination_nonce, nonce))
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\U0001f58b validator set", aergo_to, err_msg
-            )
+            self.log_rejection("\U0001f58b validator set", aergo_to, err_msg)
             return Approval(error=err_msg)
         config_data = self.load_config_data()
         config_vals = [val['addr'] for val in config_data['validators']]
@@ -466,20 +582,16 @@ class ValidatorService(BridgeOperatorServicer):
         # update spamming
         current_validators = query_validators(hera, oracle_to)
         if current_validators == config_vals:
+            self.count_rejection("validators", "no_change")
             err_msg = "Not voting for a new validator set"
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\U0001f58b validator set", aergo_to, err_msg
-            )
+            self.log_rejection("\U0001f58b validator set", aergo_to, err_msg)
             return Approval(error=err_msg)
         # 3 - check validators are same in config file
         if config_vals != val_msg.validators:
+            self.count_rejection("validators", "config_mismatch")
             err_msg = ("Invalid validator set, got: {}, expected: {}"
                        .format(val_msg.validators, config_vals))
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\U0001f58b validator set", aergo_to, err_msg
-            )
+            self.log_rejection("\U0001f58b validator set", aergo_to, err_msg)
             return Approval(error=err_msg)
         # sign validators
         data = ""
@@ -488,17 +600,18 @@ class ValidatorService(BridgeOperatorServicer):
         data += str(nonce) + id_to + "V"
         data_bytes = bytes(data, 'utf-8')
         h = hashlib.sha256(data_bytes).digest()
-        sig = hera.account.private_key.sign_msg(h)
+        sig = self.sign(h, "validators")
         approval = Approval(address=self.address, sig=sig)
-        logger.info(
-            success_log_template, self.validator_index, "true",
-            "\U0001f58b validator set", aergo_to, val_msg.validators,
+        self.log_approval(
+            "\U0001f58b validator set", aergo_to, list(val_msg.validators),
             val_msg.destination_nonce
         )
         return approval
 
+    @_rpc_metrics
     def GetOracleSignature(self, oracle_msg, context):
         if not (self.auto_update and self.oracle_update):
+            self.count_rejection("oracle", "disabled")
             return Approval(error="Oracle update not enabled")
 
         if oracle_msg.is_from_mainnet:
@@ -531,12 +644,10 @@ class ValidatorService(BridgeOperatorServicer):
                 oracle_to, ["_sv__nonce"]).var_proofs[0].value
         )
         if nonce != oracle_msg.destination_nonce:
+            self.count_rejection("oracle", "nonce")
             err_msg = ("Incorrect Nonce, got: {}, expected: {}"
                        .format(oracle_msg.destination_nonce, nonce))
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\U0001f58b oracle change", aergo_to, err_msg
-            )
+            self.log_rejection("\U0001f58b oracle change", aergo_to, err_msg)
             return Approval(error=err_msg)
 
         config_data = self.load_config_data()
@@ -546,20 +657,16 @@ class ValidatorService(BridgeOperatorServicer):
         # update spamming
         current_oracle = query_oracle(hera, bridge_to)
         if current_oracle == config_oracle:
+            self.count_rejection("oracle", "no_change")
             err_msg = "Not voting for a new oracle"
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\U0001f58b oracle change", aergo_to, err_msg
-            )
+            self.log_rejection("\U0001f58b oracle change", aergo_to, err_msg)
             return Approval(error=err_msg)
         # 3 - check validators are same in config file
         if config_oracle != oracle_msg.oracle:
+            self.count_rejection("oracle", "config_mismatch")
             err_msg = ("Invalid oracle, got: {}, expected: {}"
                        .format(oracle_msg.oracle, config_oracle))
-            logger.warning(
-                error_log_template, self.validator_index, "false",
-                "\U0001f58b oracle change", aergo_to, err_msg
-            )
+            self.log_rejection("\U0001f58b oracle change", aergo_to, err_msg)
             return Approval(error=err_msg)
 
         # sign validators
@@ -567,12 +674,10 @@ class ValidatorService(BridgeOperatorServicer):
             + str(oracle_msg.destination_nonce) + id_to + "O"
         data_bytes = bytes(data, 'utf-8')
         h = hashlib.sha256(data_bytes).digest()
-        sig = hera.account.private_key.sign_msg(h)
+        sig = self.sign(h, "oracle")
         approval = Approval(address=self.address, sig=sig)
-        logger.info(
-            success_log_template, self.validator_index, "true",
-            "\U0001f58b oracle change", aergo_to,
-            "\"{}\"".format(oracle_msg.oracle),
+        self.log_approval(
+            "\U0001f58b oracle change", aergo_to, oracle_msg.oracle,
             oracle_msg.destination_nonce
         )
         return approval
@@ -590,32 +695,46 @@ class ValidatorServer:
         anchoring_on: bool = False,
         auto_update: bool = False,
         oracle_update: bool = False,
+        metrics_port: int = None,
     ) -> None:
+        """ If metrics_port is set, request counts, latencies, rejection
+        reasons, cache hits, signing time and node calls are served over
+        http on /metrics (prometheus text format) and /metrics.json.
+        """
         self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
         with open(config_file_path, "r") as f:
             config_data = json.load(f)
-        add_BridgeOperatorServicer_to_server(
-            ValidatorService(
-                config_file_path, aergo1, aergo2, privkey_name, privkey_pwd,
-                validator_index, anchoring_on, auto_update, oracle_update
-            ), self.server
+        self.metrics = MetricsRegistry()
+        self.service = ValidatorService(
+            config_file_path, aergo1, aergo2, privkey_name, privkey_pwd,
+            validator_index, anchoring_on, auto_update, oracle_update,
+            self.metrics
         )
+        add_BridgeOperatorServicer_to_server(self.service, self.server)
         self.server.add_insecure_port(config_data['validators']
                                       [validator_index]['ip'])
         self.validator_index = validator_index
+        self.metrics_server = None
+        if metrics_port is not None:
+            self.metrics_server = MetricsServer(self.metrics, metrics_port)
 
     def run(self):
         self.server.start()
-        logger.info("\"server %s started\"", self.validator_index)
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        logger.info("server %s started", self.validator_index)
         try:
             while True:
                 time.sleep(_ONE_DAY_IN_SECONDS)
         except KeyboardInterrupt:
-            logger.info("\"Shutting down validator\"")
+            logger.info("Shutting down validator")
             self.shutdown()
 
     def shutdown(self):
         self.server.stop(0)
+        self.service.signer.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
 
 
 def _serve_worker(servers, index):
@@ -675,6 +794,9 @@ if __name__ == '__main__':
     parser.add_argument(
         '--local_test', dest='local_test', action='store_true',
         help='Start all validators locally for convenient testing')
+    parser.add_argument(
+        '--metrics_port', type=int, required=False,
+        help='Serve validator metrics over http on this port')
     parser.set_defaults(anchoring_on=False)
     parser.set_defaults(auto_update=False)
     parser.set_defaults(oracle_update=False)
@@ -692,6 +814,7 @@ if __name__ == '__main__':
             validator_index=args.validator_index,
             anchoring_on=args.anchoring_on,
             auto_update=args.auto_update,
-            oracle_update=False  # diseabled by default for safety
+            oracle_update=False,  # diseabled by default for safety
+            metrics_port=args.metrics_port
         )
         validator.run()
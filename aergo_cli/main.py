@@ -1,4 +1,3 @@
-import hashlib
 import PyInquirer as inquirer
 import json
 import os
@@ -7,6 +6,9 @@ from pyfiglet import Figlet
 from aergo_wallet.wallet import (
     AergoWallet,
 )
+from aergo_wallet.transfer_store import (
+    TransferStore,
+)
 from aergo_wallet.exceptions import (
     InvalidArgumentsError,
     TxError,
@@ -44,11 +46,12 @@ class MerkleBridgeCli():
     """
 
     def __init__(self, root_path: str = './'):
-        """Load the pending transfers."""
+        """Open the store of pending transfers."""
         # root_path is the path from which files are tracked
-        with open(root_path
-                  + 'aergo_cli/pending_transfers.json', 'r') as file:
-            self.pending_transfers = json.load(file)
+        self.transfers = TransferStore(root_path + 'aergo_cli/transfers.db')
+        # pending transfers used to be stored in a json file
+        self.transfers.import_json(
+            root_path + 'aergo_cli/pending_transfers.json')
         self.root_path = root_path
 
     def start(self):
@@ -153,6 +156,7 @@ class MerkleBridgeCli():
             answers = inquirer.prompt(questions, style=aergo_style)
             try:
                 if answers['action'] == 'Back':
+                    self.wallet.close()
                     return
                 elif answers['action'] == 'P':
                     self.check_withdrawable_balance()
@@ -170,40 +174,21 @@ class MerkleBridgeCli():
                       'transfers\nError msg: {}'.format(e))
 
     def check_balances(self):
-        """Iterate every registered wallet, network and asset and query
-        balances.
+        """Query balances of every registered wallet for every asset on
+        every network and print them per wallet and asset.
 
         """
         col_widths = [24, 55, 23]
+        snapshot = self.wallet.portfolio_snapshot()
         for wallet, info in self.wallet.config_data('wallet').items():
             print('\n' + wallet + ': ' + info['addr'])
             print_balance_table_header()
-            for net_name, net in self.wallet.config_data('networks').items():
-                for token_name, token in net['tokens'].items():
-                    lines = []
-                    balance, addr = self.wallet.get_balance(
-                        token_name, net_name, account_name=wallet
-                    )
-                    if balance != 0:
-                        line = [net_name, addr,
-                                str(balance / 10**18) + ' \U0001f4b0']
-                        lines.append(line)
-                    for peg in token['pegs']:
-                        balance, addr = self.wallet.get_balance(
-                            token_name, peg, net_name, wallet
-                        )
-                        if balance != 0:
-                            line = [peg, addr,
-                                    str(balance / 10**18) + ' \U0001f4b0']
-                            lines.append(line)
-                    print_balance_table_lines(lines, token_name,
-                                              col_widths)
-                aer_balance, _ = self.wallet.get_balance('aergo', net_name,
-                                                         account_name=wallet)
-                if aer_balance != 0:
-                    line = [net_name, 'aergo',
-                            str(aer_balance / 10**18) + ' \U0001f4b0']
-                    print_balance_table_lines([line], 'aergo', col_widths)
+            for asset_name, balances in snapshot[wallet].items():
+                lines = [
+                    [net_name, addr, str(balance / 10**18) + ' \U0001f4b0']
+                    for net_name, addr, balance in balances if balance != 0
+                ]
+                print_balance_table_lines(lines, asset_name, col_widths)
             print(' ' + '‾' * 120)
 
     def edit_settings(self):
@@ -501,12 +486,8 @@ class MerkleBridgeCli():
             return
         print("Transaction Hash : {}\nBlock Height : {}\n"
               .format(tx_hash, deposit_height))
-        pending_id = hashlib.sha256(
-            (from_chain + to_chain + asset_name + receiver).encode('utf-8')
-        ).digest().hex()
-        self.pending_transfers[pending_id] = \
-            [from_chain, to_chain, asset_name, receiver, deposit_height]
-        self.store_pending_transfers()
+        self.transfers.add(from_chain, to_chain, asset_name, receiver,
+                           deposit_height, amount, tx_hash)
 
     def finalize_transfer_arguments(self, prompt_last_deposit=True):
         """Prompt the arguments needed to finalize a transfer.
@@ -520,9 +501,13 @@ class MerkleBridgeCli():
         """
         choices = [
             {
-                'name': '{}'.format(val),
-                'value': val
-            } for _, val in self.pending_transfers.items()
+                'name': '{}'.format([transfer['from_chain'],
+                                     transfer['to_chain'],
+                                     transfer['asset_name'],
+                                     transfer['receiver'],
+                                     transfer['deposit_height']]),
+                'value': transfer
+            } for transfer in self.transfers.pending()
         ]
         choices.extend(["Custom transfer", "Back"])
         questions = [
@@ -543,8 +528,12 @@ class MerkleBridgeCli():
         elif answers['transfer'] == 'Back':
             return None
         else:
-            from_chain, to_chain, asset_name, receiver, deposit_height = \
-                answers['transfer']
+            transfer = answers['transfer']
+            from_chain = transfer['from_chain']
+            to_chain = transfer['to_chain']
+            asset_name = transfer['asset_name']
+            receiver = transfer['receiver']
+            deposit_height = transfer['deposit_height']
             from_assets, to_assets = self.get_registered_assets(from_chain,
                                                                 to_chain)
 
@@ -577,7 +566,7 @@ class MerkleBridgeCli():
             if not confirm_transfer():
                 print('Finalize transfer canceled')
                 return
-            self.wallet.finalize_transfer_mint(
+            _, tx_hash = self.wallet.finalize_transfer_mint(
                 from_chain, to_chain, asset_name, receiver, deposit_height,
                 privkey_name
             )
@@ -590,19 +579,16 @@ class MerkleBridgeCli():
             if not confirm_transfer():
                 print('Finalize transfer canceled')
                 return
-            self.wallet.finalize_transfer_unlock(
+            tx_hash = self.wallet.finalize_transfer_unlock(
                 from_chain, to_chain, asset_name, receiver, deposit_height,
                 privkey_name
             )
         else:
             print('asset not properly registered in config.json')
             return
-        # remove pending id from pending transfers
-        pending_id = hashlib.sha256(
-            (from_chain + to_chain + asset_name + receiver).encode('utf-8')
-        ).digest().hex()
-        self.pending_transfers.pop(pending_id, None)
-        self.store_pending_transfers()
+        # all anchored deposits of receiver are withdrawn by the mint/unlock
+        self.transfers.mark_finalized(from_chain, to_chain, asset_name,
+                                      receiver, deposit_height, tx_hash)
 
     def check_withdrawable_balance(self):
         """Check the status of cross chain transfers."""
@@ -756,15 +742,6 @@ class MerkleBridgeCli():
         ]
         return from_assets, to_assets
 
-    def store_pending_transfers(self):
-        """Record pending transfers in json file so they can be finalized
-        later.
-
-        """
-        with open(self.root_path
-                  + 'aergo_cli/pending_transfers.json', 'w') as file:
-            json.dump(self.pending_transfers, file, indent=4)
-
 
 if __name__ == '__main__':
     app = MerkleBridgeCli()
@@ -0,0 +1,87 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+)
+
+
+class AccountCache:
+    """ In-memory cache of decrypted private keys keyed by the account name
+    in config.json, so a keystore is decrypted once per ttl instead of once
+    per wallet call.
+
+    A key is only returned for the password that decrypted it: a salted
+    hash of the password is kept with the key.
+    Keys are stored in bytearrays which are overwritten with zeros when
+    they expire, are evicted or when the cache is cleared.
+    A ttl of 0 disables caching.
+    """
+
+    def __init__(self, ttl: float = 300) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._salt = os.urandom(16)
+        # account name -> (raw private key, password hash, expiration time)
+        self._keys: Dict[str, Tuple[bytearray, bytes, float]] = {}
+
+    def _hash(self, password: str) -> bytes:
+        return hashlib.sha256(self._salt + password.encode('utf-8')).digest()
+
+    def get(self, name: str, password: str) -> Optional[bytes]:
+        """ Return a copy of the cached private key of account name or
+        None if it is not cached or password is not the one that decrypted
+        it.
+        """
+        self.evict_expired()
+        password_hash = self._hash(password)
+        with self._lock:
+            entry = self._keys.get(name)
+            if entry is None or \
+                    not hmac.compare_digest(entry[1], password_hash):
+                return None
+            return bytes(entry[0])
+
+    def put(self, name: str, password: str, private_key: bytes) -> None:
+        if self.ttl <= 0:
+            return
+        expiration = time.monotonic() + self.ttl
+        password_hash = self._hash(password)
+        with self._lock:
+            old = self._keys.pop(name, None)
+            self._keys[name] = (bytearray(private_key), password_hash,
+                                expiration)
+        if old is not None:
+            _zeroize(old[0])
+
+    def evict(self, name: str) -> None:
+        with self._lock:
+            entry = self._keys.pop(name, None)
+        if entry is not None:
+            _zeroize(entry[0])
+
+    def evict_expired(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired = [name for name, (_, _, expiration)
+                       in self._keys.items() if expiration <= now]
+            keys = [self._keys.pop(name)[0] for name in expired]
+        for key in keys:
+            _zeroize(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = [key for key, _, _ in self._keys.values()]
+            self._keys = {}
+        for key in keys:
+            _zeroize(key)
+
+
+def _zeroize(buf: bytearray) -> None:
+    for i in range(len(buf)):
+        buf[i] = 0
@@ -0,0 +1,276 @@
+import argparse
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from typing import (
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import aergo.herapy as herapy
+
+from aergo_wallet.event_mux import (
+    EVENTS_RANGE,
+)
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"AERGOANC"
+_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+# anchored height, anchored state root, height of the anchor tx block on
+# the anchoring chain, anchor tx hash
+_RECORD = struct.Struct("<Q32sQ32s")
+
+Anchor = Tuple[int, bytes, int, bytes]
+
+
+class AnchorIndex:
+    """ Append only history of the anchors made by an oracle, stored as
+    fixed width records ordered by anchored height in a memory mapped
+    file.
+
+    Lookups binary search the mapped file so they cost no node query and
+    no deserialization, and several processes (validator, proposer,
+    wallets) can map the same file read-only and share its pages.
+    Only one process should write to a file: readers remap it when it
+    grows and ignore a record that is still being written.
+    """
+
+    def __init__(self, path: str, writable: bool = False) -> None:
+        self.path = path
+        self.writable = writable
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._size = 0
+        if writable:
+            if not os.path.isfile(path) or os.path.getsize(path) == 0:
+                with open(path, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, _VERSION, _RECORD.size))
+            self._file = open(path, "r+b")
+        else:
+            self._file = open(path, "rb")
+        magic, version, record_size = _HEADER.unpack(
+            self._file.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION \
+                or record_size != _RECORD.size:
+            self._file.close()
+            raise ValueError("{} is not an anchor index".format(path))
+        if writable:
+            # drop a record left incomplete by an interrupted write
+            size = os.fstat(self._file.fileno()).st_size
+            self._file.truncate(
+                size - (size - _HEADER.size) % _RECORD.size)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+    def _refresh(self) -> Optional[mmap.mmap]:
+        # called with self._lock held
+        size = os.fstat(self._file.fileno()).st_size
+        if size != self._size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), size,
+                                  access=mmap.ACCESS_READ)
+            self._size = size
+        return self._map
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return (self._size - _HEADER.size) // _RECORD.size
+
+    def _record(self, index: int) -> Anchor:
+        return _RECORD.unpack_from(
+            self._map, _HEADER.size + index * _RECORD.size)
+
+    def _height(self, index: int) -> int:
+        return struct.unpack_from(
+            "<Q", self._map, _HEADER.size + index * _RECORD.size)[0]
+
+    def _bisect(self, height: int) -> Tuple[int, int]:
+        """ Return the index of the first anchor with an anchored height
+        >= height and the number of records.
+        """
+        self._refresh()
+        count = (self._size - _HEADER.size) // _RECORD.size
+        low, high = 0, count
+        while low < high:
+            mid = (low + high) // 2
+            if self._height(mid) < height:
+                low = mid + 1
+            else:
+                high = mid
+        return low, count
+
+    def last(self) -> Optional[Anchor]:
+        with self._lock:
+            self._refresh()
+            count = (self._size - _HEADER.size) // _RECORD.size
+            if count == 0:
+                return None
+            return self._record(count - 1)
+
+    def find(self, height: int) -> Optional[Anchor]:
+        """ Return the anchor of height or None."""
+        with self._lock:
+            i, count = self._bisect(height)
+            if i == count or self._height(i) != height:
+                return None
+            return self._record(i)
+
+    def covering(self, height: int) -> Optional[Anchor]:
+        """ Return the first anchor including height (the anchor after
+        which a deposit made at height can be withdrawn) or None if height
+        is not anchored yet.
+        """
+        with self._lock:
+            i, count = self._bisect(height)
+            if i == count:
+                return None
+            return self._record(i)
+
+    def root_at(self, height: int) -> Optional[bytes]:
+        """ Return the state root anchored at height or None."""
+        anchor = self.find(height)
+        if anchor is None:
+            return None
+        return anchor[1]
+
+    def anchors(
+        self,
+        start_height: int = 0,
+        end_height: int = None,
+    ) -> Iterator[Anchor]:
+        """ Iterate the anchors with start_height <= height <= end_height."""
+        with self._lock:
+            i, count = self._bisect(start_height)
+            records = []
+            while i < count:
+                record = self._record(i)
+                if end_height is not None and record[0] > end_height:
+                    break
+                records.append(record)
+                i += 1
+        return iter(records)
+
+    def append(
+        self,
+        height: int,
+        root: bytes,
+        block_height: int,
+        tx_hash: bytes,
+    ) -> bool:
+        """ Append an anchor, anchors not higher than the last one are
+        ignored. Returns True if the anchor was recorded.
+        """
+        return self.append_many([(height, root, block_height, tx_hash)]) == 1
+
+    def append_many(self, anchors: List[Anchor]) -> int:
+        if not self.writable:
+            raise ValueError("anchor index opened read-only")
+        last = self.last()
+        last_height = -1 if last is None else last[0]
+        data = []
+        for height, root, block_height, tx_hash in anchors:
+            if height <= last_height:
+                continue
+            data.append(_RECORD.pack(height, root, block_height, tx_hash))
+            last_height = height
+        if len(data) > 0:
+            with self._lock:
+                self._file.seek(0, os.SEEK_END)
+                self._file.write(b"".join(data))
+                self._file.flush()
+        return len(data)
+
+    def append_events(self, events: List) -> int:
+        """ Append the anchors of oracle newAnchor events."""
+        return self.append_many([
+            (event.arguments[1], bytes.fromhex(event.arguments[2][2:]),
+             event.block_height, bytes(event.tx_hash))
+            for event in events if event.name == "newAnchor"
+        ])
+
+    def backfill(
+        self,
+        aergo_to: herapy.Aergo,
+        oracle_to: str,
+        to_height: int,
+        start_height: int = 0,
+    ) -> int:
+        """ Append the newAnchor events of oracle_to up to block to_height,
+        from the block after the last recorded anchor tx or start_height.
+        Returns the number of anchors appended.
+        """
+        last = self.last()
+        if last is not None:
+            start_height = max(start_height, last[2] + 1)
+        appended = 0
+        while start_height <= to_height:
+            end = min(start_height + EVENTS_RANGE - 1, to_height)
+            events = aergo_to.get_events(
+                oracle_to, "newAnchor", start_block_no=start_height,
+                end_block_no=end
+            )
+            appended += self.append_events(events)
+            start_height = end + 1
+        return appended
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Record the anchors of from_chain made on to_chain.')
+    # Add arguments
+    parser.add_argument(
+        '-c', '--config_file_path', type=str, help='Path to config.json',
+        required=True
+    )
+    parser.add_argument(
+        '--from_chain', type=str, help='Name of the anchored network in '
+        'config file', required=True
+    )
+    parser.add_argument(
+        '--to_chain', type=str, help='Name of the network where anchors are '
+        'made in config file', required=True
+    )
+    parser.add_argument(
+        '--path', type=str, help='Path to the anchor index file',
+        required=True
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(message)s')
+
+    # the wallet reads anchor indexes, import it here only
+    from aergo_wallet.wallet import AergoWallet
+    wallet = AergoWallet(args.config_file_path)
+    oracle_to = wallet.config_data(
+        'networks', args.to_chain, 'bridges', args.from_chain, 'oracle')
+    index = AnchorIndex(args.path, writable=True)
+    aergo_to = wallet._connect_aergo(args.to_chain)
+    try:
+        # subscribe before backfilling so no anchor is missed
+        stream = aergo_to.receive_event_stream(oracle_to, "newAnchor")
+        _, best_height = aergo_to.get_blockchain_status()
+        logger.info("Backfilled %s anchors",
+                    index.backfill(aergo_to, oracle_to, best_height))
+        for event in stream:
+            index.append_events([event])
+            logger.info("\u2693 Recorded anchor of height %s",
+                        event.arguments[1])
+    except KeyboardInterrupt:
+        logger.info("Shutting down anchor index")
+    finally:
+        index.close()
+        wallet.close()
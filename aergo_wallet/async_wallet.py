@@ -0,0 +1,425 @@
+import asyncio
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
+from functools import (
+    partial,
+)
+
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from aergo_wallet.wallet import (
+    AergoWallet,
+)
+from aergo_wallet.transfer_to_sidechain import (
+    build_lock_proof,
+)
+from aergo_wallet.transfer_from_sidechain import (
+    build_burn_proof,
+)
+
+
+class AsyncAergoWallet:
+    """ asyncio interface to AergoWallet.
+
+    Blocking wallet calls run in a thread pool so many transfers can
+    progress concurrently on one event loop. Every method accepts a
+    timeout (defaults to the wallet timeout, None to wait forever) after
+    which asyncio.TimeoutError is raised.
+    Cancelling or timing out a call stops waiting for it, a node request
+    already started in the pool still runs to completion. Multi step
+    transfers are composed of awaits, so they stop between steps.
+    Txs sent by the same account on the same network are serialized to
+    keep nonces ordered: the account stays locked until a tx sending call
+    returns in the pool, even after its caller stopped waiting.
+    Withdrawal proofs are built before taking the account lock so waiting
+    for an anchor doesn't hold back the other txs of the account.
+    """
+
+    def __init__(
+        self,
+        config_file_path: str,
+        config_data: Dict = None,
+        max_workers: int = 16,
+        timeout: float = None,
+        wallet: AergoWallet = None,
+    ) -> None:
+        if wallet is None:
+            wallet = AergoWallet(config_file_path, config_data)
+        self.wallet = wallet
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers)
+        # (network name, account name) -> lock held while sending txs
+        self._tx_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    async def _run(self, func: Callable, *args, timeout: float = None,
+                   **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs))
+        return await asyncio.wait_for(future, timeout)
+
+    def _tx_lock(self, network_name: str, privkey_name: str) -> asyncio.Lock:
+        key = (network_name, privkey_name)
+        if key not in self._tx_locks:
+            self._tx_locks[key] = asyncio.Lock()
+        return self._tx_locks[key]
+
+    async def _send(self, network_name: str, privkey_name: str,
+                    func: Callable, *args, timeout: float = None, **kwargs):
+        """ Run a tx sending call holding the account lock until the call
+        returns in the pool, even if waiting for it timed out or was
+        cancelled, so the next txs don't reuse its nonces.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        lock = self._tx_lock(network_name, privkey_name)
+        await lock.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._executor, partial(func, *args, **kwargs))
+        except BaseException:
+            lock.release()
+            raise
+        future.add_done_callback(lambda _: lock.release())
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.wallet.close()
+
+    async def __aenter__(self) -> 'AsyncAergoWallet':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def get_balance(
+        self,
+        asset_name: str,
+        network_name: str,
+        asset_origin_chain: str = None,
+        account_name: str = 'default',
+        account_addr: str = None,
+        timeout: float = None,
+    ) -> Tuple[int, str]:
+        return await self._run(
+            self.wallet.get_balance, asset_name, network_name,
+            asset_origin_chain, account_name, account_addr, timeout=timeout
+        )
+
+    async def get_balances(
+        self,
+        network_name: str,
+        queries: List[Tuple[str, str]],
+        asset_origin_chain: str = None,
+        timeout: float = None,
+    ) -> List[int]:
+        return await self._run(
+            self.wallet.get_balances, network_name, queries,
+            asset_origin_chain, timeout=timeout
+        )
+
+    async def get_mintable_balance(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        account_name: str = 'default',
+        account_addr: str = None,
+        timeout: float = None,
+    ) -> Tuple[int, int]:
+        return await self._run(
+            self.wallet.get_mintable_balance, from_chain, to_chain,
+            asset_name, account_name, account_addr, timeout=timeout
+        )
+
+    async def get_unlockable_balance(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        account_name: str = 'default',
+        account_addr: str = None,
+        timeout: float = None,
+    ) -> Tuple[int, int]:
+        return await self._run(
+            self.wallet.get_unlockable_balance, from_chain, to_chain,
+            asset_name, account_name, account_addr, timeout=timeout
+        )
+
+    async def wait_finalization(
+        self,
+        network_name: str,
+        height: int = None,
+        timeout: float = None,
+    ) -> int:
+        return await self._run(
+            self.wallet.wait_finalization, network_name, height,
+            timeout=timeout
+        )
+
+    async def initiate_transfer_lock(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        amount: int,
+        receiver: str = None,
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> Tuple[int, str]:
+        return await self._send(
+            from_chain, privkey_name, self.wallet.initiate_transfer_lock,
+            from_chain, to_chain, asset_name, amount, receiver, privkey_name,
+            privkey_pwd, timeout=timeout
+        )
+
+    async def initiate_transfer_burn(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        amount: int,
+        receiver: str = None,
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> Tuple[int, str]:
+        return await self._send(
+            from_chain, privkey_name, self.wallet.initiate_transfer_burn,
+            from_chain, to_chain, asset_name, amount, receiver, privkey_name,
+            privkey_pwd, timeout=timeout
+        )
+
+    async def initiate_many(
+        self,
+        from_chain: str,
+        to_chain: str,
+        transfers: List[Tuple[str, int, str]],
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> List[Tuple[Optional[int], Optional[str], Optional[str]]]:
+        return await self._send(
+            from_chain, privkey_name, self.wallet.initiate_many, from_chain,
+            to_chain, transfers, privkey_name, privkey_pwd, timeout=timeout
+        )
+
+    async def build_lock_proof(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str,
+        lock_height: int,
+        timeout: float = None,
+    ):
+        """ Wait for an anchor including lock_height and build the lock
+        proof of receiver.
+        """
+        asset_address = self.wallet.config_data(
+            'networks', from_chain, 'tokens', asset_name, 'addr')
+        return await self._run(
+            self._build_proof, build_lock_proof, from_chain, to_chain,
+            receiver, lock_height, asset_address, timeout=timeout
+        )
+
+    async def build_burn_proof(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str,
+        burn_height: int,
+        timeout: float = None,
+    ):
+        """ Wait for an anchor including burn_height and build the burn
+        proof of receiver.
+        """
+        asset_address = self.wallet.config_data(
+            'networks', to_chain, 'tokens', asset_name, 'addr')
+        return await self._run(
+            self._build_proof, build_burn_proof, from_chain, to_chain,
+            receiver, burn_height, asset_address, timeout=timeout
+        )
+
+    def _build_proof(
+        self,
+        build_proof: Callable,
+        from_chain: str,
+        to_chain: str,
+        receiver: str,
+        deposit_height: int,
+        asset_address: str,
+    ):
+        bridge_from = self.wallet.config_data(
+            'networks', from_chain, 'bridges', to_chain, 'addr')
+        bridge_to = self.wallet.config_data(
+            'networks', to_chain, 'bridges', from_chain, 'addr')
+        aergo_from, aergo_to = self.wallet._connect_withdrawal(
+            from_chain, to_chain)
+        try:
+            return build_proof(
+                aergo_from, aergo_to, receiver, bridge_from, bridge_to,
+                deposit_height, asset_address,
+                self.wallet._proof_cache(from_chain),
+                self.wallet._event_mux(to_chain),
+                self.wallet._anchor_index(from_chain, to_chain)
+            )
+        finally:
+            self.wallet._pool.release(aergo_from)
+            self.wallet._pool.release(aergo_to)
+
+    async def finalize_transfer_mint(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str = None,
+        lock_height: int = 0,
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> Tuple[str, str]:
+        if receiver is None:
+            receiver = self.wallet.get_wallet_address(privkey_name)
+        lock_proof = await self.build_lock_proof(
+            from_chain, to_chain, asset_name, receiver, lock_height,
+            timeout=timeout
+        )
+        return await self._send(
+            to_chain, privkey_name, self.wallet.finalize_transfer_mint,
+            from_chain, to_chain, asset_name, receiver, lock_height,
+            privkey_name, privkey_pwd, lock_proof, timeout=timeout
+        )
+
+    async def finalize_transfer_unlock(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str = None,
+        burn_height: int = 0,
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> str:
+        if receiver is None:
+            receiver = self.wallet.get_wallet_address(privkey_name)
+        burn_proof = await self.build_burn_proof(
+            from_chain, to_chain, asset_name, receiver, burn_height,
+            timeout=timeout
+        )
+        return await self._send(
+            to_chain, privkey_name, self.wallet.finalize_transfer_unlock,
+            from_chain, to_chain, asset_name, receiver, burn_height,
+            privkey_name, privkey_pwd, burn_proof, timeout=timeout
+        )
+
+    async def finalize_many(
+        self,
+        from_chain: str,
+        to_chain: str,
+        transfers: List[Tuple[str, str, int]],
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        proofs = await self._run(
+            self.wallet.build_withdrawal_proofs, from_chain, to_chain,
+            transfers, timeout=timeout
+        )
+        return await self._send(
+            to_chain, privkey_name, self.wallet.finalize_many, from_chain,
+            to_chain, transfers, privkey_name, privkey_pwd, proofs,
+            timeout=timeout
+        )
+
+    async def transfer_to_sidechain(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        amount: int,
+        receiver: str = None,
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> Tuple[str, str]:
+        """ Lock, wait finalization and mint. timeout applies to each
+        step.
+        """
+        if receiver is None:
+            receiver = self.wallet.get_wallet_address(privkey_name)
+        lock_height, _ = await self.initiate_transfer_lock(
+            from_chain, to_chain, asset_name, amount, receiver, privkey_name,
+            privkey_pwd, timeout=timeout
+        )
+        await self.wait_finalization(from_chain, lock_height,
+                                     timeout=timeout)
+        return await self.finalize_transfer_mint(
+            from_chain, to_chain, asset_name, receiver, lock_height,
+            privkey_name, privkey_pwd, timeout=timeout
+        )
+
+    async def transfer_from_sidechain(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        amount: int,
+        receiver: str = None,
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ) -> str:
+        """ Burn, wait finalization and unlock. timeout applies to each
+        step.
+        """
+        if receiver is None:
+            receiver = self.wallet.get_wallet_address(privkey_name)
+        burn_height, _ = await self.initiate_transfer_burn(
+            from_chain, to_chain, asset_name, amount, receiver, privkey_name,
+            privkey_pwd, timeout=timeout
+        )
+        await self.wait_finalization(from_chain, burn_height,
+                                     timeout=timeout)
+        return await self.finalize_transfer_unlock(
+            from_chain, to_chain, asset_name, receiver, burn_height,
+            privkey_name, privkey_pwd, timeout=timeout
+        )
+
+    async def bridge_transfer(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        amount: int,
+        receiver: str = None,
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        timeout: float = None,
+    ):
+        try:
+            self.wallet.config_data(
+                'networks', to_chain, "tokens", asset_name, "pegs", from_chain)
+        except KeyError:
+            return await self.transfer_to_sidechain(
+                from_chain, to_chain, asset_name, amount, receiver,
+                privkey_name, privkey_pwd, timeout=timeout
+            )
+        return await self.transfer_from_sidechain(
+            from_chain, to_chain, asset_name, amount, receiver,
+            privkey_name, privkey_pwd, timeout=timeout
+        )
@@ -0,0 +1,167 @@
+from contextlib import (
+    contextmanager,
+)
+import logging
+import threading
+import time
+import weakref
+
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import aergo.herapy as herapy
+
+from aergo_wallet.metrics import (
+    MetricsRegistry,
+)
+from aergo_wallet.node_metrics import (
+    InstrumentedAergo,
+)
+from aergo_wallet.node_provider import (
+    NodeProvider,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """ Keeps connections to aergo nodes open so they can be reused by
+    successive wallet calls.
+
+    Idle connections are kept per network ip. A connection that has been
+    idle for more than health_check_after seconds is checked with a
+    blockchain status request before being reused, and connections idle
+    for more than max_idle_time seconds are closed.
+    Node calls made with the connections are recorded in metrics (the
+    process default registry if None).
+    """
+
+    def __init__(
+        self,
+        max_idle_time: float = 300,
+        health_check_after: float = 10,
+        max_idle_per_network: int = 4,
+        metrics: MetricsRegistry = None,
+    ) -> None:
+        self.max_idle_time = max_idle_time
+        self.health_check_after = health_check_after
+        self.max_idle_per_network = max_idle_per_network
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        # ip -> [(aergo, released at)], most recently released last
+        self._idle: Dict[str, List[Tuple[herapy.Aergo, float]]] = {}
+        # connections given out by acquire -> ip
+        self._in_use: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._closed = False
+
+    def acquire(
+        self,
+        ip: Union[str, Sequence[str]],
+        network: str = None,
+    ) -> herapy.Aergo:
+        """ Return a healthy idle connection to ip or a new one, network
+        labels the metrics of a new connection (ip by default).
+        If several ips of the same network are given, the connection is a
+        NodeProvider routing calls between them.
+        """
+        if not isinstance(ip, str):
+            ips = list(ip)
+            ip = ",".join(ips)
+        else:
+            ips = [ip]
+        self.evict_idle()
+        while True:
+            with self._lock:
+                idle = self._idle.get(ip, [])
+                if len(idle) == 0:
+                    break
+                aergo, released_at = idle.pop()
+            if time.monotonic() - released_at < self.health_check_after \
+                    or self._is_healthy(aergo):
+                with self._lock:
+                    self._in_use[aergo] = ip
+                return aergo
+            logger.info("Dropping unhealthy connection to %s", ip)
+            self._disconnect(aergo)
+        if network is None:
+            network = ip
+        if len(ips) > 1:
+            aergo = NodeProvider(network, ips, self.metrics)
+            aergo.connect()
+        else:
+            aergo = InstrumentedAergo(network, self.metrics)
+            aergo.connect(ip)
+        with self._lock:
+            self._in_use[aergo] = ip
+        return aergo
+
+    def release(self, aergo: herapy.Aergo) -> None:
+        """ Return a connection to the pool, the account loaded in it is
+        removed. Connections not created by the pool are disconnected.
+        """
+        aergo.account = None
+        with self._lock:
+            ip = self._in_use.pop(aergo, None)
+            if ip is not None and not self._closed:
+                idle = self._idle.setdefault(ip, [])
+                if len(idle) < self.max_idle_per_network:
+                    idle.append((aergo, time.monotonic()))
+                    return
+        self._disconnect(aergo)
+
+    @contextmanager
+    def connection(self, ip: str) -> Iterator[herapy.Aergo]:
+        aergo = self.acquire(ip)
+        try:
+            yield aergo
+        finally:
+            self.release(aergo)
+
+    def evict_idle(self) -> None:
+        """ Close connections idle for more than max_idle_time."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for ip, idle in self._idle.items():
+                keep = []
+                for aergo, released_at in idle:
+                    if now - released_at > self.max_idle_time:
+                        expired.append(aergo)
+                    else:
+                        keep.append((aergo, released_at))
+                self._idle[ip] = keep
+        for aergo in expired:
+            self._disconnect(aergo)
+
+    def close(self) -> None:
+        """ Close idle connections, connections in use are closed when
+        released.
+        """
+        with self._lock:
+            self._closed = True
+            idle = [aergo for conns in self._idle.values()
+                    for aergo, _ in conns]
+            self._idle = {}
+        for aergo in idle:
+            self._disconnect(aergo)
+
+    @staticmethod
+    def _is_healthy(aergo: herapy.Aergo) -> bool:
+        try:
+            aergo.get_blockchain_status()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _disconnect(aergo: herapy.Aergo) -> None:
+        try:
+            aergo.disconnect()
+        except herapy.errors.exception.CommunicationException:
+            pass
@@ -0,0 +1,667 @@
+""" Python models of the lua contracts of the bridge (merkle_bridge.lua,
+oracle.lua, standard_token.lua and the minted token embedded in the
+bridge) executed by the aergo_wallet.simulator chain.
+
+The models follow the lua code line by line: same state variables
+(stored as the same json values at the same trie keys, so merkle proofs
+of the simulated state are the ones of a real node), same checks, error
+messages, events and return values.
+Query helpers registered by the contracts for debugging (bitIsSet,
+verifyProof, join...) are not modeled.
+"""
+
+import hashlib
+import inspect
+import json
+import re
+
+from typing import (
+    Any,
+    List,
+    Optional,
+    Tuple,
+)
+
+from aergo.herapy.utils.signature import (
+    verify_sig,
+)
+
+from aergo_wallet.smt import (
+    verify_deposit_proof,
+    verify_state_proof,
+)
+
+ADDRESS0 = '1111111111111111111111111111111111111111111111111111'
+
+_INVALID_ADDRESS_CHAR = re.compile(
+    '[^123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz]')
+
+
+class ContractError(Exception):
+    """ Error raised by a contract function (lua error or failed assert),
+    the tx calling it is reverted.
+    """
+
+
+class Bignum(int):
+    """ Lua bignum, serialized as {"_bignum": "<value>"} in json."""
+
+
+def require(condition: Any, msg: str) -> None:
+    """ Same as the lua assert."""
+    if not condition:
+        raise ContractError(msg)
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Bignum):
+        return {"_bignum": str(int(value))}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    return value
+
+
+def _decode_bignum(obj: dict) -> Any:
+    if len(obj) == 1 and "_bignum" in obj:
+        return Bignum(obj["_bignum"])
+    return obj
+
+
+def to_json(value: Any) -> str:
+    """ Serialize a lua value like aergo does for state variables, call
+    results and event arguments.
+    """
+    return json.dumps(_encode(value), separators=(',', ':'))
+
+
+def from_json(data: str) -> Any:
+    """ Deserialize call arguments or state variables, bignums included."""
+    return json.loads(data, object_hook=_decode_bignum)
+
+
+def lua_type(x: Any) -> str:
+    if x is None:
+        return 'nil'
+    if isinstance(x, bool):
+        return 'boolean'
+    if isinstance(x, Bignum):
+        return 'userdata'
+    if isinstance(x, (int, float)):
+        return 'number'
+    if isinstance(x, str):
+        return 'string'
+    return 'table'
+
+
+def _typecheck(x: Any, t: str) -> None:
+    """ Same as _typecheck in the bridge contracts."""
+    if x is not None and t == 'address':
+        require(isinstance(x, str), "address must be string type")
+        require(len(x) == 52, "invalid address length: {} ({})"
+                .format(x, len(x)))
+        invalid_char = _INVALID_ADDRESS_CHAR.search(x)
+        require(invalid_char is None,
+                "invalid address format: {} contains invalid char {}"
+                .format(x, invalid_char and invalid_char.group()))
+    elif x is not None and t == 'ubig':
+        require(isinstance(x, Bignum), "invalid type: {} != {}"
+                .format(lua_type(x), t))
+        require(x >= 0, "{} must be positive number".format(x))
+    else:
+        require(lua_type(x) == t, "invalid type: {} != {}"
+                .format(lua_type(x), t))
+
+
+def crypto_sha256(data: str) -> str:
+    """ Same as crypto.sha256 in lua: hex strings starting with 0x are
+    hashed as bytes. Returns a 0x hex string.
+    """
+    if data.startswith("0x"):
+        raw = bytes.fromhex(data[2:])
+    else:
+        raw = data.encode('latin-1')
+    return "0x" + hashlib.sha256(raw).hexdigest()
+
+
+def crypto_ecverify(h: str, sig: str, address: str) -> bool:
+    """ Same as crypto.ecverify in lua: verify the signature (0x hex) of
+    the message hash h (0x hex) by address.
+    """
+    try:
+        return verify_sig(bytes.fromhex(h[2:]), bytes.fromhex(sig[2:]),
+                          address)
+    except Exception:
+        return False
+
+
+def _hex_bytes(value: Any) -> Optional[bytes]:
+    """ Bytes of a 0x hex string stored by a contract (the anchored roots
+    are "constructor" before the first anchor).
+    """
+    if not isinstance(value, str) or not value.startswith("0x"):
+        return None
+    try:
+        return bytes.fromhex(value[2:])
+    except ValueError:
+        return None
+
+
+def _lua_args(method, args: List) -> List:
+    """ Lua functions receive nil for missing arguments and ignore extra
+    ones.
+    """
+    params = inspect.signature(method).parameters.values()
+    if any(p.kind == p.VAR_POSITIONAL for p in params):
+        nb_params = len(params) - 1
+        return list(args) + [None] * (nb_params - len(args))
+    nb_params = len(params)
+    return (list(args) + [None] * nb_params)[:nb_params]
+
+
+class Contract:
+    """ Base of the contract models.
+
+    A model instance executes one function call of a contract: ctx gives
+    access to the contract state and to the lua system and contract
+    modules (getSender, event, call, deploy...).
+    """
+
+    # functions registered with abi.register and abi.register_view
+    functions: Tuple[str, ...] = ()
+    views: Tuple[str, ...] = ()
+
+    def __init__(self, ctx) -> None:
+        self.ctx = ctx
+
+    @classmethod
+    def execute(cls, ctx, function: str, args: List) -> Any:
+        """ Call function with args, returns its result (a tuple for
+        multiple return values).
+        """
+        if function != "constructor" \
+                and function not in cls.functions + cls.views:
+            raise ContractError("undefined function: {}".format(function))
+        method = getattr(cls(ctx), function, None)
+        if method is None:
+            return None
+        return method(*_lua_args(method, args))
+
+    @property
+    def sender(self) -> str:
+        return self.ctx.sender
+
+    def _get(self, var: str, key: Any = None) -> Any:
+        data = self.ctx.get(_storage_key(var, key))
+        if data is None:
+            return None
+        return from_json(data.decode('utf-8'))
+
+    def _set(self, var: str, value: Any, key: Any = None) -> None:
+        if value is None:
+            self.ctx.set(_storage_key(var, key), None)
+        else:
+            self.ctx.set(_storage_key(var, key),
+                         to_json(value).encode('utf-8'))
+
+    def _delete(self, var: str, key: Any) -> None:
+        self.ctx.set(_storage_key(var, key), None)
+
+    def _event(self, name: str, *args: Any) -> None:
+        self.ctx.event(name, list(args))
+
+    def _call(self, address: str, function: str, *args: Any) -> Any:
+        return self.ctx.call(address, function, list(args))
+
+
+def _storage_key(var: str, key: Any = None) -> str:
+    """ Storage key of a state variable (the trie key is its hash)."""
+    if key is None:
+        return "_sv_" + var
+    if isinstance(key, float) and key.is_integer():
+        key = int(key)
+    return "_sv_{}-{}".format(var, key)
+
+
+class _Arc1Token(Contract):
+    """ Aergo standard token interface common to the standard and minted
+    tokens.
+    """
+
+    functions: Tuple[str, ...] = ('transfer', 'transferFrom',
+                                  'setApprovalForAll')
+    views: Tuple[str, ...] = ('name', 'symbol', 'decimals', 'totalSupply',
+                              'balanceOf', 'isApprovedForAll')
+
+    def _callTokensReceived(self, from_, to, value, *args):
+        if to != ADDRESS0 and self.ctx.is_contract(to):
+            self._call(to, "tokensReceived", self.sender, from_, value,
+                       *args)
+
+    def _transfer(self, from_, to, value, *args):
+        _typecheck(from_, 'address')
+        _typecheck(to, 'address')
+        _typecheck(value, 'ubig')
+        balance = self._get('_balances', from_)
+        require(balance is not None and balance >= value,
+                "not enough balance")
+        self._set('_balances', Bignum(balance - value), from_)
+        to_balance = self._get('_balances', to) or Bignum(0)
+        self._set('_balances', Bignum(to_balance + value), to)
+        self._callTokensReceived(from_, to, value, *args)
+        self._event("transfer", from_, to, value)
+
+    def _mint(self, to, value, *args):
+        _typecheck(to, 'address')
+        _typecheck(value, 'ubig')
+        supply = self._get('_totalSupply') or Bignum(0)
+        self._set('_totalSupply', Bignum(supply + value))
+        to_balance = self._get('_balances', to) or Bignum(0)
+        self._set('_balances', Bignum(to_balance + value), to)
+        self._callTokensReceived(ADDRESS0, to, value, *args)
+        self._event("transfer", ADDRESS0, to, value)
+
+    def _burn(self, from_, value):
+        _typecheck(from_, 'address')
+        _typecheck(value, 'ubig')
+        balance = self._get('_balances', from_)
+        require(balance is not None and balance >= value,
+                "not enough balance")
+        self._set('_totalSupply', Bignum(self._get('_totalSupply') - value))
+        self._set('_balances', Bignum(balance - value), from_)
+        self._event("transfer", from_, ADDRESS0, value)
+
+    def _init(self, name, symbol, decimals):
+        _typecheck(name, 'string')
+        self._set('_name', name)
+        self._set('_symbol', symbol)
+        self._set('_decimals', decimals)
+
+    def totalSupply(self):
+        return self._get('_totalSupply')
+
+    def name(self):
+        return self._get('_name')
+
+    def symbol(self):
+        return self._get('_symbol')
+
+    def decimals(self):
+        return self._get('_decimals')
+
+    def balanceOf(self, owner):
+        balance = self._get('_balances', owner)
+        return Bignum(0) if balance is None else balance
+
+    def transfer(self, to, value, *args):
+        self._transfer(self.sender, to, value, *args)
+
+    def isApprovedForAll(self, owner, operator):
+        return owner == operator \
+            or self._get('_operators', "{}/{}".format(owner, operator)) \
+            is True
+
+    def setApprovalForAll(self, operator, approved):
+        _typecheck(operator, 'address')
+        _typecheck(approved, 'boolean')
+        require(self.sender != operator,
+                "cannot set approve self as operator")
+        self._set('_operators', approved,
+                  "{}/{}".format(self.sender, operator))
+        self._event("approve", self.sender, operator, approved)
+
+    def transferFrom(self, from_, to, value, *args):
+        require(self.isApprovedForAll(from_, self.sender),
+                "caller is not approved for holder")
+        self._transfer(from_, to, value, *args)
+
+
+class StandardToken(_Arc1Token):
+    """ standard_token.lua"""
+
+    def constructor(self, total_supply, receiver):
+        _typecheck(receiver, 'address')
+        self._init('Standard token on Aergo', 'TOKEN', 18)
+        self._set('_totalSupply', total_supply)
+        self._set('_balances', total_supply, receiver)
+
+
+class MintedToken(_Arc1Token):
+    """ Pegged token deployed by the bridge (mintedToken in
+    merkle_bridge.lua).
+    """
+
+    functions = _Arc1Token.functions + ('mint', 'burn')
+
+    def mint(self, to, value):
+        require(self.sender == self._get('_master'),
+                "Only bridge contract can mint")
+        self._mint(to, value)
+
+    def burn(self, from_, value):
+        require(self.sender == self._get('_master'),
+                "Only bridge contract can burn")
+        self._burn(from_, value)
+
+    def constructor(self, originAddress):
+        self._init(originAddress, "PEG", "Query decimals at token origin")
+        self._set('_totalSupply', Bignum(0))
+        self._set('_master', self.sender)
+        return True
+
+
+class MerkleBridge(Contract):
+    """ merkle_bridge.lua"""
+
+    functions = ('oracleUpdate', 'newAnchor', 'tAnchorUpdate',
+                 'tFinalUpdate', 'tokensReceived', 'mint', 'burn', 'unlock')
+
+    def _onlyOracle(self):
+        oracle = self._get('_oracle')
+        require(self.sender == oracle,
+                "Only oracle can call, expected: {}, got: {}"
+                .format(oracle, self.sender))
+
+    def _verifyDepositProof(self, map_name, key, value, ap):
+        root = _hex_bytes(self._get('_anchorRoot'))
+        if root is None or not isinstance(ap, list):
+            return False
+        try:
+            return verify_deposit_proof(root, map_name, key, value, ap)
+        except ValueError:
+            return False
+
+    def _lock(self, tokenAddress, amount, receiver):
+        _typecheck(receiver, 'address')
+        _typecheck(amount, 'ubig')
+        require(self._get('_mintedTokens', tokenAddress) is None,
+                "this token was minted by the bridge so it should be burnt "
+                "to transfer back to origin, not locked")
+        require(amount > 0, "amount must be positive")
+        accountRef = receiver + tokenAddress
+        old = self._get('_locks', accountRef)
+        if old is None:
+            lockedBalance = amount
+        else:
+            lockedBalance = Bignum(int(old) + amount)
+        self._set('_locks', str(lockedBalance), accountRef)
+        self._event("lock", receiver, amount, tokenAddress)
+
+    def constructor(self, tAnchor, tFinal):
+        self._set('_tAnchor', tAnchor)
+        self._set('_tFinal', tFinal)
+        self._set('_anchorRoot', "constructor")
+        self._set('_anchorHeight', 0)
+        self._set('_oracle', self.sender)
+
+    def oracleUpdate(self, newOracle):
+        self._onlyOracle()
+        self._set('_oracle', newOracle)
+        self._event("oracleUpdate", self.sender, newOracle)
+
+    def newAnchor(self, root, height):
+        self._onlyOracle()
+        require(height > self._get('_anchorHeight') + self._get('_tAnchor'),
+                "Next anchor height not reached")
+        self._set('_anchorRoot', root)
+        self._set('_anchorHeight', height)
+        self._event("newAnchor", self.sender, height, root)
+
+    def tAnchorUpdate(self, tAnchor):
+        self._onlyOracle()
+        self._set('_tAnchor', tAnchor)
+        self._event("tAnchorUpdate", self.sender, tAnchor)
+
+    def tFinalUpdate(self, tFinal):
+        self._onlyOracle()
+        self._set('_tFinal', tFinal)
+        self._event("tFinalUpdate", self.sender, tFinal)
+
+    def tokensReceived(self, operator, from_, value, receiver):
+        return self._lock(self.sender, value, receiver)
+
+    def mint(self, receiver, balance, tokenOrigin, merkleProof):
+        _typecheck(receiver, 'address')
+        _typecheck(balance, 'ubig')
+        _typecheck(tokenOrigin, 'address')
+        require(balance > 0, "mintable balance must be positive")
+        accountRef = receiver + tokenOrigin
+        balanceStr = '"{}"'.format(balance)
+        if not self._verifyDepositProof("_locks", accountRef, balanceStr,
+                                        merkleProof):
+            raise ContractError(
+                "failed to verify deposit balance merkle proof")
+        mintedSoFar = self._get('_mints', accountRef)
+        if mintedSoFar is None:
+            amountToTransfer = balance
+        else:
+            amountToTransfer = Bignum(balance - int(mintedSoFar))
+        require(amountToTransfer > 0, "make a deposit before minting")
+        mintAddress = self._get('_bridgeTokens', tokenOrigin)
+        if mintAddress is None:
+            mintAddress = self.ctx.deploy(MintedToken, [tokenOrigin])
+            self._set('_bridgeTokens', mintAddress, tokenOrigin)
+            self._set('_mintedTokens', tokenOrigin, mintAddress)
+        self._set('_mints', str(balance), accountRef)
+        self._call(mintAddress, "mint", receiver, amountToTransfer)
+        self._event("mint", self.sender, receiver, amountToTransfer,
+                    tokenOrigin)
+        return mintAddress, amountToTransfer
+
+    def burn(self, receiver, amount, mintAddress):
+        _typecheck(receiver, 'address')
+        _typecheck(amount, 'ubig')
+        require(amount > 0, "amount must be positive")
+        originAddress = self._get('_mintedTokens', mintAddress)
+        require(originAddress is not None,
+                "cannot burn token : must have been minted by bridge")
+        accountRef = receiver + originAddress
+        old = self._get('_burns', accountRef)
+        if old is None:
+            burntBalance = amount
+        else:
+            burntBalance = Bignum(int(old) + amount)
+        self._set('_burns', str(burntBalance), accountRef)
+        self._call(mintAddress, "burn", self.sender, amount)
+        self._event("burn", self.sender, receiver, amount, mintAddress)
+        return originAddress
+
+    def unlock(self, receiver, balance, tokenAddress, merkleProof):
+        _typecheck(receiver, 'address')
+        _typecheck(tokenAddress, 'address')
+        _typecheck(balance, 'ubig')
+        require(balance > 0, "unlockable balance must be positive")
+        accountRef = receiver + tokenAddress
+        balanceStr = '"{}"'.format(balance)
+        if not self._verifyDepositProof("_burns", accountRef, balanceStr,
+                                        merkleProof):
+            raise ContractError("failed to verify burnt balance merkle proof")
+        unlockedSoFar = self._get('_unlocks', accountRef)
+        if unlockedSoFar is None:
+            amountToTransfer = balance
+        else:
+            amountToTransfer = Bignum(balance - int(unlockedSoFar))
+        require(amountToTransfer > 0, "burn minted tokens before unlocking")
+        self._set('_unlocks', str(balance), accountRef)
+        self._call(tokenAddress, "transfer", receiver, amountToTransfer)
+        self._event("unlock", self.sender, receiver, amountToTransfer,
+                    tokenAddress)
+        return amountToTransfer
+
+
+def parse_root_from_proto(proto: str) -> str:
+    """ Same as parseRootFromProto in oracle.lua: extract the storage root
+    (0x hex) of a serialized account state (0x hex).
+    """
+    def sub(i: int, j: int) -> str:
+        # lua string.sub
+        return proto[i - 1:j]
+
+    def byte(i: int) -> int:
+        try:
+            return int(sub(i, i + 1), 16)
+        except ValueError:
+            raise ContractError("attempt to compare nil with number")
+
+    index = 3
+    if sub(index, index + 1) == "08":
+        index += 2
+        for _ in range(index, len(proto) + 1, 2):
+            if byte(index) < 128:
+                index += 2
+                break
+            index += 2
+    if sub(index, index + 1) == "12":
+        index += 2
+        balanceLength = byte(index) * 2
+        require(balanceLength <= 32, "Invalid balance length")
+        index += balanceLength + 2
+    require(sub(index, index + 1) == "1a", "Invalid codeHash proto tag")
+    index += 2
+    require(sub(index, index + 1) == "20", "Invalid codeHash length")
+    index += 66
+    require(sub(index, index + 1) == "22", "Invalid storageRoot proto tag")
+    index += 2
+    require(sub(index, index + 1) == "20", "Invalid storageRoot length")
+    index += 2
+    return "0x" + sub(index, index + 63)
+
+
+class Oracle(Contract):
+    """ oracle.lua"""
+
+    functions = ('validateSignatures', 'parseRootFromProto',
+                 'verifyAergoStateProof', 'getValidators',
+                 'getForeignBlockchainState', 'validatorsUpdate',
+                 'oracleUpdate', 'tAnchorUpdate', 'tFinalUpdate',
+                 'newStateAnchor', 'newBridgeAnchor',
+                 'newStateAndBridgeAnchor')
+
+    def validateSignatures(self, hash_, signers, signatures):
+        nb = self._get('_validatorsCount')
+        require(isinstance(signers, list) and isinstance(signatures, list),
+                "attempt to get length of a nil value")
+        require(nb * 2 <= len(signers) * 3, "2/3 validators must sign")
+        for i, signer in enumerate(signers):
+            if i > 0:
+                require(signer > signers[i - 1],
+                        "All signers must be different")
+            validator = self._get('_validators', signer)
+            require(validator, "Signer index not registered")
+            sig = signatures[i] if i < len(signatures) else None
+            require(isinstance(sig, str)
+                    and crypto_ecverify(hash_, sig, validator),
+                    "Invalid signature")
+        return True
+
+    def parseRootFromProto(self, proto):
+        return parse_root_from_proto(proto)
+
+    def verifyAergoStateProof(self, proto, merkleProof):
+        root = _hex_bytes(self._get('_anchorRoot'))
+        key = _hex_bytes(self._get('_destinationBridgeKey'))
+        proto_bytes = _hex_bytes(proto)
+        if root is None or key is None or proto_bytes is None \
+                or not isinstance(merkleProof, list):
+            return False
+        try:
+            return verify_state_proof(root, key, proto_bytes, merkleProof)
+        except ValueError:
+            return False
+
+    def constructor(self, validators, bridge, destinationBridgeKey, tAnchor,
+                    tFinal):
+        self._set('_nonce', 0)
+        self._set('_validatorsCount', len(validators))
+        for i, addr in enumerate(validators):
+            _typecheck(addr, 'address')
+            self._set('_validators', addr, i + 1)
+        self._set('_bridge', bridge)
+        self._set('_destinationBridgeKey', destinationBridgeKey)
+        self._set('_tAnchor', tAnchor)
+        self._set('_tFinal', tFinal)
+        self._set('_anchorRoot', "constructor")
+        self._set('_anchorHeight', 0)
+        contract_id = crypto_sha256(self.ctx.address
+                                    + self.ctx.prev_block_hash)[2:34]
+        self._set('_contractId', contract_id)
+        return contract_id
+
+    def getValidators(self):
+        return [self._get('_validators', i + 1)
+                for i in range(self._get('_validatorsCount'))]
+
+    def getForeignBlockchainState(self):
+        return self._get('_anchorRoot'), self._get('_anchorHeight')
+
+    def _message(self, data: str, kind: str) -> Tuple[int, str]:
+        nonce = self._get('_nonce')
+        return nonce, crypto_sha256(
+            data + str(nonce) + self._get('_contractId') + kind)
+
+    def validatorsUpdate(self, validators, signers, signatures):
+        oldNonce, message = self._message("".join(validators), "V")
+        require(self.validateSignatures(message, signers, signatures),
+                "Failed new validators signature validation")
+        oldCount = self._get('_validatorsCount')
+        if len(validators) < oldCount:
+            diff = oldCount - len(validators)
+            # like the lua contract, deletes the slots after oldCount so
+            # the slots of removed validators are left in the state
+            for i in range(1, diff + 2):
+                self._delete('_validators', oldCount + i)
+        self._set('_validatorsCount', len(validators))
+        for i, addr in enumerate(validators):
+            _typecheck(addr, 'address')
+            self._set('_validators', addr, i + 1)
+        self._set('_nonce', oldNonce + 1)
+        self._event("validatorsUpdate", self.sender, *validators)
+
+    def oracleUpdate(self, newOracle, signers, signatures):
+        oldNonce, message = self._message(newOracle, "O")
+        require(self.validateSignatures(message, signers, signatures),
+                "Failed new oracle signature validation")
+        self._set('_nonce', oldNonce + 1)
+        self._call(self._get('_bridge'), "oracleUpdate", newOracle)
+
+    def tAnchorUpdate(self, tAnchor, signers, signatures):
+        oldNonce, message = self._message(str(tAnchor), "A")
+        require(self.validateSignatures(message, signers, signatures),
+                "Failed tAnchor signature validation")
+        self._set('_nonce', oldNonce + 1)
+        self._set('_tAnchor', tAnchor)
+        self._call(self._get('_bridge'), "tAnchorUpdate", tAnchor)
+
+    def tFinalUpdate(self, tFinal, signers, signatures):
+        oldNonce, message = self._message(str(tFinal), "F")
+        require(self.validateSignatures(message, signers, signatures),
+                "Failed tFinal signature validation")
+        self._set('_nonce', oldNonce + 1)
+        self._set('_tFinal', tFinal)
+        self._call(self._get('_bridge'), "tFinalUpdate", tFinal)
+
+    def newStateAnchor(self, root, height, signers, signatures):
+        require(height > self._get('_anchorHeight') + self._get('_tAnchor'),
+                "Next anchor height not reached")
+        oldNonce, message = self._message(
+            root[2:] + ',' + str(height), "R")
+        require(self.validateSignatures(message, signers, signatures),
+                "Failed signature validation")
+        self._set('_nonce', oldNonce + 1)
+        self._set('_anchorRoot', root)
+        self._set('_anchorHeight', height)
+        self._event("newAnchor", self.sender, height, root)
+
+    def newBridgeAnchor(self, proto, merkleProof):
+        root = parse_root_from_proto(proto)
+        if not self.verifyAergoStateProof(proto, merkleProof):
+            raise ContractError(
+                "Failed to verify bridge contract protobuf merkle proof")
+        self._call(self._get('_bridge'), "newAnchor", root,
+                   self._get('_anchorHeight'))
+
+    def newStateAndBridgeAnchor(self, stateRoot, height, signers, signatures,
+                                proto, merkleProof):
+        self.newStateAnchor(stateRoot, height, signers, signatures)
+        self.newBridgeAnchor(proto, merkleProof)
@@ -0,0 +1,232 @@
+import logging
+import queue
+import threading
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import aergo.herapy as herapy
+
+logger = logging.getLogger(__name__)
+
+# get_events can query at most 10000 blocks at once
+EVENTS_RANGE = 10000
+
+# (block height, tx hash, event index) of an event
+EventId = Tuple[int, str, int]
+
+
+class Subscription:
+    """ Events of a contract received from an EventMux.
+
+    Events are queued until read with get() or by iterating the
+    subscription. When max_queue events are waiting, the oldest one is
+    dropped and counted in dropped, so a slow subscriber never blocks the
+    others.
+    """
+
+    def __init__(self, feed: '_Feed', max_queue: int) -> None:
+        self._feed = feed
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self.dropped = 0
+        self.closed = False
+
+    def _put(self, event) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float = None):
+        """ Return the next event, raises TimeoutError if no event is
+        received within timeout seconds.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                "No {} event received from {} in {}s".format(
+                    self._feed.event_name, self._feed.contract, timeout))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.get()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._feed.unsubscribe(self)
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _Feed:
+    """ One event stream subscription fanned out to Subscriptions."""
+
+    def __init__(
+        self,
+        mux: 'EventMux',
+        contract: str,
+        event_name: str,
+    ) -> None:
+        self.mux = mux
+        self.contract = contract
+        self.event_name = event_name
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._stream = None
+        self._thread: Optional[threading.Thread] = None
+        # height to resume from after a reconnect and the events already
+        # delivered at that height
+        self._height = 0
+        self._seen: Set[EventId] = set()
+
+    def subscribe(self, max_queue: int) -> Subscription:
+        subscription = Subscription(self, max_queue)
+        with self._lock:
+            self._subscribers.append(subscription)
+            if self._thread is None:
+                try:
+                    self._open()
+                except Exception:
+                    self._subscribers.remove(subscription)
+                    raise
+                self._thread = threading.Thread(
+                    target=self._run, name="{} {} events".format(
+                        self.contract[:8], self.event_name),
+                    daemon=True
+                )
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            if len(self._subscribers) == 0 and self._stream is not None:
+                self._stream.cancel()
+
+    def _open(self) -> None:
+        # called with self._lock held
+        if self._height == 0:
+            _, self._height = self.mux.aergo.get_blockchain_status()
+            self._seen = set()
+        self._stream = self.mux.aergo.receive_event_stream(
+            self.contract, self.event_name, start_block_no=self._height)
+
+    def _idle(self) -> bool:
+        # called with self._lock held, the listener stops when idle
+        if len(self._subscribers) > 0 and not self.mux.closed:
+            return False
+        self._thread = None
+        self._stream = None
+        self._height = 0
+        return True
+
+    def _run(self) -> None:
+        while True:
+            stream = self._stream
+            if stream is not None:
+                try:
+                    for event in stream:
+                        self._deliver(event)
+                except Exception as e:
+                    if not stream.cancelled():
+                        logger.warning("%s event stream interrupted: %s",
+                                       self.event_name, e)
+            with self._lock:
+                self._stream = None
+                if self._idle():
+                    return
+            self.mux._stop.wait(self.mux.retry_delay)
+            with self._lock:
+                if self._idle():
+                    return
+                # resume from the last block an event was received at
+                try:
+                    self._open()
+                except Exception as e:
+                    logger.warning("%s event stream reconnection failed: %s",
+                                   self.event_name, e)
+
+    def _deliver(self, event) -> None:
+        event_id = (event.block_height, str(event.tx_hash), event.index)
+        with self._lock:
+            if event.block_height < self._height or event_id in self._seen:
+                # already delivered before a reconnect
+                return
+            if event.block_height > self._height:
+                self._height = event.block_height
+                self._seen = set()
+            self._seen.add(event_id)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription._put(event)
+
+
+class EventMux:
+    """ Share the event streams of an aergo node between consumers.
+
+    One stream is opened per (contract, event name) while at least one
+    Subscription to it is open and its events are fanned out to every
+    subscriber. If the stream is interrupted, it is reopened from the
+    last block an event was received at, and events already delivered
+    are not delivered again.
+    Subscriptions receive the events emitted after they are created (and
+    possibly other events of the current block).
+    """
+
+    def __init__(self, aergo: herapy.Aergo, retry_delay: float = 1) -> None:
+        self.aergo = aergo
+        self.retry_delay = retry_delay
+        self.closed = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._feeds: Dict[Tuple[str, str], _Feed] = {}
+
+    def subscribe(
+        self,
+        contract: str,
+        event_name: str,
+        max_queue: int = 1000,
+    ) -> Subscription:
+        """ Subscribe to the event_name events of contract (all events of
+        the contract if event_name is ""). The subscription should be
+        closed when not needed anymore.
+        """
+        with self._lock:
+            if self.closed:
+                raise ValueError("Event mux closed")
+            feed = self._feeds.get((contract, event_name))
+            if feed is None:
+                feed = _Feed(self, contract, event_name)
+                self._feeds[(contract, event_name)] = feed
+        return feed.subscribe(max_queue)
+
+    def close(self) -> None:
+        """ Close all the streams, subscribers stop receiving events."""
+        with self._lock:
+            self.closed = True
+            feeds = list(self._feeds.values())
+        self._stop.set()
+        for feed in feeds:
+            with feed._lock:
+                if feed._stream is not None:
+                    feed._stream.cancel()
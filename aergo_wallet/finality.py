@@ -0,0 +1,107 @@
+import threading
+import time
+
+from typing import (
+    Optional,
+)
+
+import aergo.herapy as herapy
+from aergo.herapy.obj.block_meta_stream import (
+    BlockMetaStream,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_lib(aergo: herapy.Aergo) -> int:
+    """ Return the last irreversible block height of the node."""
+    status = aergo.get_status()
+    return status.consensus_info.status['LibNo']
+
+
+class FinalityWaiter:
+    """ Wait for blocks of an aergo node to become final.
+
+    While at least one thread is waiting, a single block stream
+    subscription is open and the last irreversible block (LIB) is
+    refreshed each time a new block is received, so waiters return as
+    soon as their height is final whatever the block time of the chain.
+    The subscription is closed when no thread is waiting anymore.
+    """
+
+    def __init__(self, aergo: herapy.Aergo) -> None:
+        self.aergo = aergo
+        self.lib = -1
+        self._cond = threading.Condition()
+        self._waiters = 0
+        self._stream = None
+        self._listener: Optional[threading.Thread] = None
+
+    def wait(self, height: int = None, timeout: float = None) -> int:
+        """ Block until height (the current best height by default) is
+        at or below the LIB and return the LIB.
+        Raises TimeoutError if height is not final after timeout seconds.
+        """
+        if height is None:
+            height = self.aergo.get_status().best_block_height
+        self._update_lib(get_lib(self.aergo))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiters += 1
+            try:
+                while self.lib < height:
+                    if self._listener is None:
+                        self._start_listener()
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError(
+                                "Block {} not final after {}s, LIB: {}"
+                                .format(height, timeout, self.lib))
+                    self._cond.wait(remaining)
+                return self.lib
+            finally:
+                self._waiters -= 1
+                if self._waiters == 0 and self._stream is not None:
+                    self._stream.cancel()
+
+    def _update_lib(self, lib: int) -> None:
+        with self._cond:
+            if lib > self.lib:
+                self.lib = lib
+                self._cond.notify_all()
+
+    def _start_listener(self) -> None:
+        # called with self._cond held
+        # receive_block_meta_stream of herapy 2.0.1 wraps the block
+        # metadata stream in a BlockStream, which fails to parse the
+        # metadata: rewrap it
+        self._stream = BlockMetaStream(
+            self.aergo.receive_block_meta_stream()._grpc_stream)
+        self._listener = threading.Thread(
+            target=self._listen, args=(self._stream,),
+            name="finality listener", daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self, stream) -> None:
+        try:
+            for _ in stream:
+                self._update_lib(get_lib(self.aergo))
+                with self._cond:
+                    if self._waiters == 0:
+                        break
+        except Exception as e:
+            if not stream.cancelled():
+                logger.warning("Block stream interrupted: %s", e)
+                # don't resubscribe in a loop while the node is down
+                time.sleep(1)
+        finally:
+            with self._cond:
+                if self._stream is stream:
+                    self._stream = None
+                    self._listener = None
+                # waiters restart a listener if they still need one
+                self._cond.notify_all()
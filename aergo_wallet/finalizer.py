@@ -0,0 +1,357 @@
+import argparse
+from getpass import getpass
+import logging
+import threading
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import aergo.herapy as herapy
+from aergo.herapy.errors.exception import (
+    CommunicationException,
+)
+from aergo.herapy.errors.general_exception import (
+    GeneralException,
+)
+
+from aergo_wallet.wallet import (
+    AergoWallet,
+)
+from aergo_wallet.transfer_store import (
+    ANCHORED,
+    FAILED,
+    FINALIZED,
+    TransferStore,
+)
+from aergo_wallet.wallet_utils import (
+    NO_DEPOSIT_ERROR,
+    TX_BATCH_SIZE,
+    get_anchor_height,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AutoFinalizer:
+    """ Finalize the transfers recorded in a TransferStore as soon as they
+    are anchored.
+
+    Each (from_chain, to_chain) bridge direction has one thread subscribed
+    to the newAnchor events of the bridge contract on to_chain (through the
+    event streams shared by the wallet). When an anchor is received, every
+    pending deposit at or below the anchored height is minted/unlocked with
+    finalize_many: proofs are built against that anchor so no transfer
+    waits for an anchor of its own.
+    """
+
+    def __init__(
+        self,
+        wallet: AergoWallet,
+        store: TransferStore,
+        bridges: List[Tuple[str, str]],
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        batch_size: int = TX_BATCH_SIZE,
+        retry_delay: float = 10,
+    ) -> None:
+        self.wallet = wallet
+        self.store = store
+        self.bridges = bridges
+        self.privkey_name = privkey_name
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        if privkey_pwd is None:
+            keystore_path = wallet.config_data(
+                'wallet', privkey_name, 'keystore')
+            with open(keystore_path, "r") as f:
+                keystore = f.read()
+            while True:
+                try:
+                    privkey_pwd = getpass("Decrypt exported private key '{}'"
+                                          "\nPassword: ".format(privkey_name))
+                    herapy.Account.decrypt_from_keystore(keystore, privkey_pwd)
+                    break
+                except GeneralException:
+                    logger.info("Wrong password, try again")
+        self.privkey_pwd = privkey_pwd
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # txs on a network are sent by one thread at a time so bridges
+        # towards the same network don't use the same nonces
+        self._tx_locks: Dict[str, threading.Lock] = {
+            to_chain: threading.Lock() for _, to_chain in bridges
+        }
+
+    def start(self) -> None:
+        for from_chain, to_chain in self.bridges:
+            t = threading.Thread(
+                target=self._follow_anchors, args=(from_chain, to_chain),
+                name="{} -> {} finalizer".format(from_chain, to_chain),
+                daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def run(self) -> None:
+        """ Finalize transfers until interrupted."""
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            logger.info("Shutting down finalizer")
+        finally:
+            self.stop()
+
+    def _follow_anchors(self, from_chain: str, to_chain: str) -> None:
+        bridge_to = self.wallet.config_data(
+            'networks', to_chain, 'bridges', from_chain, 'addr')
+        while not self._stop.is_set():
+            try:
+                # the wallet's event stream reconnects by itself, subscribe
+                # before checking the anchored height so no anchor is missed
+                with self.wallet._event_mux(to_chain).subscribe(
+                        bridge_to, "newAnchor") as anchors:
+                    aergo_to = self.wallet._connect_aergo(to_chain)
+                    try:
+                        anchor_height = get_anchor_height(aergo_to, bridge_to)
+                    finally:
+                        self.wallet._pool.release(aergo_to)
+                    # deposits anchored while the finalizer was stopped
+                    self.finalize_anchored(from_chain, to_chain,
+                                           anchor_height)
+                    while not self._stop.is_set():
+                        try:
+                            event = anchors.get(timeout=1)
+                        except TimeoutError:
+                            continue
+                        self.finalize_anchored(
+                            from_chain, to_chain, event.arguments[1])
+            except Exception:
+                if self._stop.is_set():
+                    break
+                logger.warning(
+                    "%s -> %s finalizer interrupted, retrying in %ss",
+                    from_chain, to_chain, self.retry_delay, exc_info=True
+                )
+                self._stop.wait(self.retry_delay)
+
+    def finalize_anchored(
+        self,
+        from_chain: str,
+        to_chain: str,
+        anchor_height: int,
+    ) -> int:
+        """ Finalize the pending transfers from_chain -> to_chain with a
+        deposit height at or below anchor_height and return the number of
+        transfers finalized. Transfers failing with a transient error stay
+        anchored and are retried with the next anchor.
+        """
+        self.store.mark_anchored(from_chain, to_chain, anchor_height)
+        finalized = 0
+        retry = False
+        while not retry and not self._stop.is_set():
+            transfers = self.store.pending(
+                from_chain, to_chain, max_height=anchor_height,
+                status=(ANCHORED,), limit=self.batch_size
+            )
+            if len(transfers) == 0:
+                break
+            # a mint/unlock withdraws every anchored deposit of a receiver
+            # so there is one withdrawal per (asset, receiver)
+            deposits: Dict[Tuple[str, str], List[Dict]] = {}
+            for transfer in transfers:
+                deposits.setdefault(
+                    (transfer['asset_name'], transfer['receiver']), []
+                ).append(transfer)
+            withdrawals = []
+            for (asset_name, receiver), group in deposits.items():
+                if not self._is_registered(from_chain, to_chain, asset_name):
+                    for transfer in group:
+                        self.store.mark_failed(
+                            transfer['id'], "Asset {} not registered"
+                            .format(asset_name))
+                    continue
+                height = max(transfer['deposit_height'] for transfer in group)
+                withdrawals.append((asset_name, receiver, height))
+            if len(withdrawals) == 0:
+                continue
+            with self._tx_locks[to_chain]:
+                results = self.wallet.finalize_many(
+                    from_chain, to_chain, withdrawals, self.privkey_name,
+                    self.privkey_pwd
+                )
+            for (asset_name, receiver, _), (tx_hash, err) in \
+                    zip(withdrawals, results):
+                status = self._withdrawal_status(
+                    from_chain, to_chain, asset_name, receiver, tx_hash, err)
+                if status == FINALIZED:
+                    finalized += self.store.mark_finalized(
+                        from_chain, to_chain, asset_name, receiver,
+                        anchor_height, tx_hash
+                    )
+                    continue
+                if status == ANCHORED:
+                    # retried with the next anchor instead of selecting
+                    # the same transfers again now
+                    logger.warning("Failed to finalize %s transfer to %s, "
+                                   "retrying later: %s",
+                                   asset_name, receiver, err)
+                    retry = True
+                    continue
+                logger.warning("Failed to finalize %s transfer to %s: %s",
+                               asset_name, receiver, err)
+                for transfer in deposits[(asset_name, receiver)]:
+                    self.store.mark_failed(transfer['id'], err)
+        if finalized > 0:
+            logger.info("\u2693 Finalized %s %s -> %s transfers anchored at "
+                        "height %s", finalized, from_chain, to_chain,
+                        anchor_height)
+        return finalized
+
+    def _withdrawal_status(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str,
+        tx_hash: Optional[str],
+        err: Optional[str],
+    ) -> str:
+        """ Status of transfers after finalize_many returned (tx_hash, err)
+        for their withdrawal: ANCHORED on transient errors (tx not submitted
+        or rejected by the node, receipt not found). When there was no
+        deposit in the anchored state or the withdrawal tx executed with an
+        error, the balances of the bridge decide.
+        """
+        if err is None:
+            return FINALIZED
+        if tx_hash is None and err != NO_DEPOSIT_ERROR:
+            return ANCHORED
+        aergo_to = self.wallet._connect_aergo(to_chain)
+        try:
+            if tx_hash is not None:
+                # wait_tx_result may have timed out before the tx was
+                # executed
+                result = aergo_to.get_tx_result(tx_hash)
+                if result.status == herapy.TxResultStatus.SUCCESS:
+                    return FINALIZED
+                if result.status != herapy.TxResultStatus.ERROR:
+                    return ANCHORED
+            return self._balance_status(
+                aergo_to, from_chain, to_chain, asset_name, receiver)
+        except CommunicationException:
+            return ANCHORED
+        finally:
+            self.wallet._pool.release(aergo_to)
+
+    def _balance_status(
+        self,
+        aergo_to: herapy.Aergo,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str,
+    ) -> str:
+        """ Status of the transfers of receiver when no withdrawal of
+        theirs succeeded: ANCHORED while a balance is withdrawable (the
+        proof was verified against an anchor replaced before the tx
+        executed), FINALIZED if the mints/unlocks already cover the
+        anchored deposits (withdrawn by another tx) and FAILED if nothing
+        was deposited.
+        """
+        func, token_origin = self.wallet._withdrawal_functions(
+            from_chain, to_chain, [(asset_name, receiver, 0)])[0]
+        if func == "mint":
+            get_balances = self.wallet.get_mintable_balances
+            withdraw_key = "_sv__mints-"
+        else:
+            get_balances = self.wallet.get_unlockable_balances
+            withdraw_key = "_sv__unlocks-"
+        withdrawable, _ = get_balances(
+            from_chain, to_chain, [(receiver, asset_name)])[0]
+        if withdrawable > 0:
+            return ANCHORED
+        bridge_to = self.wallet.config_data(
+            'networks', to_chain, 'bridges', from_chain, 'addr')
+        withdrawn = aergo_to.query_sc_state(
+            bridge_to, [withdraw_key + receiver + token_origin]
+        ).var_proofs[0]
+        if withdrawn.inclusion and \
+                int(withdrawn.value.decode('utf-8')[1:-1]) > 0:
+            return FINALIZED
+        return FAILED
+
+    def _is_registered(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+    ) -> bool:
+        try:
+            self.wallet.config_data(
+                'networks', from_chain, 'tokens', asset_name, 'addr')
+            return True
+        except KeyError:
+            pass
+        try:
+            self.wallet.config_data(
+                'networks', to_chain, 'tokens', asset_name, 'pegs',
+                from_chain)
+            return True
+        except KeyError:
+            return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Finalize pending transfers between 2 Aergo networks '
+                    'when they are anchored.')
+    # Add arguments
+    parser.add_argument(
+        '-c', '--config_file_path', type=str, help='Path to config.json',
+        required=True
+    )
+    parser.add_argument(
+        '--net1', type=str, help='Name of Aergo network in config file',
+        required=True
+    )
+    parser.add_argument(
+        '--net2', type=str, help='Name of Aergo network in config file',
+        required=True
+    )
+    parser.add_argument(
+        '--db', type=str, help='Path to the transfer store database',
+        default='./aergo_cli/transfers.db'
+    )
+    parser.add_argument(
+        '--privkey_name', type=str, help='Name of account in config file '
+        'to sign mint/unlock txs', default='default'
+    )
+    parser.add_argument(
+        '--privkey_pwd', type=str, help='Password to decrypt privkey_name',
+        required=False
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s %(threadName)s %(message)s')
+
+    wallet = AergoWallet(args.config_file_path)
+    store = TransferStore(args.db)
+    finalizer = AutoFinalizer(
+        wallet, store, [(args.net1, args.net2), (args.net2, args.net1)],
+        args.privkey_name, args.privkey_pwd
+    )
+    finalizer.run()
+    store.close()
+    wallet.close()
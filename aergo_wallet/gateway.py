@@ -0,0 +1,313 @@
+import argparse
+from collections import (
+    OrderedDict,
+)
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+import json
+import logging
+import threading
+
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Tuple,
+)
+
+from aergo_wallet.wallet import (
+    AergoWallet,
+)
+from aergo_wallet.exceptions import (
+    InvalidArgumentsError,
+)
+from aergo_wallet.wallet_utils import (
+    get_block_root,
+)
+
+logger = logging.getLogger(__name__)
+
+DEPOSIT_EVENTS = ("lock", "burn")
+WITHDRAW_EVENTS = ("mint", "unlock")
+
+Key = Tuple[str, ...]
+
+
+class BridgeGateway:
+    """ Read-only http api of the bridge between net1 and net2 served from
+    a cache, so read traffic from users doesn't reach the aergo nodes:
+        - /status/<from_chain>/<to_chain> : anchor height and root,
+          t_anchor, t_final and validators of the from_chain -> to_chain
+          bridge
+        - /balance/<from_chain>/<to_chain>/<account>/<asset_name> :
+          withdrawable and pending balance of an account (amounts are
+          strings)
+
+    Cached responses are invalidated by the events of the bridge and
+    oracle contracts: a newAnchor invalidates the status and balances of
+    its direction, a deposit or withdrawal the balances of its receiver,
+    a settings update the status.
+    """
+
+    def __init__(
+        self,
+        wallet: AergoWallet,
+        net1: str,
+        net2: str,
+        port: int,
+        host: str = '',
+        max_entries: int = 10000,
+    ) -> None:
+        self.wallet = wallet
+        self.max_entries = max_entries
+        # network -> (bridge address, oracle address, other network)
+        self.bridges = {
+            net1: (wallet.config_data('networks', net1, 'bridges', net2,
+                                      'addr'),
+                   wallet.config_data('networks', net1, 'bridges', net2,
+                                      'oracle'), net2),
+            net2: (wallet.config_data('networks', net2, 'bridges', net1,
+                                      'addr'),
+                   wallet.config_data('networks', net2, 'bridges', net1,
+                                      'oracle'), net1),
+        }
+        self._lock = threading.Lock()
+        self._cache: OrderedDict = OrderedDict()
+        # incremented by each invalidation, a response fetched while an
+        # invalidation happened is not cached
+        self._generation = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._subscriptions: List = []
+
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, response = gateway.handle(self.path)
+                body = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+
+    def start(self) -> None:
+        # subscribe before serving so no invalidation is missed
+        for network, (bridge, oracle, _) in self.bridges.items():
+            mux = self.wallet._event_mux(network)
+            for contract, event_name in [(bridge, ""),
+                                         (oracle, "validatorsUpdate")]:
+                subscription = mux.subscribe(contract, event_name)
+                self._subscriptions.append(subscription)
+                t = threading.Thread(
+                    target=self._invalidate_on_events,
+                    args=(network, subscription),
+                    name="{} gateway events".format(network), daemon=True
+                )
+                t.start()
+                self._threads.append(t)
+        t = threading.Thread(target=self.httpd.serve_forever,
+                             name="gateway server", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for subscription in self._subscriptions:
+            subscription.close()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        self._subscriptions = []
+
+    def run(self) -> None:
+        """ Serve until interrupted."""
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            logger.info("Shutting down gateway")
+        finally:
+            self.stop()
+
+    def handle(self, path: str) -> Tuple[int, Dict]:
+        """ Return the http status and json response of a request path."""
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        try:
+            if len(parts) == 3 and parts[0] == "status":
+                return 200, self.status(parts[1], parts[2])
+            if len(parts) == 5 and parts[0] == "balance":
+                return 200, self.balance(*parts[1:])
+        except (KeyError, InvalidArgumentsError) as e:
+            return 400, {"error": "Invalid request: {}".format(e)}
+        except Exception as e:
+            logger.warning("Failed to serve %s", path, exc_info=True)
+            return 502, {"error": "Node query failed: {}".format(e)}
+        return 404, {"error": "Unknown path {}".format(path)}
+
+    def status(self, from_chain: str, to_chain: str) -> Dict:
+        bridge_to, oracle_to, other = self.bridges[to_chain]
+        if other != from_chain:
+            raise KeyError(from_chain)
+        return self._cached(
+            ("status", from_chain, to_chain),
+            lambda: self._query_status(to_chain, bridge_to, oracle_to)
+        )
+
+    def balance(
+        self,
+        from_chain: str,
+        to_chain: str,
+        account: str,
+        asset_name: str,
+    ) -> Dict:
+        if self.bridges[to_chain][2] != from_chain:
+            raise KeyError(from_chain)
+
+        def query() -> Dict:
+            try:
+                self.wallet.config_data(
+                    'networks', from_chain, 'tokens', asset_name, 'addr')
+                get_balance = self.wallet.get_mintable_balance
+            except KeyError:
+                # asset of to_chain burnt on from_chain
+                get_balance = self.wallet.get_unlockable_balance
+            withdrawable, pending = get_balance(
+                from_chain, to_chain, asset_name, account_addr=account)
+            return {"withdrawable": str(withdrawable),
+                    "pending": str(pending)}
+        return self._cached(
+            ("balance", from_chain, to_chain, account, asset_name), query)
+
+    def _query_status(self, network: str, bridge: str, oracle: str) -> Dict:
+        aergo = self.wallet._connect_aergo(network)
+        try:
+            # read the bridge and oracle at the same state root
+            _, best_height = aergo.get_blockchain_status()
+            root = get_block_root(aergo, best_height)
+            state = aergo.query_sc_state(
+                bridge, ["_sv__anchorHeight", "_sv__anchorRoot",
+                         "_sv__tAnchor", "_sv__tFinal"], root=root)
+            height, anchor_root, t_anchor, t_final = [
+                json.loads(var_proof.value) for var_proof in state.var_proofs]
+            count = aergo.query_sc_state(
+                oracle, ["_sv__validatorsCount"], root=root)
+            nb_validators = int(count.var_proofs[0].value)
+            validators = []
+            if nb_validators > 0:
+                validators = aergo.query_sc_state(
+                    oracle, ["_sv__validators-" + str(i + 1)
+                             for i in range(nb_validators)], root=root
+                ).var_proofs
+        finally:
+            self.wallet._pool.release(aergo)
+        # the best height read here would be stale as soon as cached, it is
+        # not part of the status
+        return {
+            "anchor_height": height,
+            "anchor_root": anchor_root,
+            "t_anchor": t_anchor,
+            "t_final": t_final,
+            "validators": [json.loads(v.value) for v in validators],
+        }
+
+    def _cached(self, key: Key, query: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            response = self._cache.get(key)
+            if response is not None:
+                self._cache.move_to_end(key)
+                return response
+            generation = self._generation
+        response = query()
+        with self._lock:
+            if generation == self._generation:
+                self._cache[key] = response
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return response
+
+    def invalidate(self, match: Callable[[Key], bool] = None) -> None:
+        """ Drop the cached responses with a key matching match (all by
+        default).
+        """
+        with self._lock:
+            self._generation += 1
+            if match is None:
+                self._cache.clear()
+                return
+            for key in [key for key in self._cache if match(key)]:
+                del self._cache[key]
+
+    def _invalidate_on_events(self, network: str, subscription) -> None:
+        _, _, other = self.bridges[network]
+        dropped = 0
+        while not self._stop.is_set():
+            try:
+                event = subscription.get(timeout=1)
+            except TimeoutError:
+                continue
+            if subscription.dropped != dropped:
+                # missed events, anything could have changed
+                dropped = subscription.dropped
+                self.invalidate()
+            if event.name in DEPOSIT_EVENTS:
+                # deposit from network, its receiver has a new pending
+                # balance
+                receiver = event.arguments[0 if event.name == "lock" else 1]
+                self.invalidate(lambda key: key[:3] == (
+                    "balance", network, other) and key[3] == receiver)
+            elif event.name in WITHDRAW_EVENTS:
+                receiver = event.arguments[1]
+                self.invalidate(lambda key: key[:3] == (
+                    "balance", other, network) and key[3] == receiver)
+            elif event.name == "newAnchor":
+                # deposits of other are now withdrawable on network
+                self.invalidate(lambda key: key[1:3] == (other, network))
+            else:
+                # settings or validators update
+                self.invalidate(
+                    lambda key: key == ("status", other, network))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serve the bridge status and balances over http.')
+    # Add arguments
+    parser.add_argument(
+        '-c', '--config_file_path', type=str, help='Path to config.json',
+        required=True
+    )
+    parser.add_argument(
+        '--net1', type=str, help='Name of Aergo network in config file',
+        required=True
+    )
+    parser.add_argument(
+        '--net2', type=str, help='Name of Aergo network in config file',
+        required=True
+    )
+    parser.add_argument(
+        '--port', type=int, help='Port to serve on', required=True
+    )
+    parser.add_argument(
+        '--host', type=str, help='Address to serve on', default=''
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(message)s')
+
+    wallet = AergoWallet(args.config_file_path)
+    gateway = BridgeGateway(wallet, args.net1, args.net2, args.port,
+                            args.host)
+    gateway.run()
+    wallet.close()
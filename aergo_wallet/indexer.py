@@ -0,0 +1,393 @@
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+import aergo.herapy as herapy
+
+from aergo_wallet.wallet import (
+    AergoWallet,
+)
+from aergo_wallet.event_mux import (
+    EVENTS_RANGE,
+)
+from aergo_wallet.exceptions import (
+    InvalidArgumentsError,
+)
+
+logger = logging.getLogger(__name__)
+
+DEPOSIT_EVENTS = ("lock", "burn")
+WITHDRAW_EVENTS = ("mint", "unlock")
+INDEXED_EVENTS = DEPOSIT_EVENTS + WITHDRAW_EVENTS + ("newAnchor",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    chain TEXT NOT NULL,
+    name TEXT NOT NULL,
+    block_height INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    event_idx INTEGER NOT NULL,
+    receiver TEXT NOT NULL,
+    token_origin TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    PRIMARY KEY (chain, tx_hash, event_idx)
+);
+CREATE INDEX IF NOT EXISTS events_account
+    ON events (chain, receiver, token_origin);
+CREATE TABLE IF NOT EXISTS anchors (
+    chain TEXT PRIMARY KEY,
+    height INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    chain TEXT PRIMARY KEY,
+    height INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS minted_tokens (
+    chain TEXT NOT NULL,
+    mint_address TEXT NOT NULL,
+    token_origin TEXT NOT NULL,
+    PRIMARY KEY (chain, mint_address)
+);
+"""
+
+
+class BridgeIndexer:
+    """ Index the deposit (lock, burn), withdrawal (mint, unlock) and
+    newAnchor events of the bridge contracts between net1 and net2 into a
+    SQLite database.
+
+    Past events are backfilled with get_events by ranges of EVENTS_RANGE
+    blocks, then each bridge contract is followed through the event streams
+    shared by the wallet.
+    Withdrawable and pending balances are then computed from local data:
+    the withdrawable balance is the sum of deposits at or below the last
+    anchored height minus the withdrawals, and the pending balance is the
+    sum of the deposits above the last anchored height.
+    Proofs are only needed when the balance is actually withdrawn.
+    """
+
+    def __init__(
+        self,
+        wallet: AergoWallet,
+        db_path: str,
+        net1: str,
+        net2: str,
+        start_heights: Dict[str, int] = None,
+        retry_delay: float = 10,
+    ) -> None:
+        """ start_heights gives the height from which each network is
+        backfilled when it was never indexed (0 by default), typically the
+        height of the bridge deployment.
+        """
+        self.wallet = wallet
+        self.path = db_path
+        # network -> (bridge address, name of the other network)
+        self.bridges = {
+            net1: (wallet.config_data(
+                'networks', net1, 'bridges', net2, 'addr'), net2),
+            net2: (wallet.config_data(
+                'networks', net2, 'bridges', net1, 'addr'), net1),
+        }
+        if start_heights is None:
+            start_heights = {}
+        self.start_heights = start_heights
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def start(self) -> None:
+        for network in self.bridges:
+            t = threading.Thread(
+                target=self._follow, args=(network,),
+                name="{} indexer".format(network), daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def run(self) -> None:
+        """ Index events until interrupted."""
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            logger.info("Shutting down indexer")
+        finally:
+            self.stop()
+
+    def backfill(self, network: str, aergo: herapy.Aergo, to_height: int):
+        """ Index the events of the bridge on network up to to_height."""
+        bridge, _ = self.bridges[network]
+        start = self.indexed_height(network) + 1
+        while start <= to_height and not self._stop.is_set():
+            end = min(start + EVENTS_RANGE - 1, to_height)
+            # an empty event name matches all the events of the contract
+            events = aergo.get_events(bridge, "", start_block_no=start,
+                                      end_block_no=end)
+            self.index_events(network, aergo, events, end)
+            logger.info("Indexed %s bridge events up to block %s",
+                        network, end)
+            start = end + 1
+
+    def index_events(
+        self,
+        network: str,
+        aergo: herapy.Aergo,
+        events: List,
+        indexed_height: int = None,
+    ) -> None:
+        """ Record the bridge events of network in one transaction and
+        move the indexed height to indexed_height (the height of the last
+        event by default).
+        """
+        rows = []
+        anchor_height = None
+        for event in events:
+            if event.name == "newAnchor":
+                anchor_height = max(anchor_height or 0, event.arguments[1])
+                continue
+            if event.name not in DEPOSIT_EVENTS + WITHDRAW_EVENTS:
+                continue
+            if event.name == "lock":
+                receiver, amount, token_origin = event.arguments
+            else:
+                _, receiver, amount, token_origin = event.arguments
+            if event.name == "burn":
+                token_origin = self._token_origin(network, aergo,
+                                                  token_origin)
+            rows.append((
+                network, event.name, event.block_height, str(event.tx_hash),
+                event.index, receiver, token_origin, str(_amount(amount))
+            ))
+        if indexed_height is None:
+            if len(events) == 0:
+                return
+            indexed_height = max(event.block_height for event in events)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO events VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                if anchor_height is not None:
+                    self._conn.execute(
+                        "INSERT INTO anchors VALUES (?, ?) ON CONFLICT(chain)"
+                        " DO UPDATE SET height = MAX(height, excluded.height)",
+                        (network, anchor_height)
+                    )
+                self._conn.execute(
+                    "INSERT INTO cursors VALUES (?, ?) ON CONFLICT(chain) "
+                    "DO UPDATE SET height = MAX(height, excluded.height)",
+                    (network, indexed_height)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def indexed_height(self, network: str) -> int:
+        """ Return the height up to which network is indexed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT height FROM cursors WHERE chain = ?", (network,)
+            ).fetchone()
+        if row is None:
+            return self.start_heights.get(network, 0) - 1
+        return row[0]
+
+    def anchor_height(self, from_chain: str, to_chain: str) -> int:
+        """ Return the last height of from_chain anchored on to_chain."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT height FROM anchors WHERE chain = ?", (to_chain,)
+            ).fetchone()
+        if row is None:
+            return -1
+        return row[0]
+
+    def balances(
+        self,
+        from_chain: str,
+        to_chain: str,
+        receiver: str = None,
+    ) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """ Return the (withdrawable, pending) balances of every (receiver,
+        token origin) which deposited on from_chain towards to_chain, or
+        only those of receiver.
+        Raises InvalidArgumentsError while from_chain is indexed below the
+        last anchored height as anchored deposits could be missing.
+        """
+        anchor_height = self.anchor_height(from_chain, to_chain)
+        indexed_height = self.indexed_height(from_chain)
+        if indexed_height < anchor_height:
+            raise InvalidArgumentsError(
+                "{} is indexed up to block {}, below the anchored block {}"
+                .format(from_chain, indexed_height, anchor_height))
+        query = ("SELECT chain, name, block_height, receiver, token_origin, "
+                 "amount FROM events WHERE ((chain = ? AND name IN (?, ?)) "
+                 "OR (chain = ? AND name IN (?, ?)))")
+        params: List = [from_chain, *DEPOSIT_EVENTS,
+                        to_chain, *WITHDRAW_EVENTS]
+        if receiver is not None:
+            query += " AND receiver = ?"
+            params.append(receiver)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        # (receiver, token origin) -> [withdrawable, pending]
+        balances: Dict[Tuple[str, str], List[int]] = {}
+        for chain, name, height, account, token_origin, amount in rows:
+            balance = balances.setdefault((account, token_origin), [0, 0])
+            amount = int(amount)
+            if name in WITHDRAW_EVENTS:
+                balance[0] -= amount
+            elif height <= anchor_height:
+                balance[0] += amount
+            else:
+                balance[1] += amount
+        return {ref: (withdrawable, pending)
+                for ref, (withdrawable, pending) in balances.items()
+                if withdrawable != 0 or pending != 0}
+
+    def balance(
+        self,
+        from_chain: str,
+        to_chain: str,
+        receiver: str,
+        token_origin: str,
+    ) -> Tuple[int, int]:
+        """ Return the (withdrawable, pending) balance of receiver."""
+        return self.balances(from_chain, to_chain, receiver).get(
+            (receiver, token_origin), (0, 0))
+
+    def _token_origin(
+        self,
+        network: str,
+        aergo: herapy.Aergo,
+        mint_address: str,
+    ) -> str:
+        """ Return the origin of a token minted by the bridge on network."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token_origin FROM minted_tokens WHERE chain = ? "
+                "AND mint_address = ?", (network, mint_address)
+            ).fetchone()
+        if row is not None:
+            return row[0]
+        bridge, _ = self.bridges[network]
+        state = aergo.query_sc_state(
+            bridge, ["_sv__mintedTokens-" + mint_address])
+        if not state.var_proofs[0].inclusion:
+            raise InvalidArgumentsError(
+                "Token {} not minted by bridge {}"
+                .format(mint_address, bridge))
+        token_origin = json.loads(state.var_proofs[0].value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO minted_tokens VALUES (?, ?, ?)",
+                (network, mint_address, token_origin)
+            )
+        return token_origin
+
+    def _follow(self, network: str) -> None:
+        bridge, _ = self.bridges[network]
+        while not self._stop.is_set():
+            aergo = self.wallet._connect_aergo(network)
+            try:
+                # the wallet's event stream reconnects by itself, subscribe
+                # before backfilling so no event is missed, events received
+                # twice are ignored
+                with self.wallet._event_mux(network).subscribe(
+                        bridge, "") as events:
+                    _, best_height = aergo.get_blockchain_status()
+                    self.backfill(network, aergo, best_height)
+                    while not self._stop.is_set():
+                        try:
+                            event = events.get(timeout=1)
+                        except TimeoutError:
+                            # index the blocks without bridge events so the
+                            # indexed height follows the anchors
+                            _, best_height = aergo.get_blockchain_status()
+                            self.backfill(network, aergo, best_height)
+                            continue
+                        if events.dropped > 0:
+                            # events dropped while the indexer was behind
+                            events.dropped = 0
+                            _, best_height = aergo.get_blockchain_status()
+                            self.backfill(network, aergo, best_height)
+                        if event.name in INDEXED_EVENTS:
+                            self.index_events(network, aergo, [event])
+            except Exception:
+                if self._stop.is_set():
+                    break
+                logger.warning(
+                    "%s indexer interrupted, retrying in %ss", network,
+                    self.retry_delay, exc_info=True
+                )
+                self._stop.wait(self.retry_delay)
+            finally:
+                self.wallet._pool.release(aergo)
+
+
+def _amount(amount) -> int:
+    """ Parse an amount event argument, ubig are encoded as
+    {"_bignum": "<amount>"}.
+    """
+    if isinstance(amount, dict):
+        return int(amount['_bignum'])
+    return int(amount)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Index the bridge events between 2 Aergo networks.')
+    # Add arguments
+    parser.add_argument(
+        '-c', '--config_file_path', type=str, help='Path to config.json',
+        required=True
+    )
+    parser.add_argument(
+        '--net1', type=str, help='Name of Aergo network in config file',
+        required=True
+    )
+    parser.add_argument(
+        '--net2', type=str, help='Name of Aergo network in config file',
+        required=True
+    )
+    parser.add_argument(
+        '--db', type=str, help='Path to the index database',
+        default='./bridge_index.db'
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s %(threadName)s %(message)s')
+
+    wallet = AergoWallet(args.config_file_path)
+    indexer = BridgeIndexer(wallet, args.db, args.net1, args.net2)
+    indexer.run()
+    indexer.close()
+    wallet.close()
@@ -0,0 +1,198 @@
+from contextlib import (
+    contextmanager,
+)
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+import json
+import threading
+import time
+
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+)
+
+# latency buckets in seconds, from a local signature to a slow node
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _labels_str(labels: Labels) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, v) for k, v in labels) + "}"
+
+
+class Histogram:
+    """Cumulative latency histogram with prometheus style buckets."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Thread safe in-process registry of counters and histograms.
+
+    Metrics are identified by a name and a set of labels, for example
+    ('validator_rpc_requests_total', {'rpc': 'GetAnchorSignature'}).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            histograms = self._histograms.setdefault(name, {})
+            if key not in histograms:
+                histograms[key] = Histogram()
+            histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the time spent in the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels_key(labels), 0)
+
+    def snapshot(self) -> Dict:
+        """Return a json serializable copy of all metrics."""
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(labels), "value": value}
+                       for labels, value in values.items()]
+                for name, values in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(labels),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "buckets": dict(zip(
+                            [str(b) for b in h.buckets], h.counts))
+                    } for labels, h in values.items()
+                ]
+                for name, values in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def render(self) -> str:
+        """Render metrics in the prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, values in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append("# HELP {} {}".format(name, self._help[name]))
+                lines.append("# TYPE {} counter".format(name))
+                for labels, value in values.items():
+                    lines.append("{}{} {}".format(
+                        name, _labels_str(labels), value))
+            for name, hists in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append("# HELP {} {}".format(name, self._help[name]))
+                lines.append("# TYPE {} histogram".format(name))
+                for labels, h in hists.items():
+                    for bound, count in zip(h.buckets, h.counts):
+                        bucket_labels = labels + (("le", str(bound)),)
+                        lines.append("{}_bucket{} {}".format(
+                            name, _labels_str(bucket_labels), count))
+                    inf_labels = labels + (("le", "+Inf"),)
+                    lines.append("{}_bucket{} {}".format(
+                        name, _labels_str(inf_labels), h.count))
+                    lines.append("{}_sum{} {}".format(
+                        name, _labels_str(labels), h.sum))
+                    lines.append("{}_count{} {}".format(
+                        name, _labels_str(labels), h.count))
+        return "\n".join(lines) + "\n"
+
+
+# registry of the process used when no registry is given
+default_registry = MetricsRegistry()
+
+
+class MetricsServer:
+    """Serve a registry over http in a daemon thread:
+        - /metrics : prometheus text format
+        - /metrics.json : json snapshot
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        port: int,
+        host: str = '',
+    ) -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = registry.render().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body = json.dumps(registry.snapshot()).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # scrapes are frequent, don't spam the operator logs
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, name="metrics server",
+            daemon=True
+        )
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def shutdown(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
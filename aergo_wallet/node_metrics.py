@@ -0,0 +1,186 @@
+from functools import (
+    wraps,
+)
+import threading
+import time
+
+import aergo.herapy as herapy
+from aergo.herapy.obj.event import (
+    Event,
+)
+from aergo.herapy.obj.event_stream import (
+    EventStream,
+)
+
+from aergo_wallet.metrics import (
+    MetricsRegistry,
+    default_registry,
+)
+
+# the call being recorded by the current thread: [method, response bytes]
+_current = threading.local()
+
+
+def describe_node_metrics(registry: MetricsRegistry) -> None:
+    registry.describe(
+        "node_rpc_requests_total",
+        "Number of aergo node calls by network and method")
+    registry.describe(
+        "node_rpc_errors_total",
+        "Number of failed aergo node calls by network and method")
+    registry.describe(
+        "node_rpc_latency_seconds", "Latency of aergo node calls")
+    registry.describe(
+        "node_rpc_response_bytes_total",
+        "Size of the node responses received by aergo node calls")
+    registry.describe(
+        "node_stream_events_total",
+        "Number of events received from event streams by network and event")
+    registry.describe(
+        "node_stream_bytes_total",
+        "Size of the events received from event streams")
+
+
+def _instrumented(method):
+    """ Record the count, latency, errors and response size of an Aergo
+    method. Calls made inside another instrumented call (call_sc calls
+    batch_tx) are part of the outer call.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_current, "call", None) is not None:
+            return method(self, *args, **kwargs)
+        call = _current.call = [name, 0]
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        except Exception:
+            self.metrics.inc("node_rpc_errors_total", network=self.network,
+                             method=name)
+            raise
+        finally:
+            _current.call = None
+            self.metrics.observe(
+                "node_rpc_latency_seconds", time.perf_counter() - start,
+                network=self.network, method=name
+            )
+            self.metrics.inc("node_rpc_requests_total",
+                             network=self.network, method=name)
+            self.metrics.inc("node_rpc_response_bytes_total", call[1],
+                             network=self.network, method=name)
+    return wrapper
+
+
+class _MeteredComm:
+    """ Proxy of the herapy grpc client adding the size of the protobuf
+    responses to the call being recorded.
+    """
+
+    def __init__(self, comm) -> None:
+        self._comm = comm
+
+    def __getattr__(self, attr):
+        value = getattr(self._comm, attr)
+        if not callable(value):
+            return value
+
+        def metered(*args, **kwargs):
+            response = value(*args, **kwargs)
+            call = getattr(_current, "call", None)
+            if call is not None and hasattr(response, "ByteSize"):
+                call[1] += response.ByteSize()
+            return response
+        return metered
+
+
+class _MeteredEventStream(EventStream):
+    def __init__(self, stream: EventStream, aergo: 'InstrumentedAergo'):
+        super().__init__(stream._grpc_stream)
+        self._aergo = aergo
+
+    def next(self):
+        grpc_event = next(self._grpc_stream)
+        metrics = self._aergo.metrics
+        metrics.inc("node_stream_events_total", network=self._aergo.network,
+                    event=grpc_event.eventName)
+        metrics.inc("node_stream_bytes_total", grpc_event.ByteSize(),
+                    network=self._aergo.network, event=grpc_event.eventName)
+        return Event(grpc_event=grpc_event)
+
+
+class InstrumentedAergo(herapy.Aergo):
+    """ herapy.Aergo recording the count, latency, errors and response size
+    of node calls in a MetricsRegistry, labeled with the network name.
+
+    The response size is measured on the grpc responses, which requires
+    wrapping the private grpc client of herapy.Aergo (pinned to 2.0.1).
+    """
+
+    def __init__(
+        self,
+        network: str = '',
+        registry: MetricsRegistry = None,
+    ) -> None:
+        super().__init__()
+        if registry is None:
+            registry = default_registry
+        self.network = network
+        self.metrics = registry
+        describe_node_metrics(registry)
+
+    def connect(self, target, *args, **kwargs):
+        super().connect(target, *args, **kwargs)
+        self._Aergo__comm = _MeteredComm(self._Aergo__comm)
+
+    @_instrumented
+    def get_status(self, *args, **kwargs):
+        return super().get_status(*args, **kwargs)
+
+    @_instrumented
+    def get_blockchain_status(self, *args, **kwargs):
+        return super().get_blockchain_status(*args, **kwargs)
+
+    @_instrumented
+    def get_block_headers(self, *args, **kwargs):
+        return super().get_block_headers(*args, **kwargs)
+
+    @_instrumented
+    def query_sc_state(self, *args, **kwargs):
+        return super().query_sc_state(*args, **kwargs)
+
+    @_instrumented
+    def call_sc(self, *args, **kwargs):
+        return super().call_sc(*args, **kwargs)
+
+    @_instrumented
+    def batch_tx(self, *args, **kwargs):
+        return super().batch_tx(*args, **kwargs)
+
+    @_instrumented
+    def send_payload(self, *args, **kwargs):
+        return super().send_payload(*args, **kwargs)
+
+    @_instrumented
+    def wait_tx_result(self, *args, **kwargs):
+        return super().wait_tx_result(*args, **kwargs)
+
+    @_instrumented
+    def get_account(self, *args, **kwargs):
+        return super().get_account(*args, **kwargs)
+
+    @_instrumented
+    def get_tx(self, *args, **kwargs):
+        return super().get_tx(*args, **kwargs)
+
+    @_instrumented
+    def get_events(self, *args, **kwargs):
+        return super().get_events(*args, **kwargs)
+
+    @_instrumented
+    def receive_event_stream(self, *args, **kwargs):
+        stream = super().receive_event_stream(*args, **kwargs)
+        if stream is None:
+            return None
+        return _MeteredEventStream(stream, self)
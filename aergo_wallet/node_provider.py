@@ -0,0 +1,256 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import (
+    partial,
+)
+import logging
+import threading
+import time
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import aergo.herapy as herapy
+
+from aergo_wallet.metrics import (
+    MetricsRegistry,
+)
+from aergo_wallet.node_metrics import (
+    InstrumentedAergo,
+)
+
+logger = logging.getLogger(__name__)
+
+# reads sent to the fastest healthy node and hedged when slow
+HEDGED_READS = (
+    "get_status", "get_blockchain_status", "get_block_headers", "get_block",
+    "query_sc_state", "query_sc", "get_account", "get_tx", "get_tx_result",
+    "get_events",
+)
+# reads sent to the fastest healthy node without hedging: they are long
+# lived by design
+READS = HEDGED_READS + ("wait_tx_result", "receive_event_stream")
+# transaction submissions, sent to the primary node
+WRITES = (
+    "call_sc", "batch_call_sc", "batch_tx", "send_tx", "send_payload",
+    "send_unsigned_tx", "deploy_sc", "transfer",
+)
+
+_executor = ThreadPoolExecutor(max_workers=16,
+                               thread_name_prefix="node reads")
+
+
+def network_ips(network_config: Dict) -> List[str]:
+    """ Return the node endpoints of a network in config.json: 'ip' and
+    the optional 'ips' list of other nodes of the same network.
+    """
+    ips = [network_config['ip']]
+    for ip in network_config.get('ips', []):
+        if ip not in ips:
+            ips.append(ip)
+    return ips
+
+
+class _Endpoint:
+    def __init__(self, ip: str, aergo: herapy.Aergo) -> None:
+        self.ip = ip
+        self.aergo = aergo
+        self.connected = False
+        # moving average of the read latency, None until measured
+        self.latency: Optional[float] = None
+        self.down_until = 0.0
+
+
+class NodeProvider:
+    """ Drop-in replacement of herapy.Aergo connected to several nodes of
+    the same network.
+
+    Reads go to the healthy node with the lowest moving average latency.
+    If a read doesn't return within hedge_after seconds it is also sent to
+    the next node and the first result is used. A node that fails is
+    skipped for retry_after seconds and the call is retried on the next one.
+    Transactions are submitted to the primary node which holds the
+    account: if it fails, the next healthy node becomes primary and the
+    submission is retried there. The retried tx has the same nonce so at
+    most one of them is included.
+    """
+
+    def __init__(
+        self,
+        network: str,
+        ips: Sequence[str],
+        registry: MetricsRegistry = None,
+        hedge_after: float = 0.5,
+        retry_after: float = 30,
+        smoothing: float = 0.3,
+    ) -> None:
+        if len(ips) == 0:
+            raise ValueError("No node endpoint for {}".format(network))
+        self.network = network
+        self.hedge_after = hedge_after
+        self.retry_after = retry_after
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._endpoints = [_Endpoint(ip, InstrumentedAergo(network, registry))
+                           for ip in ips]
+        self._primary = self._endpoints[0]
+
+    def __getattr__(self, name):
+        # only called for attributes not defined by NodeProvider
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in READS:
+            return partial(self._read, name)
+        if name in WRITES:
+            return partial(self._write, name)
+        return getattr(self._primary.aergo, name)
+
+    @property
+    def account(self):
+        return self._primary.aergo.account
+
+    @account.setter
+    def account(self, account) -> None:
+        self._primary.aergo.account = account
+
+    def connect(self, target: Union[str, Sequence[str]] = None) -> None:
+        """ Connect to all the endpoints, at least one must be reachable.
+        target is accepted for compatibility with herapy.Aergo and must be
+        one of the endpoints.
+        """
+        error = None
+        for endpoint in self._endpoints:
+            try:
+                self._connect(endpoint)
+            except herapy.errors.exception.CommunicationException as e:
+                logger.warning("%s node %s unreachable", self.network,
+                               endpoint.ip)
+                self._mark_down(endpoint)
+                error = e
+        if not any(endpoint.connected for endpoint in self._endpoints):
+            raise error
+        if not self._primary.connected:
+            self._failover(self._primary)
+
+    def disconnect(self) -> None:
+        for endpoint in self._endpoints:
+            if endpoint.connected:
+                endpoint.connected = False
+                try:
+                    endpoint.aergo.disconnect()
+                except herapy.errors.exception.CommunicationException:
+                    pass
+
+    def _connect(self, endpoint: _Endpoint) -> None:
+        endpoint.aergo.connect(endpoint.ip)
+        endpoint.connected = True
+        endpoint.down_until = 0.0
+
+    def _mark_down(self, endpoint: _Endpoint) -> None:
+        with self._lock:
+            endpoint.down_until = time.monotonic() + self.retry_after
+
+    def _candidates(self) -> List[_Endpoint]:
+        """ Return the endpoints to try, fastest healthy ones first.
+        Nodes never measured are tried first so they get a latency, nodes
+        that failed recently are tried last.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [e for e in self._endpoints if e.down_until <= now]
+            down = [e for e in self._endpoints if e.down_until > now]
+        healthy.sort(key=lambda e: -1 if e.latency is None else e.latency)
+        down.sort(key=lambda e: e.down_until)
+        return healthy + down
+
+    def _call(self, endpoint: _Endpoint, name: str, args, kwargs):
+        start = time.perf_counter()
+        try:
+            if not endpoint.connected:
+                self._connect(endpoint)
+            result = getattr(endpoint.aergo, name)(*args, **kwargs)
+        except herapy.errors.exception.CommunicationException:
+            self._mark_down(endpoint)
+            raise
+        latency = time.perf_counter() - start
+        with self._lock:
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += self.smoothing * (
+                    latency - endpoint.latency)
+            endpoint.down_until = 0.0
+        return result
+
+    def _read(self, name: str, *args, **kwargs):
+        if name == "get_account" and kwargs.get("account") is None \
+                and kwargs.get("address") is None and len(args) == 0:
+            # state of the account loaded in the primary node
+            return self._write(name, *args, **kwargs)
+        candidates = self._candidates()
+        hedge = name in HEDGED_READS and self.hedge_after > 0
+        pending = set()
+        error = None
+        while True:
+            if len(pending) == 0:
+                if len(candidates) == 0:
+                    raise error
+                pending.add(_executor.submit(
+                    self._call, candidates.pop(0), name, args, kwargs))
+            done, _ = wait(
+                pending, timeout=self.hedge_after if hedge else None,
+                return_when=FIRST_COMPLETED
+            )
+            if len(done) == 0:
+                # slow read, also ask the next node
+                if len(candidates) > 0:
+                    pending.add(_executor.submit(
+                        self._call, candidates.pop(0), name, args, kwargs))
+                continue
+            for future in done:
+                pending.remove(future)
+                try:
+                    return future.result()
+                except herapy.errors.exception.CommunicationException as e:
+                    error = e
+
+    def _write(self, name: str, *args, **kwargs):
+        tried = set()
+        while True:
+            primary = self._primary
+            tried.add(primary)
+            try:
+                return self._call(primary, name, args, kwargs)
+            except herapy.errors.exception.CommunicationException:
+                if not self._failover(primary, tried):
+                    raise
+
+    def _failover(self, failed: _Endpoint, tried=()) -> bool:
+        """ Make the next healthy node primary, the account loaded in the
+        failed primary is moved to it. Returns False if no node is left.
+        """
+        for endpoint in self._candidates():
+            if endpoint is failed or endpoint in tried:
+                continue
+            try:
+                if not endpoint.connected:
+                    self._connect(endpoint)
+            except herapy.errors.exception.CommunicationException:
+                self._mark_down(endpoint)
+                continue
+            with self._lock:
+                if self._primary is failed:
+                    endpoint.aergo.account = failed.aergo.account
+                    self._primary = endpoint
+            logger.warning("%s primary node %s failed, using %s",
+                           self.network, failed.ip, self._primary.ip)
+            return True
+        return False
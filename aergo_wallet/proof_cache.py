@@ -0,0 +1,215 @@
+from collections import (
+    OrderedDict,
+)
+import hashlib
+import sqlite3
+import struct
+import threading
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Union,
+)
+
+import aergo.herapy as herapy
+from aergo.herapy.account import (
+    Account,
+)
+from aergo.herapy.grpc.blockchain_pb2 import (
+    AccountProof,
+    ContractVarProof,
+)
+from aergo.herapy.obj.sc_state import (
+    SCState,
+)
+from aergo.herapy.obj.var_proof import (
+    VarProofs,
+)
+from aergo.herapy.utils.encoding import (
+    decode_address,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS proofs (
+    chain TEXT NOT NULL,
+    key BLOB NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (chain, key)
+);
+"""
+
+
+class ProofCache:
+    """ Cache of the immutable data of a chain: merkle proofs at a given
+    root and state roots of finalized block headers.
+
+    Entries are kept in an in-memory LRU of max_entries entries and, if
+    path is given, in a SQLite database that several caches (one per
+    chain) and processes can share. Only proofs at an explicit root are
+    cached, queries of the latest state always reach the node.
+    Block roots must only be requested for finalized heights, like
+    anchored heights.
+    """
+
+    def __init__(
+        self,
+        chain: str,
+        max_entries: int = 4096,
+        path: str = None,
+    ) -> None:
+        self.chain = chain
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._lru: OrderedDict = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(
+                path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                return value
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT value FROM proofs WHERE chain = ? AND key = ?",
+                (self.chain, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def _put_many(self, entries: Dict[bytes, bytes]) -> None:
+        with self._lock:
+            for key, value in entries.items():
+                self._remember(key, value)
+            if self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO proofs VALUES (?, ?, ?)",
+                    [(self.chain, key, value)
+                     for key, value in entries.items()]
+                )
+
+    def _remember(self, key: bytes, value: bytes) -> None:
+        # called with self._lock held
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def block_root(self, aergo: herapy.Aergo, height: int) -> bytes:
+        """ Return the blocks state root of the finalized block height."""
+        key = b"h" + struct.pack(">Q", height)
+        root = self._get(key)
+        if root is None:
+            block = aergo.get_block_headers(block_height=height, list_size=1)
+            root = block[0].blocks_root_hash
+            # the root is empty while the block is not synced
+            if len(root) == 0:
+                return root
+            self._put_many({key: root})
+        return root
+
+    def get_account(
+        self,
+        aergo: herapy.Aergo,
+        address: str,
+        root: bytes,
+        compressed: bool = True,
+    ) -> Account:
+        """ Same as aergo.get_account(address=address, proof=True, root=root,
+        compressed=compressed).
+        """
+        address_bytes = decode_address(address)
+        key = _account_key(address_bytes, root, compressed)
+        value = self._get(key)
+        if value is None:
+            account = aergo.get_account(
+                address=address, proof=True, root=root, compressed=compressed)
+            self._put_many({key: account.state_proof.SerializeToString()})
+            return account
+        return _account(address_bytes, AccountProof.FromString(value))
+
+    def query_sc_state(
+        self,
+        aergo: herapy.Aergo,
+        sc_address: str,
+        storage_keys: List[Union[str, bytes]],
+        root: bytes = b'',
+        compressed: bool = True,
+    ) -> SCState:
+        """ Same as aergo.query_sc_state, only the variables not cached are
+        queried.
+        """
+        if len(root) == 0:
+            return aergo.query_sc_state(sc_address, storage_keys,
+                                        compressed=compressed)
+        address_bytes = decode_address(sc_address)
+        account_key = _account_key(address_bytes, root, compressed)
+        trie_keys = [_trie_key(key) for key in storage_keys]
+        var_keys = [b"v" + account_key[1:] + trie_key
+                    for trie_key in trie_keys]
+
+        account_proof = self._get(account_key)
+        var_proofs = [self._get(key) for key in var_keys]
+        missing = [i for i, proof in enumerate(var_proofs) if proof is None]
+        if account_proof is not None and len(missing) == 0:
+            return _sc_state(address_bytes, AccountProof.FromString(
+                account_proof), [ContractVarProof.FromString(proof)
+                                 for proof in var_proofs], trie_keys)
+
+        state = aergo.query_sc_state(
+            sc_address, [storage_keys[i] for i in missing], root=root,
+            compressed=compressed
+        )
+        entries = {account_key: state.account.state_proof.SerializeToString()}
+        for i, var_proof in zip(missing, state.var_proofs):
+            var_proofs[i] = var_proof.SerializeToString()
+            entries[var_keys[i]] = var_proofs[i]
+        self._put_many(entries)
+        return _sc_state(address_bytes, state.account.state_proof,
+                         [ContractVarProof.FromString(proof)
+                          for proof in var_proofs], trie_keys)
+
+
+def _trie_key(storage_key: Union[str, bytes]) -> bytes:
+    if isinstance(storage_key, str):
+        storage_key = storage_key.encode('latin-1')
+    return hashlib.sha256(storage_key).digest()
+
+
+def _account_key(address: bytes, root: bytes, compressed: bool) -> bytes:
+    return b"a" + bytes([compressed]) + root + address
+
+
+def _account(address: bytes, state_proof) -> Account:
+    account = Account(empty=True)
+    account.address = address
+    account.state = state_proof.state
+    account.state_proof = state_proof
+    return account
+
+
+def _sc_state(
+    address: bytes,
+    state_proof,
+    var_proofs: List,
+    trie_keys: List[bytes],
+) -> SCState:
+    return SCState(account=_account(address, state_proof),
+                   var_proofs=VarProofs(var_proofs, trie_keys))
@@ -0,0 +1,967 @@
+""" In-memory aergo chain executing the python models of the bridge
+contracts (aergo_wallet.contract_models) instead of lua, to test and
+benchmark the wallet and the bridge operator without aergo nodes.
+
+SimulatedChain implements the grpc service of an aergo node, so the
+wallet and operator code run unchanged on top of herapy: connect() plugs
+a herapy.Aergo to the chain in the same process, serve() exposes the chain
+on a local grpc port for code connecting to the ip of a network config.
+
+Transactions are checked (hash, chain id, signature, nonce, balance) when
+committed and executed as soon as their nonce is the next one of their
+account: each CommitTX executing txs makes one block, and like on a node
+txs after a nonce gap wait in the mempool for the missing nonces.
+State is kept in sparse merkle tries hashed like aergo tries, so the state
+roots, account states and merkle proofs of the chain verify like the ones
+of a node and the bridge contracts can anchor and verify them.
+"""
+
+from concurrent import (
+    futures,
+)
+import functools
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+import grpc
+
+import aergo.herapy as herapy
+from aergo.herapy import (
+    comm,
+)
+from aergo.herapy.grpc import (
+    blockchain_pb2,
+    rpc_pb2,
+    rpc_pb2_grpc,
+)
+from aergo.herapy.utils.encoding import (
+    decode_address,
+    encode_address,
+    encode_b58,
+)
+from aergo.herapy.utils.signature import (
+    verify_sig,
+)
+
+from aergo_wallet.contract_models import (
+    Contract,
+    ContractError,
+    MerkleBridge,
+    Oracle,
+    StandardToken,
+    from_json,
+    to_json,
+)
+from aergo_wallet.smt import (
+    SparseMerkleTrie,
+    compress,
+)
+
+logger = logging.getLogger(__name__)
+
+# bytecode files of the contracts directory and their models
+BYTECODE_MODELS = {
+    'bridge_bytecode.txt': MerkleBridge,
+    'oracle_bytecode.txt': Oracle,
+    'token_bytecode.txt': StandardToken,
+}
+
+# nested contract calls allowed in a tx
+MAX_CALL_DEPTH = 64
+# size of the largest tx accepted by aergo nodes
+MAX_TX_SIZE = 200 * 1024
+
+
+def _sha256(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def contract_address(creator: bytes, nonce: int) -> bytes:
+    """ Address of the contract deployed by creator with nonce (same as
+    CreateContractID of aergo).
+    """
+    return b'\x0c' + _sha256(creator + str(nonce).encode('utf-8'))
+
+
+@functools.lru_cache(maxsize=None)
+def read_bytecode(path: str) -> bytes:
+    """ Deploy payload of a base58 bytecode file (decoding the large
+    contracts takes longer than running a simulated bridge, so it is done
+    once per file).
+    """
+    with open(path, "r") as f:
+        return decode_address(f.read().strip())
+
+
+class _RpcError(grpc.RpcError):
+    """ Error of a call made in process, read by herapy like the error of
+    a grpc call.
+    """
+
+    def __init__(self, code: grpc.StatusCode, details: str) -> None:
+        super().__init__(details)
+        self._code = code
+        self._details = details
+
+    def code(self) -> grpc.StatusCode:
+        return self._code
+
+    def details(self) -> str:
+        return self._details
+
+
+def _abort(context, code: grpc.StatusCode, details: str) -> None:
+    if context is None:
+        raise _RpcError(code, details)
+    context.abort(code, details)
+
+
+_END = object()
+
+
+class _Stream:
+    """ Server stream of a simulated chain, consumed like the grpc stream
+    of an aergo node.
+    """
+
+    def __init__(self, chain: 'SimulatedChain', in_process: bool) -> None:
+        self._chain = chain
+        self._in_process = in_process
+        self._queue: queue.Queue = queue.Queue()
+        self._cancelled = False
+
+    def put(self, item) -> None:
+        self._queue.put(item)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._queue.get()
+        if item is _END:
+            # keep ending the following next() calls
+            self._queue.put(_END)
+            if self._in_process:
+                raise _RpcError(grpc.StatusCode.CANCELLED,
+                                "Locally cancelled by application!")
+            raise StopIteration
+        return item
+
+    def cancel(self) -> None:
+        if not self._cancelled:
+            self._cancelled = True
+            self._chain._unsubscribe(self)
+            self._queue.put(_END)
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def done(self) -> bool:
+        return self._cancelled
+
+    def is_active(self) -> bool:
+        return not self._cancelled
+
+    def running(self) -> bool:
+        return not self._cancelled
+
+
+class _Account:
+    __slots__ = ('nonce', 'balance', 'model', 'code_hash', 'storage')
+
+    def __init__(
+        self,
+        model: Type[Contract] = None,
+        code_hash: bytes = b'',
+    ) -> None:
+        self.nonce = 0
+        self.balance = 0
+        self.model = model
+        self.code_hash = code_hash
+        self.storage = SparseMerkleTrie()
+
+    def state(self) -> blockchain_pb2.State:
+        balance = b''
+        if self.balance > 0:
+            balance = self.balance.to_bytes(
+                (self.balance.bit_length() + 7) // 8, 'big')
+        return blockchain_pb2.State(
+            nonce=self.nonce, balance=balance, codeHash=self.code_hash,
+            storageRoot=self.storage.root
+        )
+
+
+class _Execution:
+    """ State changes of a tx, applied to the chain only if the tx
+    succeeds.
+    """
+
+    def __init__(self, chain: 'SimulatedChain') -> None:
+        self.chain = chain
+        # address -> {storage key: value or None if deleted}
+        self.writes: Dict[bytes, Dict[str, Optional[bytes]]] = {}
+        self.created: Dict[bytes, _Account] = {}
+        self.nonces: Dict[bytes, int] = {}
+        # (contract address, event name, json arguments)
+        self.events: List[Tuple[bytes, str, str]] = []
+        self.depth = 0
+
+    def account(self, address: bytes) -> Optional[_Account]:
+        if address in self.created:
+            return self.created[address]
+        return self.chain._accounts.get(address)
+
+    def get(self, address: bytes, key: str) -> Optional[bytes]:
+        writes = self.writes.get(address, {})
+        if key in writes:
+            return writes[key]
+        account = self.account(address)
+        if account is None:
+            return None
+        return account.storage.get(_sha256(key.encode('latin-1')))
+
+    def set(self, address: bytes, key: str, value: Optional[bytes]) -> None:
+        self.writes.setdefault(address, {})[key] = value
+
+    def call(
+        self,
+        address: bytes,
+        sender: str,
+        function: str,
+        args: List,
+    ) -> Any:
+        account = self.account(address)
+        if account is None or account.model is None:
+            raise ContractError("cannot find contract {}"
+                                .format(encode_address(address)))
+        if self.depth >= MAX_CALL_DEPTH:
+            raise ContractError("exceeded the maximum call depth")
+        self.depth += 1
+        try:
+            return account.model.execute(
+                _Context(self, address, sender), function, args)
+        finally:
+            self.depth -= 1
+
+    def deploy(
+        self,
+        creator: bytes,
+        nonce: int,
+        model: Type[Contract],
+        args: List,
+    ) -> Tuple[bytes, Any]:
+        address = contract_address(creator, nonce)
+        self.created[address] = _Account(
+            model, _sha256(self.chain._code_of(model)))
+        result = self.call(address, encode_address(creator), "constructor",
+                           args)
+        return address, result
+
+    def apply(self) -> List[bytes]:
+        """ Apply the changes to the chain state, returns the addresses of
+        the modified accounts.
+        """
+        accounts = self.chain._accounts
+        accounts.update(self.created)
+        for address, nonce in self.nonces.items():
+            accounts[address].nonce = nonce
+        for address, writes in self.writes.items():
+            account = accounts[address]
+            account.storage = account.storage.update(
+                {_sha256(key.encode('latin-1')): value
+                 for key, value in writes.items()})
+        return list(self.created) + list(self.nonces) + list(self.writes)
+
+
+class _Context:
+    """ Context of a contract function call: the lua system and contract
+    modules.
+    """
+
+    def __init__(
+        self,
+        execution: _Execution,
+        address: bytes,
+        sender: str,
+    ) -> None:
+        self._execution = execution
+        self._address = address
+        self.address = encode_address(address)
+        self.sender = sender
+
+    @property
+    def prev_block_hash(self) -> str:
+        return encode_b58(self._execution.chain._blocks[-1].hash)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._execution.get(self._address, key)
+
+    def set(self, key: str, value: Optional[bytes]) -> None:
+        self._execution.set(self._address, key, value)
+
+    def event(self, name: str, args: List) -> None:
+        self._execution.events.append((self._address, name, to_json(args)))
+
+    def call(self, address: str, function: str, args: List) -> Any:
+        return self._execution.call(_decode(address), self.address,
+                                    function, args)
+
+    def deploy(self, model: Type[Contract], args: List) -> str:
+        execution = self._execution
+        nonce = execution.nonces.get(
+            self._address, execution.account(self._address).nonce) + 1
+        execution.nonces[self._address] = nonce
+        address, _ = execution.deploy(self._address, nonce, model, args)
+        return encode_address(address)
+
+    def is_contract(self, address: str) -> bool:
+        account = self._execution.account(_decode(address))
+        return account is not None and account.model is not None
+
+
+def _decode(address: str) -> bytes:
+    try:
+        return decode_address(address)
+    except Exception:
+        raise ContractError("invalid address: {}".format(address))
+
+
+def _result_json(result: Any) -> str:
+    if result is None:
+        return ""
+    if isinstance(result, tuple):
+        result = list(result)
+    return to_json(result)
+
+
+class _LocalComm(comm.Comm):
+    """ herapy grpc client calling a SimulatedChain in process."""
+
+    def __init__(self, chain: 'SimulatedChain') -> None:
+        super().__init__()
+        self._Comm__rpc_stub = chain
+
+    def connect(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        pass
+
+
+class SimulatedChain(rpc_pb2_grpc.AergoRPCServiceServicer):
+    """ In-memory aergo chain.
+
+    Contracts are deployed from code registered with register_code (the
+    bytecode files of the contracts directory with load_bytecodes).
+    Every CommitTX of executable txs produces a block executing them,
+    txs with a nonce gap wait in the mempool for the missing nonces. mine()
+    produces empty blocks (and serve() with block_time produces them
+    periodically), the last irreversible block is lib_lag blocks below the
+    best block.
+    Event streams send the events from their start block before the new
+    ones, so a stream can be resumed without missing events.
+    """
+
+    def __init__(
+        self,
+        name: str = 'simulated',
+        lib_lag: int = 0,
+        check_signatures: bool = True,
+    ) -> None:
+        self.name = name
+        self.chain_id = _sha256(name.encode('utf-8'))
+        self.lib_lag = lib_lag
+        self.check_signatures = check_signatures
+        self._lock = threading.RLock()
+        self._models: Dict[bytes, Type[Contract]] = {}
+        self._codes: Dict[Type[Contract], bytes] = {}
+        self._accounts: Dict[bytes, _Account] = {}
+        # account -> {nonce: tx waiting to be executed}
+        self._mempool: Dict[bytes, Dict[int, blockchain_pb2.Tx]] = {}
+        self._global = SparseMerkleTrie()
+        # tries of past state roots and storage roots for queries at a
+        # root
+        self._state_tries: Dict[bytes, SparseMerkleTrie] = {
+            b'': self._global}
+        self._storage_tries: Dict[bytes, SparseMerkleTrie] = {
+            b'': SparseMerkleTrie()}
+        self._blocks: List[blockchain_pb2.Block] = []
+        self._block_index: Dict[bytes, int] = {}
+        # tx hash -> (receipt, block hash, index in block)
+        self._receipts: Dict[bytes, Tuple[blockchain_pb2.Receipt, bytes,
+                                          int]] = {}
+        self._events: List[blockchain_pb2.Event] = []
+        self._event_streams: Dict[_Stream, blockchain_pb2.FilterInfo] = {}
+        self._block_streams: Dict[_Stream, bool] = {}
+        self._server: Optional[grpc.Server] = None
+        self._stop = threading.Event()
+        self._miner: Optional[threading.Thread] = None
+        self._seal([], [], [])
+
+    # ---------------------------------------------------------------
+    # chain management
+
+    def register_code(self, code: bytes, model: Type[Contract]) -> None:
+        """ Execute model for the contracts deployed with code."""
+        with self._lock:
+            self._models[code] = model
+            self._codes[model] = code
+
+    def load_bytecodes(self, directory: str = 'contracts') -> None:
+        """ Register the bytecode files of the repository contracts."""
+        for file_name, model in BYTECODE_MODELS.items():
+            self.register_code(
+                read_bytecode(os.path.join(directory, file_name)), model)
+
+    def _code_of(self, model: Type[Contract]) -> bytes:
+        # contracts deployed by contracts (minted tokens) don't need a
+        # registered code
+        return self._codes.get(model, model.__name__.encode('utf-8'))
+
+    def connect(self, aergo: herapy.Aergo) -> None:
+        """ Connect aergo to the chain in process (instead of
+        aergo.connect(ip)).
+        """
+        aergo._Aergo__comm = _LocalComm(self)
+        aergo.chain_id = self.chain_id
+
+    def fund(self, address: str, amount: int) -> None:
+        """ Credit amount aer to address (in a new block)."""
+        with self._lock:
+            address_bytes = decode_address(address)
+            account = self._accounts.setdefault(address_bytes, _Account())
+            account.balance += amount
+            self._seal([], [], [address_bytes])
+
+    def mine(self, count: int = 1) -> int:
+        """ Produce count empty blocks, returns the best height."""
+        with self._lock:
+            for _ in range(count):
+                self._seal([], [], [])
+            return self.height
+
+    @property
+    def height(self) -> int:
+        return len(self._blocks) - 1
+
+    @property
+    def lib(self) -> int:
+        return max(0, self.height - self.lib_lag)
+
+    def serve(
+        self,
+        address: str = 'localhost:0',
+        block_time: float = None,
+        max_workers: int = 32,
+    ) -> str:
+        """ Serve the chain over grpc on address and return the target to
+        connect to. With block_time, an empty block is produced every
+        block_time seconds.
+        """
+        host = address.rsplit(':', 1)[0]
+        self._server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=max_workers))
+        rpc_pb2_grpc.add_AergoRPCServiceServicer_to_server(self, self._server)
+        port = self._server.add_insecure_port(address)
+        self._server.start()
+        if block_time is not None:
+            self._stop.clear()
+            self._miner = threading.Thread(
+                target=self._mine_every, args=(block_time,),
+                name="{} miner".format(self.name), daemon=True
+            )
+            self._miner.start()
+        return "{}:{}".format(host, port)
+
+    def stop(self) -> None:
+        """ Stop serving and close the open streams."""
+        self._stop.set()
+        if self._miner is not None:
+            self._miner.join()
+            self._miner = None
+        with self._lock:
+            streams = list(self._event_streams) + list(self._block_streams)
+        for stream in streams:
+            stream.cancel()
+        if self._server is not None:
+            self._server.stop(None)
+            self._server = None
+
+    def _mine_every(self, block_time: float) -> None:
+        while not self._stop.wait(block_time):
+            self.mine()
+
+    # ---------------------------------------------------------------
+    # blocks and state
+
+    def _seal(
+        self,
+        txs: List[blockchain_pb2.Tx],
+        receipts: List[blockchain_pb2.Receipt],
+        touched: List[bytes],
+    ) -> blockchain_pb2.Block:
+        """ Make a block of the executed txs: called with self._lock held
+        after the txs changes were applied.
+        """
+        updates = {}
+        for address in set(touched):
+            state = self._accounts[address].state()
+            updates[_sha256(address)] = state.SerializeToString()
+            self._storage_tries[state.storageRoot] = \
+                self._accounts[address].storage
+        self._global = self._global.update(updates)
+        root = self._global.root
+        self._state_tries[root] = self._global
+
+        height = len(self._blocks)
+        prev_hash = self._blocks[-1].hash if height > 0 else b''
+        header = blockchain_pb2.BlockHeader(
+            chainID=self.name.encode('utf-8'), prevBlockHash=prev_hash,
+            blockNo=height, timestamp=time.time_ns(), blocksRootHash=root,
+            txsRootHash=_sha256(b''.join(tx.hash for tx in txs))
+        )
+        block_hash = _sha256(header.SerializeToString())
+        block = blockchain_pb2.Block(hash=block_hash, header=header)
+        block.body.txs.extend(txs)
+        self._blocks.append(block)
+        self._block_index[block_hash] = height
+
+        events = []
+        for index, receipt in enumerate(receipts):
+            receipt.blockNo = height
+            receipt.blockHash = block_hash
+            receipt.txIndex = index
+            for event in receipt.events:
+                event.blockNo = height
+                event.blockHash = block_hash
+                event.txIndex = index
+                events.append(event)
+            self._receipts[receipt.txHash] = (receipt, block_hash, index)
+        self._events.extend(events)
+
+        for stream, info in self._event_streams.items():
+            for event in events:
+                if _event_matches(event, info):
+                    stream.put(event)
+        meta = rpc_pb2.BlockMetadata(hash=block_hash, header=header,
+                                     txcount=len(txs))
+        for stream, with_body in self._block_streams.items():
+            stream.put(block if with_body else meta)
+        return block
+
+    def _unsubscribe(self, stream: _Stream) -> None:
+        with self._lock:
+            self._event_streams.pop(stream, None)
+            self._block_streams.pop(stream, None)
+
+    def _block(self, query: bytes) -> Optional[blockchain_pb2.Block]:
+        if query in self._block_index:
+            return self._blocks[self._block_index[query]]
+        if len(query) == 8:
+            height = int.from_bytes(query, 'little')
+            if height < len(self._blocks):
+                return self._blocks[height]
+        return None
+
+    def _state(
+        self,
+        address: bytes,
+        root: bytes,
+        compressed: bool,
+        context,
+    ) -> Tuple[blockchain_pb2.AccountProof, SparseMerkleTrie]:
+        """ Account proof of address at the state root (the best state if
+        empty) and the storage trie of the account.
+        """
+        trie = self._global if len(root) == 0 else self._state_tries.get(root)
+        if trie is None:
+            _abort(context, grpc.StatusCode.INTERNAL,
+                   "failed to get state for root {}".format(root.hex()))
+        proof = blockchain_pb2.AccountProof(key=address)
+        value = _fill_proof(proof, trie, _sha256(address), compressed)
+        storage = SparseMerkleTrie()
+        if value is not None:
+            proof.state.ParseFromString(value)
+            storage = self._storage_tries[proof.state.storageRoot]
+        return proof, storage
+
+    # ---------------------------------------------------------------
+    # transactions
+
+    def _check_tx(self, tx: blockchain_pb2.Tx) -> Tuple[int, str]:
+        body = tx.body
+        if tx.ByteSize() > MAX_TX_SIZE:
+            return rpc_pb2.TX_INVALID_FORMAT, "size of tx exceeds max length"
+        if len(body.account) != 33:
+            return rpc_pb2.TX_INVALID_FORMAT, "invalid account"
+        if body.chainIdHash != self.chain_id:
+            return rpc_pb2.TX_INVALID_FORMAT, "invalid chain id"
+        tx_hash = _tx_hash(body)
+        if tx_hash != tx.hash:
+            return rpc_pb2.TX_INVALID_HASH, "tx hash mismatch"
+        if tx_hash in self._receipts:
+            return rpc_pb2.TX_ALREADY_EXISTS, "tx already exists"
+        if self.check_signatures:
+            try:
+                valid = verify_sig(_tx_hash(body, with_sign=False),
+                                   body.sign, encode_address(body.account))
+            except Exception:
+                valid = False
+            if not valid:
+                return rpc_pb2.TX_INVALID_SIGN, "invalid signature"
+        account = self._accounts.get(body.account)
+        if body.nonce <= (account.nonce if account is not None else 0):
+            return rpc_pb2.TX_NONCE_TOO_LOW, "nonce is too low"
+        pending = self._mempool.get(body.account, {})
+        if body.nonce in pending:
+            if pending[body.nonce].hash == tx.hash:
+                return rpc_pb2.TX_ALREADY_EXISTS, "tx already exists"
+            return rpc_pb2.TX_HAS_SAME_NONCE, "tx with same nonce exists"
+        # the txs of the sender already in the mempool spend first
+        amount = int.from_bytes(body.amount, 'big') + sum(
+            int.from_bytes(other.body.amount, 'big')
+            for other in pending.values()
+        )
+        if amount > (account.balance if account is not None else 0):
+            return rpc_pb2.TX_INSUFFICIENT_BALANCE, "not enough balance"
+        return rpc_pb2.TX_OK, ""
+
+    def _take_executable(self) -> List[blockchain_pb2.Tx]:
+        """ Remove from the mempool the txs with no nonce gap before them.
+        """
+        txs = []
+        for address in list(self._mempool):
+            pending = self._mempool[address]
+            account = self._accounts.get(address)
+            nonce = account.nonce if account is not None else 0
+            while nonce + 1 in pending:
+                nonce += 1
+                txs.append(pending.pop(nonce))
+            if len(pending) == 0:
+                del self._mempool[address]
+        return txs
+
+    def _execute(
+        self,
+        tx: blockchain_pb2.Tx,
+    ) -> Tuple[blockchain_pb2.Receipt, List[bytes]]:
+        """ Execute a valid tx, returns its receipt and the modified
+        accounts.
+        """
+        body = tx.body
+        sender = self._accounts.setdefault(body.account, _Account())
+        sender.nonce = body.nonce
+        touched = [body.account]
+        receipt = blockchain_pb2.Receipt(txHash=tx.hash, status="SUCCESS",
+                                         to=body.recipient)
+        setattr(receipt, 'from', body.account)
+        amount = int.from_bytes(body.amount, 'big')
+        execution = _Execution(self)
+        sender_address = encode_address(body.account)
+        try:
+            if len(body.recipient) == 0:
+                receipt.status = "CREATED"
+                code_length = int.from_bytes(body.payload[:4], 'little') - 4
+                code = body.payload[4:4 + code_length]
+                model = self._models.get(code)
+                if model is None:
+                    raise ContractError("unknown contract code (register it "
+                                        "in the simulator)")
+                args = from_json(body.payload[4 + code_length:]
+                                 .decode('utf-8') or "null") or []
+                address, result = execution.deploy(
+                    body.account, body.nonce, model, args)
+                execution.created[address].balance = amount
+                receipt.contractAddress = address
+                receipt.ret = _result_json(result)
+            else:
+                recipient = execution.account(body.recipient)
+                if recipient is not None and recipient.model is not None:
+                    call = json.loads(body.payload.decode('utf-8'))
+                    if amount > 0:
+                        raise ContractError("'{}' is not payable"
+                                            .format(call.get('name')))
+                    args = from_json(json.dumps(call.get('args'))) or []
+                    result = execution.call(body.recipient, sender_address,
+                                            call.get('name'), args)
+                    receipt.ret = _result_json(result)
+                elif recipient is None:
+                    self._accounts[body.recipient] = _Account()
+            touched.extend(execution.apply())
+            if amount > 0:
+                sender.balance -= amount
+                if len(body.recipient) > 0:
+                    self._accounts[body.recipient].balance += amount
+                    touched.append(body.recipient)
+        except Exception as e:
+            if not isinstance(e, ContractError):
+                logger.debug("tx %s failed", encode_b58(tx.hash),
+                             exc_info=True)
+            receipt.status = "ERROR"
+            receipt.ret = str(e)
+            receipt.contractAddress = b''
+            return receipt, touched
+        for index, (address, name, args) in enumerate(execution.events):
+            receipt.events.add(
+                contractAddress=address, eventName=name, jsonArgs=args,
+                eventIdx=index, txHash=tx.hash
+            )
+        return receipt, touched
+
+    # ---------------------------------------------------------------
+    # grpc service
+
+    def Blockchain(self, request, context=None):
+        with self._lock:
+            best = self._blocks[-1]
+            return rpc_pb2.BlockchainStatus(
+                best_block_hash=best.hash, best_height=self.height,
+                best_chain_id_hash=self.chain_id,
+                consensus_info=json.dumps({
+                    "Type": "simulated",
+                    "Status": {"LibNo": self.lib,
+                               "LibHash": encode_b58(
+                                   self._blocks[self.lib].hash)},
+                })
+            )
+
+    def ListBlockHeaders(self, request, context=None):
+        with self._lock:
+            if len(request.hash) > 0:
+                start = self._block_index.get(request.hash)
+                if start is None:
+                    _abort(context, grpc.StatusCode.NOT_FOUND,
+                           "block not found")
+            else:
+                start = request.height
+            step = 1 if request.asc else -1
+            start += step * request.offset
+            headers = rpc_pb2.BlockHeaderList()
+            height = start
+            while 0 <= height < len(self._blocks) \
+                    and len(headers.blocks) < request.size:
+                block = self._blocks[height]
+                headers.blocks.add(hash=block.hash, header=block.header)
+                height += step
+            return headers
+
+    def GetBlock(self, request, context=None):
+        with self._lock:
+            block = self._block(request.value)
+        if block is None:
+            _abort(context, grpc.StatusCode.NOT_FOUND, "block not found")
+        return block
+
+    def GetBlockMetadata(self, request, context=None):
+        with self._lock:
+            block = self._block(request.value)
+        if block is None:
+            _abort(context, grpc.StatusCode.NOT_FOUND, "block not found")
+        return rpc_pb2.BlockMetadata(hash=block.hash, header=block.header,
+                                     txcount=len(block.body.txs))
+
+    def GetState(self, request, context=None):
+        # herapy passes an account message, serialized like SingleBytes
+        address = rpc_pb2.SingleBytes.FromString(
+            request.SerializeToString()).value
+        with self._lock:
+            account = self._accounts.get(address)
+            if account is None:
+                return blockchain_pb2.State()
+            return account.state()
+
+    def GetStateAndProof(self, request, context=None):
+        with self._lock:
+            proof, _ = self._state(request.Account, request.Root,
+                                   request.Compressed, context)
+            return proof
+
+    def QueryContractState(self, request, context=None):
+        with self._lock:
+            proof, storage = self._state(request.contractAddress,
+                                         request.root, request.compressed,
+                                         context)
+            result = blockchain_pb2.StateQueryProof(contractProof=proof)
+            for trie_key in request.storageKeys:
+                var_proof = result.varProofs.add(key=trie_key)
+                value = _fill_proof(var_proof, storage, trie_key,
+                                    request.compressed)
+                if value is not None:
+                    var_proof.value = value
+            return result
+
+    def QueryContract(self, request, context=None):
+        with self._lock:
+            execution = _Execution(self)
+            call = json.loads(request.queryinfo.decode('utf-8'))
+            args = from_json(json.dumps(call.get('args'))) or []
+            try:
+                result = execution.call(request.contractAddress, "",
+                                        call.get('name'), args)
+            except Exception as e:
+                _abort(context, grpc.StatusCode.INTERNAL, str(e))
+            # state changes of queries are discarded
+            return rpc_pb2.SingleBytes(
+                value=_result_json(result).encode('utf-8'))
+
+    def CommitTX(self, request, context=None):
+        with self._lock:
+            results = rpc_pb2.CommitResultList()
+            for tx in request.txs:
+                error, detail = self._check_tx(tx)
+                results.results.add(hash=tx.hash, error=error, detail=detail)
+                if error == rpc_pb2.TX_OK:
+                    self._mempool.setdefault(
+                        tx.body.account, {})[tx.body.nonce] = tx
+            executable = self._take_executable()
+            if len(executable) > 0:
+                receipts, touched = [], []
+                for tx in executable:
+                    receipt, accounts = self._execute(tx)
+                    receipts.append(receipt)
+                    touched.extend(accounts)
+                self._seal(executable, receipts, touched)
+            return results
+
+    def GetReceipt(self, request, context=None):
+        with self._lock:
+            found = self._receipts.get(request.value)
+        if found is None:
+            _abort(context, grpc.StatusCode.NOT_FOUND, "tx not found")
+        return found[0]
+
+    def GetTX(self, request, context=None):
+        # only mempool txs, executed txs are found with GetBlockTX
+        with self._lock:
+            for pending in self._mempool.values():
+                for tx in pending.values():
+                    if tx.hash == request.value:
+                        return tx
+        _abort(context, grpc.StatusCode.NOT_FOUND, "tx not found")
+
+    def GetBlockTX(self, request, context=None):
+        with self._lock:
+            found = self._receipts.get(request.value)
+            if found is None:
+                _abort(context, grpc.StatusCode.NOT_FOUND, "tx not found")
+            _, block_hash, index = found
+            block = self._blocks[self._block_index[block_hash]]
+            tx_in_block = blockchain_pb2.TxInBlock(tx=block.body.txs[index])
+            tx_in_block.txIdx.blockHash = block_hash
+            tx_in_block.txIdx.idx = index
+            return tx_in_block
+
+    def ListEvents(self, request, context=None):
+        with self._lock:
+            block_from, block_to = request.blockfrom, request.blockto
+            if request.recentBlockCnt > 0:
+                block_to = self.height
+                block_from = max(0, block_to - request.recentBlockCnt + 1)
+            elif block_to == 0:
+                block_to = self.height
+            events = [
+                event for event in self._events
+                if block_from <= event.blockNo <= block_to
+                and _event_matches(event, request)
+            ]
+        if request.desc:
+            events.reverse()
+        return rpc_pb2.EventList(events=events)
+
+    def ListEventStream(self, request, context=None):
+        stream = _Stream(self, context is None)
+        with self._lock:
+            if request.blockfrom > 0:
+                for event in self._events:
+                    if event.blockNo >= request.blockfrom \
+                            and _event_matches(event, request):
+                        stream.put(event)
+            self._event_streams[stream] = request
+        if context is not None:
+            context.add_callback(stream.cancel)
+        return stream
+
+    def ListBlockMetadataStream(self, request, context=None):
+        return self._block_stream(False, context)
+
+    def ListBlockStream(self, request, context=None):
+        return self._block_stream(True, context)
+
+    def _block_stream(self, with_body: bool, context) -> _Stream:
+        stream = _Stream(self, context is None)
+        with self._lock:
+            self._block_streams[stream] = with_body
+        if context is not None:
+            context.add_callback(stream.cancel)
+        return stream
+
+
+def _event_matches(event: blockchain_pb2.Event, info) -> bool:
+    if event.contractAddress != info.contractAddress:
+        return False
+    return len(info.eventName) == 0 or event.eventName == info.eventName
+
+
+def _fill_proof(proof, trie: SparseMerkleTrie, trie_key: bytes,
+                compressed: bool) -> Optional[bytes]:
+    """ Set the merkle proof of trie_key in an account or variable proof,
+    returns the value of trie_key if included.
+    """
+    leaf, path = trie.prove(trie_key)
+    proof.inclusion = leaf is not None and leaf.key == trie_key
+    if leaf is not None and not proof.inclusion:
+        proof.proofKey = leaf.key
+        proof.proofVal = leaf.value_hash
+    proof.height = len(path)
+    if compressed:
+        nodes, bitmap = compress(path)
+        proof.auditPath.extend(nodes)
+        proof.bitmap = bitmap
+    else:
+        proof.auditPath.extend(path)
+    return leaf.value if proof.inclusion else None
+
+
+def _tx_hash(body: blockchain_pb2.TxBody, with_sign: bool = True) -> bytes:
+    """ Same as the tx hash of herapy and aergo."""
+    h = hashlib.sha256()
+    h.update(body.nonce.to_bytes(8, 'little'))
+    h.update(body.account)
+    h.update(body.recipient)
+    h.update(body.amount)
+    h.update(body.payload)
+    h.update(body.gasLimit.to_bytes(8, 'little'))
+    h.update(body.gasPrice)
+    h.update(body.type.to_bytes(4, 'little'))
+    h.update(body.chainIdHash)
+    if with_sign:
+        h.update(body.sign)
+    return h.digest()
+
+
+def simulated_networks(
+    *names: str,
+    lib_lag: int = 0,
+    contracts_dir: str = 'contracts',
+) -> Dict[str, SimulatedChain]:
+    """ Chains named names with the repository contracts registered."""
+    chains = {}
+    for name in names:
+        chain = SimulatedChain(name, lib_lag)
+        chain.load_bytecodes(contracts_dir)
+        chains[name] = chain
+    return chains
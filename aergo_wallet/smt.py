@@ -0,0 +1,378 @@
+import hashlib
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+# empty subtrees of the aergo sparse merkle trie are a single zero byte
+DEFAULT_NODE = bytes([0])
+
+Node = Union[bytes, str]
+
+
+def _sha256(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def _node(node: Node) -> bytes:
+    """ Audit path nodes can be given as bytes or hex strings (with or
+    without 0x) like in contract call arguments.
+    """
+    if isinstance(node, str):
+        if node.startswith("0x"):
+            node = node[2:]
+        return bytes.fromhex(node)
+    return node
+
+
+def bit_is_set(bits: bytes, i: int) -> bool:
+    return bits[i // 8] & (1 << (7 - i % 8)) != 0
+
+
+def leaf_hash(trie_key: bytes, value_hash: bytes, height: int) -> bytes:
+    """ Hash of a leaf stored at height (the length of its audit path),
+    the leaf is a shortcut node so its height is part of the hash
+    (byte(256 - height) in the aergo trie, 0 for a leaf at the root).
+    """
+    return _sha256(trie_key + value_hash + bytes([(256 - height) & 0xff]))
+
+
+def audit_path(
+    ap: Sequence[Node],
+    bitmap: bytes = b'',
+    height: int = None,
+) -> List[bytes]:
+    """ Return the full audit path of a proof, ap[i] being the sibling at
+    depth len(ap) - i. A compressed proof (bitmap) is expanded with default
+    nodes.
+    """
+    ap = [_node(node) for node in ap]
+    if not bitmap:
+        return ap
+    path = []
+    ap_index = 0
+    for i in range(height):
+        if bit_is_set(bitmap, i):
+            path.append(ap[ap_index])
+            ap_index += 1
+        else:
+            path.append(DEFAULT_NODE)
+    if ap_index != len(ap):
+        raise ValueError("Proof bitmap doesn't match the audit path")
+    return path
+
+
+def compute_root(trie_key: bytes, leaf: bytes, path: Sequence[bytes]) -> bytes:
+    """ Hash leaf up to the root with the full audit path (same as
+    verifyProof in the bridge and oracle contracts).
+    """
+    node = leaf
+    height = len(path)
+    for key_index in range(height - 1, -1, -1):
+        sibling = path[height - key_index - 1]
+        if bit_is_set(trie_key, key_index):
+            node = _sha256(sibling + node)
+        else:
+            node = _sha256(node + sibling)
+    return node
+
+
+def verify_inclusion(
+    root: bytes,
+    trie_key: bytes,
+    value: bytes,
+    ap: Sequence[Node],
+) -> bool:
+    """ Verify an uncompressed proof that value is stored at trie_key."""
+    path = audit_path(ap)
+    leaf = leaf_hash(trie_key, _sha256(value), len(path))
+    return compute_root(trie_key, leaf, path) == root
+
+
+def verify_deposit_proof(
+    root: bytes,
+    map_name: str,
+    key: str,
+    value: str,
+    ap: Sequence[Node],
+) -> bool:
+    """ Same as verifyDepositProof in merkle_bridge.lua: verify that
+    value is stored in the map_name (eg '_locks') state map of the bridge
+    with storage root root.
+    """
+    trie_key = _sha256("_sv_{}-{}".format(map_name, key).encode('latin-1'))
+    return verify_inclusion(root, trie_key, value.encode('latin-1'), ap)
+
+
+def verify_state_proof(
+    root: bytes,
+    trie_key: bytes,
+    proto: bytes,
+    ap: Sequence[Node],
+) -> bool:
+    """ Same as verifyAergoStateProof in oracle.lua: verify that the
+    serialized account state proto is stored at trie_key in the state
+    trie with root root.
+    """
+    return verify_inclusion(root, trie_key, proto, ap)
+
+
+class BatchVerifier:
+    """ Verify many proofs against the same root.
+
+    Each proof is hashed from its leaf towards the root. The nodes of a
+    verified path are remembered with their position in the trie, so when
+    another proof reaches a known node its verification stops there: the
+    hashing of path prefixes shared by the proofs is done once.
+    """
+
+    def __init__(self, root: bytes) -> None:
+        self.root = root
+        # (depth, key prefix of depth bits, node hash) under root
+        self._verified: Set[Tuple[int, int, bytes]] = set()
+
+    def verify(
+        self,
+        trie_key: bytes,
+        leaf: bytes,
+        path: Sequence[bytes],
+    ) -> bool:
+        """ Verify that leaf hashed with the full audit path gives root."""
+        key = int.from_bytes(trie_key, 'big')
+        bits = len(trie_key) * 8
+        height = len(path)
+        node = leaf
+        nodes = []
+        for depth in range(height, -1, -1):
+            position = (depth, key >> (bits - depth), node)
+            if position in self._verified:
+                self._verified.update(nodes)
+                return True
+            nodes.append(position)
+            if depth == 0:
+                break
+            sibling = path[height - depth]
+            if bit_is_set(trie_key, depth - 1):
+                node = _sha256(sibling + node)
+            else:
+                node = _sha256(node + sibling)
+        if node != self.root:
+            return False
+        self._verified.update(nodes)
+        return True
+
+    def verify_proof(
+        self,
+        trie_key: bytes,
+        value: bytes,
+        proof,
+    ) -> bool:
+        """ Verify an inclusion or exclusion proof of trie_key (a herapy
+        account state proof or variable proof, compressed or not) where
+        value is the stored value if included.
+        """
+        path = audit_path(proof.auditPath, proof.bitmap, proof.height)
+        if proof.inclusion:
+            leaf = leaf_hash(trie_key, _sha256(value), len(path))
+            return self.verify(trie_key, leaf, path)
+        if not proof.proofKey:
+            # a default node is on the path of trie_key
+            return self.verify(trie_key, DEFAULT_NODE, path)
+        # another leaf is on the path of trie_key
+        for i in range(len(path)):
+            if bit_is_set(trie_key, i) != bit_is_set(proof.proofKey, i):
+                return False
+        leaf = leaf_hash(proof.proofKey, proof.proofVal, len(path))
+        return self.verify(proof.proofKey, leaf, path)
+
+    def verify_account(self, account) -> bool:
+        """ Verify the state proof of a herapy account."""
+        state_proof = account.state_proof
+        if state_proof is None or bytes(account.address) != state_proof.key:
+            return False
+        return self.verify_proof(
+            _sha256(bytes(account.address)),
+            state_proof.state.SerializeToString(), state_proof
+        )
+
+
+def verify_sc_state(
+    root: bytes,
+    sc_state,
+    verifiers: Dict[bytes, BatchVerifier] = None,
+) -> bool:
+    """ Verify the account and variable proofs of a herapy SCState (as
+    returned by query_sc_state) against the state root root.
+    Pass the same verifiers dict (root -> BatchVerifier) to verify many
+    states queried at the same root.
+    """
+    if verifiers is None:
+        verifiers = {}
+    if root not in verifiers:
+        verifiers[root] = BatchVerifier(root)
+    if not verifiers[root].verify_account(sc_state.account):
+        return False
+    var_proofs = sc_state.var_proofs
+    if len(var_proofs) == 0:
+        return False
+    storage_root = sc_state.account.state_proof.state.storageRoot
+    if storage_root not in verifiers:
+        verifiers[storage_root] = BatchVerifier(storage_root)
+    storage = verifiers[storage_root]
+    return all(
+        var_proof.key == trie_key
+        and storage.verify_proof(trie_key, var_proof.value, var_proof)
+        for trie_key, var_proof in zip(var_proofs.storage_keys, var_proofs)
+    )
+
+
+class _Leaf:
+    __slots__ = ('key', 'value', 'value_hash')
+
+    def __init__(self, key: bytes, value: bytes) -> None:
+        self.key = key
+        self.value = value
+        self.value_hash = _sha256(value)
+
+
+class _Branch:
+    __slots__ = ('left', 'right', 'hash')
+
+    def __init__(self, left, right, depth: int) -> None:
+        self.left = left
+        self.right = right
+        self.hash = _sha256(_hash(left, depth + 1) + _hash(right, depth + 1))
+
+
+def _hash(node, depth: int) -> bytes:
+    if node is None:
+        return DEFAULT_NODE
+    if isinstance(node, _Leaf):
+        return leaf_hash(node.key, node.value_hash, depth)
+    return node.hash
+
+
+def _split(a: _Leaf, b: _Leaf, depth: int) -> _Branch:
+    """ Subtree at depth holding the leaves a and b."""
+    a_right = bit_is_set(a.key, depth)
+    if a_right != bit_is_set(b.key, depth):
+        if a_right:
+            return _Branch(b, a, depth)
+        return _Branch(a, b, depth)
+    child = _split(a, b, depth + 1)
+    if a_right:
+        return _Branch(None, child, depth)
+    return _Branch(child, None, depth)
+
+
+def _insert(node, leaf: _Leaf, depth: int):
+    if node is None:
+        return leaf
+    if isinstance(node, _Leaf):
+        if node.key == leaf.key:
+            return leaf
+        return _split(node, leaf, depth)
+    if bit_is_set(leaf.key, depth):
+        return _Branch(node.left, _insert(node.right, leaf, depth + 1), depth)
+    return _Branch(_insert(node.left, leaf, depth + 1), node.right, depth)
+
+
+def _delete(node, key: bytes, depth: int):
+    if node is None:
+        return None
+    if isinstance(node, _Leaf):
+        return None if node.key == key else node
+    left, right = node.left, node.right
+    if bit_is_set(key, depth):
+        right = _delete(right, key, depth + 1)
+        if right is node.right:
+            return node
+    else:
+        left = _delete(left, key, depth + 1)
+        if left is node.left:
+            return node
+    # a leaf left alone in a subtree moves up to the subtree root
+    if left is None and (right is None or isinstance(right, _Leaf)):
+        return right
+    if right is None and isinstance(left, _Leaf):
+        return left
+    return _Branch(left, right, depth)
+
+
+class SparseMerkleTrie:
+    """ Immutable aergo sparse merkle trie of {trie key: value}, hashed like
+    the state and contract storage tries of aergo nodes.
+
+    update() returns a new trie sharing its unchanged nodes with the old
+    one, so every version of a trie can be kept to serve proofs at past
+    roots.
+    """
+
+    def __init__(self, node=None) -> None:
+        self._node = node
+
+    @property
+    def root(self) -> bytes:
+        """ Root hash of the trie, b'' if empty."""
+        if self._node is None:
+            return b''
+        return _hash(self._node, 0)
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        leaf, _ = self.prove(key)
+        if leaf is None or leaf.key != key:
+            return None
+        return leaf.value
+
+    def update(
+        self,
+        values: Dict[bytes, Optional[bytes]],
+    ) -> 'SparseMerkleTrie':
+        """ Return the trie with values stored, a None value deletes its
+        key.
+        """
+        node = self._node
+        for key, value in values.items():
+            if value is None:
+                node = _delete(node, key, 0)
+            else:
+                node = _insert(node, _Leaf(key, value), 0)
+        return SparseMerkleTrie(node)
+
+    def prove(self, key: bytes) -> Tuple[Optional[_Leaf], List[bytes]]:
+        """ Return the leaf on the path of key (the leaf of key for an
+        inclusion proof, another leaf or None for an exclusion proof) and
+        the full audit path of that position, deepest sibling first.
+        """
+        node = self._node
+        depth = 0
+        siblings = []
+        while isinstance(node, _Branch):
+            if bit_is_set(key, depth):
+                siblings.append(_hash(node.left, depth + 1))
+                node = node.right
+            else:
+                siblings.append(_hash(node.right, depth + 1))
+                node = node.left
+            depth += 1
+        siblings.reverse()
+        return node, siblings
+
+
+def compress(path: Sequence[bytes]) -> Tuple[List[bytes], bytes]:
+    """ Return the non default nodes of a full audit path and the bitmap
+    of their positions (the compressed proof format of aergo nodes).
+    """
+    bitmap = bytearray((len(path) + 7) // 8)
+    nodes = []
+    for i, node in enumerate(path):
+        if node != DEFAULT_NODE:
+            bitmap[i // 8] |= 1 << (7 - i % 8)
+            nodes.append(node)
+    return nodes, bytes(bitmap)
@@ -1,4 +1,5 @@
 from typing import (
+    List,
     Tuple,
 )
 
@@ -9,8 +10,19 @@ from aergo_wallet.exceptions import (
     InvalidArgumentsError
 )
 
+from aergo_wallet.anchor_index import (
+    AnchorIndex,
+)
+from aergo_wallet.proof_cache import (
+    ProofCache,
+)
+from aergo_wallet.event_mux import (
+    EventMux,
+)
 from aergo_wallet.wallet_utils import (
     build_deposit_proof,
+    build_deposit_proofs,
+    withdraw_args,
     is_aergo_address,
 )
 import logging
@@ -60,13 +72,36 @@ def build_burn_proof(
     bridge_to: str,
     burn_height: int,
     token_origin: str,
+    cache_from: ProofCache = None,
+    events_to: EventMux = None,
+    anchors_to: AnchorIndex = None,
 ) -> herapy.obj.sc_state.SCState:
     """ Check the last anchored root includes the burn and build
     a burn proof for that root
     """
     return build_deposit_proof(
         aergo_from, aergo_to, receiver, bridge_from, bridge_to, burn_height,
-        token_origin, "_sv__burns-"
+        token_origin, "_sv__burns-", cache_from, events_to, anchors_to
+    )
+
+
+def build_burn_proofs(
+    aergo_from: herapy.Aergo,
+    aergo_to: herapy.Aergo,
+    account_refs: List[Tuple[str, str]],
+    bridge_from: str,
+    bridge_to: str,
+    burn_height: int,
+    cache_from: ProofCache = None,
+    events_to: EventMux = None,
+    anchors_to: AnchorIndex = None,
+) -> List:
+    """ Build the burn proofs of many (receiver, token_origin) pairs against
+    the first anchored root including burn_height (the highest burn height).
+    """
+    return build_deposit_proofs(
+        aergo_from, aergo_to, account_refs, bridge_from, bridge_to,
+        burn_height, "_sv__burns-", cache_from, events_to, anchors_to
     )
 
 
@@ -84,13 +119,10 @@ def unlock(
         raise InvalidArgumentsError(
             "Receiver {} must be an Aergo address".format(receiver)
         )
-    auditPath = burn_proof.var_proofs[0].auditPath
-    ap = [node.hex() for node in auditPath]
-    balance = burn_proof.var_proofs[0].value.decode('utf-8')[1:-1]
-    ubig_balance = {'_bignum': str(balance)}
+    args = withdraw_args(receiver, token_origin, burn_proof.var_proofs[0])
     # call unlock on aergo_to with the burn proof from aergo_from
     tx, result = aergo_to.call_sc(
-        bridge_to, "unlock", args=[receiver, ubig_balance, token_origin, ap],
+        bridge_to, "unlock", args=args,
         gas_limit=gas_limit, gas_price=gas_price
     )
     if result.status != herapy.CommitStatus.TX_OK:
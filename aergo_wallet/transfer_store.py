@@ -0,0 +1,248 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Tuple,
+)
+
+# transfer statuses
+INITIATED = 'initiated'
+ANCHORED = 'anchored'
+FINALIZED = 'finalized'
+FAILED = 'failed'
+PENDING = (INITIATED, ANCHORED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    from_chain TEXT NOT NULL,
+    to_chain TEXT NOT NULL,
+    asset_name TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    deposit_height INTEGER NOT NULL,
+    amount TEXT,
+    deposit_tx TEXT,
+    status TEXT NOT NULL,
+    finalize_tx TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transfers_status
+    ON transfers (status, from_chain, to_chain, deposit_height);
+CREATE INDEX IF NOT EXISTS transfers_receiver
+    ON transfers (receiver, asset_name);
+CREATE INDEX IF NOT EXISTS transfers_height
+    ON transfers (from_chain, to_chain, deposit_height);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = (
+    "id", "from_chain", "to_chain", "asset_name", "receiver",
+    "deposit_height", "amount", "deposit_tx", "status", "finalize_tx",
+    "error", "created_at", "updated_at"
+)
+
+
+class TransferStore:
+    """ SQLite store of bridge transfers with one record per deposit.
+
+    A transfer is initiated when the lock/burn is made, anchored when an
+    anchor includes its deposit height, then finalized when minted/unlocked
+    or failed. The database uses write-ahead logging so readers don't block
+    the writes made at each initiate and finalize.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str,
+        deposit_height: int,
+        amount: int = None,
+        deposit_tx: str = None,
+        status: str = INITIATED,
+    ) -> int:
+        """ Record a new deposit and return its id."""
+        return self.add_many([(from_chain, to_chain, asset_name, receiver,
+                               deposit_height, amount, deposit_tx)],
+                             status)[0]
+
+    def add_many(
+        self,
+        transfers: Iterable[Tuple],
+        status: str = INITIATED,
+    ) -> List[int]:
+        """ Record many (from_chain, to_chain, asset_name, receiver,
+        deposit_height, amount, deposit_tx) deposits in one transaction.
+        """
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for (from_chain, to_chain, asset_name, receiver,
+                     deposit_height, amount, deposit_tx) in transfers:
+                    cur = self._conn.execute(
+                        "INSERT INTO transfers (from_chain, to_chain, "
+                        "asset_name, receiver, deposit_height, amount, "
+                        "deposit_tx, status, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (from_chain, to_chain, asset_name, receiver,
+                         deposit_height,
+                         None if amount is None else str(amount),
+                         deposit_tx, status, now, now)
+                    )
+                    ids.append(cur.lastrowid)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def get(self, transfer_id: int) -> Dict:
+        rows = self._select("WHERE id = ?", (transfer_id,))
+        if len(rows) == 0:
+            raise KeyError(transfer_id)
+        return rows[0]
+
+    def pending(
+        self,
+        from_chain: str = None,
+        to_chain: str = None,
+        receiver: str = None,
+        max_height: int = None,
+        status: Tuple[str, ...] = PENDING,
+        limit: int = None,
+    ) -> List[Dict]:
+        """ Return transfers with a status in status (initiated or anchored
+        by default) ordered by deposit height.
+        """
+        clauses = ["status IN ({})".format(",".join("?" * len(status)))]
+        params: List = list(status)
+        for column, value in [("from_chain", from_chain),
+                              ("to_chain", to_chain),
+                              ("receiver", receiver)]:
+            if value is not None:
+                clauses.append("{} = ?".format(column))
+                params.append(value)
+        if max_height is not None:
+            clauses.append("deposit_height <= ?")
+            params.append(max_height)
+        query = "WHERE " + " AND ".join(clauses) + " ORDER BY deposit_height"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._select(query, params)
+
+    def mark_anchored(
+        self,
+        from_chain: str,
+        to_chain: str,
+        anchor_height: int,
+    ) -> int:
+        """ Mark initiated deposits at or below anchor_height as anchored and
+        return how many were updated.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE transfers SET status = ?, updated_at = ? "
+                "WHERE status = ? AND from_chain = ? AND to_chain = ? "
+                "AND deposit_height <= ?",
+                (ANCHORED, time.time(), INITIATED, from_chain, to_chain,
+                 anchor_height)
+            )
+            return cur.rowcount
+
+    def mark_finalized(
+        self,
+        from_chain: str,
+        to_chain: str,
+        asset_name: str,
+        receiver: str,
+        max_height: int,
+        finalize_tx: str,
+    ) -> int:
+        """ A mint/unlock withdraws every anchored deposit of the receiver,
+        so all pending deposits up to max_height are marked finalized.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE transfers SET status = ?, finalize_tx = ?, "
+                "error = NULL, updated_at = ? "
+                "WHERE status IN (?, ?) AND from_chain = ? AND to_chain = ? "
+                "AND asset_name = ? AND receiver = ? AND deposit_height <= ?",
+                (FINALIZED, finalize_tx, time.time()) + PENDING
+                + (from_chain, to_chain, asset_name, receiver, max_height)
+            )
+            return cur.rowcount
+
+    def mark_failed(self, transfer_id: int, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE transfers SET status = ?, error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (FAILED, error, time.time(), transfer_id)
+            )
+
+    def remove(self, transfer_id: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM transfers WHERE id = ?", (transfer_id,))
+
+    def import_json(self, json_path: str) -> int:
+        """ Import the pending transfers of a json file written by older
+        versions of the cli ({id: [from, to, asset, receiver, height]}).
+        The import is done once per store, returns the number imported.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (json_path,)
+            ).fetchone()
+        if row is not None or not os.path.isfile(json_path):
+            return 0
+        with open(json_path, "r") as f:
+            pending = json.load(f)
+        ids = self.add_many(
+            (from_chain, to_chain, asset_name, receiver, height, None, None)
+            for from_chain, to_chain, asset_name, receiver, height
+            in pending.values()
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                (json_path, "imported")
+            )
+        return len(ids)
+
+    def _select(self, query: str, params) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT {} FROM transfers {}".format(
+                    ", ".join(_COLUMNS), query),
+                params
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
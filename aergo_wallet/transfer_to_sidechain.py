@@ -1,5 +1,6 @@
 import json
 from typing import (
+    List,
     Tuple,
 )
 
@@ -10,8 +11,19 @@ from aergo_wallet.exceptions import (
     InvalidArgumentsError,
 )
 
+from aergo_wallet.anchor_index import (
+    AnchorIndex,
+)
+from aergo_wallet.proof_cache import (
+    ProofCache,
+)
+from aergo_wallet.event_mux import (
+    EventMux,
+)
 from aergo_wallet.wallet_utils import (
     build_deposit_proof,
+    build_deposit_proofs,
+    withdraw_args,
     is_aergo_address
 )
 import logging
@@ -67,13 +79,36 @@ def build_lock_proof(
     bridge_to: str,
     lock_height: int,
     token_origin: str,
+    cache_from: ProofCache = None,
+    events_to: EventMux = None,
+    anchors_to: AnchorIndex = None,
 ) -> herapy.obj.sc_state.SCState:
     """ Check the last anchored root includes the lock and build
     a lock proof for that root
     """
     return build_deposit_proof(
         aergo_from, aergo_to, receiver, bridge_from, bridge_to, lock_height,
-        token_origin, "_sv__locks-"
+        token_origin, "_sv__locks-", cache_from, events_to, anchors_to
+    )
+
+
+def build_lock_proofs(
+    aergo_from: herapy.Aergo,
+    aergo_to: herapy.Aergo,
+    account_refs: List[Tuple[str, str]],
+    bridge_from: str,
+    bridge_to: str,
+    lock_height: int,
+    cache_from: ProofCache = None,
+    events_to: EventMux = None,
+    anchors_to: AnchorIndex = None,
+) -> List:
+    """ Build the lock proofs of many (receiver, token_origin) pairs against
+    the first anchored root including lock_height (the highest lock height).
+    """
+    return build_deposit_proofs(
+        aergo_from, aergo_to, account_refs, bridge_from, bridge_to,
+        lock_height, "_sv__locks-", cache_from, events_to, anchors_to
     )
 
 
@@ -91,13 +126,10 @@ def mint(
         raise InvalidArgumentsError(
             "Receiver {} must be an Aergo address".format(receiver)
         )
-    auditPath = lock_proof.var_proofs[0].auditPath
-    ap = [node.hex() for node in auditPath]
-    balance = lock_proof.var_proofs[0].value.decode('utf-8')[1:-1]
-    ubig_balance = {'_bignum': str(balance)}
+    args = withdraw_args(receiver, token_origin, lock_proof.var_proofs[0])
     # call mint on aergo_to with the lock proof from aergo_from
     tx, result = aergo_to.call_sc(
-        bridge_to, "mint", args=[receiver, ubig_balance, token_origin, ap],
+        bridge_to, "mint", args=args,
         gas_limit=gas_limit, gas_price=gas_price
     )
     if result.status != herapy.CommitStatus.TX_OK:
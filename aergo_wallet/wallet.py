@@ -1,11 +1,17 @@
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
 from getpass import getpass
 import json
+import threading
 
 from typing import (
+    Callable,
     Union,
     Tuple,
     List,
     Dict,
+    Optional,
 )
 
 import aergo.herapy as herapy
@@ -16,11 +22,13 @@ from aergo.herapy.errors.general_exception import (
 from aergo_wallet.transfer_to_sidechain import (
     lock,
     build_lock_proof,
+    build_lock_proofs,
     mint,
 )
 from aergo_wallet.transfer_from_sidechain import (
     burn,
     build_burn_proof,
+    build_burn_proofs,
     unlock,
 )
 from aergo_wallet.exceptions import (
@@ -28,14 +36,42 @@ from aergo_wallet.exceptions import (
     InsufficientBalanceError,
 )
 from aergo_wallet.wallet_utils import (
+    NO_DEPOSIT_ERROR,
     get_balance,
+    get_balances,
+    is_aergo_address,
     transfer,
-    bridge_withdrawable_balance,
-    wait_finalization
+    bridge_withdrawable_balances,
+    send_sc_calls,
+    withdraw_args,
 )
 from aergo_wallet.token_deployer import (
     deploy_token,
 )
+from aergo_wallet.connection_pool import (
+    ConnectionPool,
+)
+from aergo_wallet.account_cache import (
+    AccountCache,
+)
+from aergo_wallet.finality import (
+    FinalityWaiter,
+)
+from aergo_wallet.proof_cache import (
+    ProofCache,
+)
+from aergo_wallet.metrics import (
+    MetricsRegistry,
+)
+from aergo_wallet.node_provider import (
+    network_ips,
+)
+from aergo_wallet.event_mux import (
+    EventMux,
+)
+from aergo_wallet.anchor_index import (
+    AnchorIndex,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -50,13 +86,39 @@ class AergoWallet:
         self,
         config_file_path: str,
         config_data: Dict = None,
+        account_cache_ttl: float = 300,
+        proof_cache_path: str = None,
+        metrics: MetricsRegistry = None,
     ) -> None:
+        """ Decrypted private keys are kept in memory for account_cache_ttl
+        seconds (0 to disable) so that multi step transfers only decrypt the
+        keystore once, the password is still checked at every call.
+        Proofs at anchored roots are cached in memory, and also in the
+        proof_cache_path SQLite database if given.
+        Node calls are recorded in metrics (the process default registry
+        if None).
+        """
         if config_data is None:
             with open(config_file_path, "r") as f:
                 config_data = json.load(f)
         self._config_data = config_data
         self._config_path = config_file_path
         self.gas_price = 0
+        self._pool = ConnectionPool(metrics=metrics)
+        self._account_cache = AccountCache(account_cache_ttl)
+        # network name -> finality waiter shared by all wallet calls
+        self._finality_waiters: Dict[str, FinalityWaiter] = {}
+        self._finality_lock = threading.Lock()
+        # network name -> cache of proofs and finalized block roots
+        self._proof_caches: Dict[str, ProofCache] = {}
+        self._proof_cache_path = proof_cache_path
+        self._proof_cache_lock = threading.Lock()
+        # network name -> event streams shared by all wallet calls
+        self._event_muxes: Dict[str, EventMux] = {}
+        self._event_mux_lock = threading.Lock()
+        # (from_chain, to_chain) -> index of the anchors of from_chain
+        self._anchor_indexes: Dict[Tuple[str, str], AnchorIndex] = {}
+        self._anchor_index_lock = threading.Lock()
 
     def config_data(
         self,
@@ -86,17 +148,46 @@ class AergoWallet:
         password: str = None
     ) -> str:
         """ Load and maybe prompt user password to decrypt keystore."""
+        account = self._load_account(account_name, password)
+        priv_key = str(account.private_key)
+        return priv_key
+
+    def _load_account(
+        self,
+        account_name: str = 'default',
+        password: str = None
+    ) -> herapy.Account:
+        """ Get the account from the account cache or decrypt the keystore
+        and maybe prompt user password.
+        """
         keystore_path = self.config_data('wallet', account_name, 'keystore')
+        if password is None:
+            logger.info("Decrypt exported private key '%s'", account_name)
+            while True:
+                password = getpass("Password: ")
+                try:
+                    return self._decrypt_account(
+                        account_name, keystore_path, password)
+                except GeneralException:
+                    logger.info("Wrong password, try again")
+        return self._decrypt_account(account_name, keystore_path, password)
+
+    def _decrypt_account(
+        self,
+        account_name: str,
+        keystore_path: str,
+        password: str,
+    ) -> herapy.Account:
+        # the cache only returns the key decrypted with the same password
+        private_key = self._account_cache.get(account_name, password)
+        if private_key is not None:
+            return herapy.Account(private_key=private_key)
         with open(keystore_path, "r") as f:
             keystore = f.read()
-        if password is None:
-            password = getpass("Decrypt exported private key '{}'\nPassword: "
-                               .format(account_name))
-        aergo = herapy.Aergo()
-        account = aergo.import_account_from_keystore(
-            keystore, password, skip_state=True, skip_self=True)
-        priv_key = str(account.private_key)
-        return priv_key
+        account = herapy.Account.decrypt_from_keystore(keystore, password)
+        self._account_cache.put(account_name, password,
+                                bytes(account.private_key))
+        return account
 
     def create_account(
         self,
@@ -177,9 +268,86 @@ class AergoWallet:
         self.save_config()
 
     def _connect_aergo(self, network_name: str) -> herapy.Aergo:
-        aergo = herapy.Aergo()
-        aergo.connect(self.config_data('networks', network_name, 'ip'))
-        return aergo
+        """ Get a connection to network_name from the pool, it should be
+        given back with self._pool.release(aergo) when done.
+        """
+        return self._pool.acquire(
+            network_ips(self.config_data('networks', network_name)),
+            network_name
+        )
+
+    def _proof_cache(self, network_name: str) -> ProofCache:
+        with self._proof_cache_lock:
+            cache = self._proof_caches.get(network_name)
+            if cache is None:
+                cache = ProofCache(network_name, path=self._proof_cache_path)
+                self._proof_caches[network_name] = cache
+        return cache
+
+    def _event_mux(self, network_name: str) -> EventMux:
+        """ Return the EventMux sharing the event streams of network_name
+        between wallet calls.
+        """
+        with self._event_mux_lock:
+            mux = self._event_muxes.get(network_name)
+            if mux is None:
+                mux = EventMux(self._connect_aergo(network_name))
+                self._event_muxes[network_name] = mux
+        return mux
+
+    def _anchor_index(
+        self,
+        from_chain: str,
+        to_chain: str,
+    ) -> Optional[AnchorIndex]:
+        """ Return the index of the anchors of from_chain made on to_chain
+        if its path is configured in the "anchor_index" of the bridge.
+        """
+        try:
+            path = self.config_data(
+                'networks', to_chain, 'bridges', from_chain, 'anchor_index')
+        except KeyError:
+            return None
+        with self._anchor_index_lock:
+            index = self._anchor_indexes.get((from_chain, to_chain))
+            if index is None:
+                index = AnchorIndex(path)
+                self._anchor_indexes[(from_chain, to_chain)] = index
+        return index
+
+    def close(self) -> None:
+        """ Close the connections kept open by the wallet and erase cached
+        private keys.
+        """
+        with self._finality_lock:
+            waiters = list(self._finality_waiters.values())
+            self._finality_waiters = {}
+        with self._proof_cache_lock:
+            caches = list(self._proof_caches.values())
+            self._proof_caches = {}
+        for cache in caches:
+            cache.close()
+        with self._anchor_index_lock:
+            indexes = list(self._anchor_indexes.values())
+            self._anchor_indexes = {}
+        for index in indexes:
+            index.close()
+        with self._event_mux_lock:
+            muxes = list(self._event_muxes.values())
+            self._event_muxes = {}
+        for mux in muxes:
+            mux.close()
+            self._pool.release(mux.aergo)
+        for waiter in waiters:
+            self._pool.release(waiter.aergo)
+        self._pool.close()
+        self._account_cache.clear()
+
+    def __enter__(self) -> 'AergoWallet':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def get_aergo(
         self,
@@ -191,26 +359,40 @@ class AergoWallet:
         """ Return aergo provider with account loaded from keystore """
         if network_name is None:
             raise InvalidArgumentsError("Provide network_name")
-        keystore_path = self.config_data('wallet', privkey_name, 'keystore')
-        with open(keystore_path, "r") as f:
-            keystore = f.read()
+        account = self._load_account(privkey_name, privkey_pwd)
         aergo = self._connect_aergo(network_name)
-        if privkey_pwd is None:
-            logger.info("Decrypt exported private key '%s'", privkey_name)
-            while True:
-                try:
-                    privkey_pwd = getpass("Password: ")
-                    aergo.import_account_from_keystore(
-                        keystore, privkey_pwd, skip_state=skip_state)
-                except GeneralException:
-                    logger.info("Wrong password, try again")
-                    continue
-                break
-        else:
-            aergo.import_account_from_keystore(
-                keystore, privkey_pwd, skip_state=skip_state)
+        aergo.account = account
+        if not skip_state:
+            try:
+                aergo.get_account()
+            except Exception:
+                self._pool.release(aergo)
+                raise
         return aergo
 
+    def _connect_withdrawal(
+        self,
+        from_chain: str,
+        to_chain: str,
+        privkey_name: str = None,
+        privkey_pwd: str = None,
+    ) -> Tuple[herapy.Aergo, herapy.Aergo]:
+        """ Get connections to from_chain and to_chain with the account
+        loaded on to_chain (if privkey_name is given), both should be given
+        back to the pool when done.
+        """
+        aergo_from = self._connect_aergo(from_chain)
+        try:
+            if privkey_name is None:
+                aergo_to = self._connect_aergo(to_chain)
+            else:
+                aergo_to = self.get_aergo(to_chain, privkey_name,
+                                          privkey_pwd)
+        except Exception:
+            self._pool.release(aergo_from)
+            raise
+        return aergo_from, aergo_to
+
     def get_asset_address(
         self,
         asset_name: str,
@@ -244,15 +426,105 @@ class AergoWallet:
         if account_addr is None:
             account_addr = self.get_wallet_address(account_name)
         aergo = self._connect_aergo(network_name)
-        if asset_name == 'aergo':
-            asset_addr = 'aergo'
-        else:
-            asset_addr = self.get_asset_address(asset_name, network_name,
-                                                asset_origin_chain)
-        balance = get_balance(account_addr, asset_addr, aergo)
-        aergo.disconnect()
+        try:
+            if asset_name == 'aergo':
+                asset_addr = 'aergo'
+            else:
+                asset_addr = self.get_asset_address(asset_name, network_name,
+                                                    asset_origin_chain)
+            balance = get_balance(account_addr, asset_addr, aergo)
+        finally:
+            self._pool.release(aergo)
         return balance, asset_addr
 
+    def get_balances(
+        self,
+        network_name: str,
+        queries: List[Tuple[str, str]],
+        asset_origin_chain: str = None,
+    ) -> List[int]:
+        """ Get the balances of many (account address, asset name) pairs
+        on network_name, and specify asset_origin_chain for pegged assets.
+        Balances of the same token are queried together.
+        """
+        asset_addrs: Dict[str, str] = {}
+        for _, asset_name in queries:
+            if asset_name in asset_addrs:
+                continue
+            if asset_name == 'aergo':
+                asset_addrs[asset_name] = 'aergo'
+            else:
+                asset_addrs[asset_name] = self.get_asset_address(
+                    asset_name, network_name, asset_origin_chain)
+        aergo = self._connect_aergo(network_name)
+        try:
+            balances = get_balances(
+                [(account_addr, asset_addrs[asset_name])
+                 for account_addr, asset_name in queries],
+                aergo
+            )
+        finally:
+            self._pool.release(aergo)
+        return balances
+
+    def portfolio_snapshot(
+        self,
+        max_workers: int = 8,
+    ) -> Dict[str, Dict[str, List[Tuple[str, str, int]]]]:
+        """ Get the balances of every account in config.json for aer and
+        every registered token and peg on every network.
+        Networks are queried concurrently and balances of the same token
+        are queried together. Pegs on networks missing from config.json are
+        skipped.
+        Returns {account name: {asset name: [(network name, asset address,
+        balance)]}}
+        """
+        accounts = [(name, info['addr'])
+                    for name, info in self.config_data('wallet').items()]
+        # network name -> [(asset name, asset address)]
+        assets: Dict[str, List[Tuple[str, str]]] = {}
+        networks = self.config_data('networks')
+        for net_name, net in networks.items():
+            for token_name, token in net['tokens'].items():
+                assets.setdefault(net_name, []).append(
+                    (token_name, token['addr']))
+                for peg_net, peg_addr in token['pegs'].items():
+                    if peg_net not in networks:
+                        logger.warning(
+                            "Skipping %s peg on unknown network %s",
+                            token_name, peg_net)
+                        continue
+                    assets.setdefault(peg_net, []).append(
+                        (token_name, peg_addr))
+        for net_name in networks:
+            assets.setdefault(net_name, []).append(('aergo', 'aergo'))
+
+        def query_network(net_name: str) -> List[int]:
+            aergo = self._connect_aergo(net_name)
+            try:
+                return get_balances(
+                    [(addr, asset_addr)
+                     for _, addr in accounts
+                     for _, asset_addr in assets[net_name]],
+                    aergo, max_workers
+                )
+            finally:
+                self._pool.release(aergo)
+
+        snapshot: Dict[str, Dict[str, List[Tuple[str, str, int]]]] = {
+            name: {} for name, _ in accounts
+        }
+        with ThreadPoolExecutor(max_workers) as executor:
+            net_balances = executor.map(query_network, list(assets))
+            for net_name, balances in zip(assets, net_balances):
+                i = 0
+                for account_name, _ in accounts:
+                    for asset_name, asset_addr in assets[net_name]:
+                        snapshot[account_name].setdefault(asset_name, []) \
+                            .append((net_name, asset_addr, balances[i]))
+                        i += 1
+        return snapshot
+
     def get_mintable_balance(
         self,
         from_chain: str,
@@ -269,21 +541,22 @@ class AergoWallet:
         """
         if account_addr is None:
             account_addr = self.get_wallet_address(account_name)
-        asset_address_origin = self.config_data(
-            'networks', from_chain, 'tokens', asset_name, 'addr')
-        bridge_from = self.config_data(
-            'networks', from_chain, 'bridges', to_chain, 'addr')
-        bridge_to = self.config_data(
-            'networks', to_chain, 'bridges', from_chain, 'addr')
-        aergo_from = self._connect_aergo(from_chain)
-        aergo_to = self._connect_aergo(to_chain)
-        withdrawable, pending = bridge_withdrawable_balance(
-            account_addr, asset_address_origin, bridge_from, bridge_to,
-            aergo_from, aergo_to, "_sv__locks-", "_sv__mints-"
+        return self.get_mintable_balances(
+            from_chain, to_chain, [(account_addr, asset_name)])[0]
+
+    def get_mintable_balances(
+        self,
+        from_chain: str,
+        to_chain: str,
+        queries: List[Tuple[str, str]],
+    ) -> List[Tuple[int, int]]:
+        """ Get the (mintable, pending) balances of many (account address,
+        asset name) pairs locked on from_chain, in the order of queries.
+        """
+        return self._get_withdrawable_balances(
+            from_chain, to_chain, from_chain, queries,
+            "_sv__locks-", "_sv__mints-"
         )
-        aergo_from.disconnect()
-        aergo_to.disconnect()
-        return withdrawable, pending
 
     def get_unlockable_balance(
         self,
@@ -301,21 +574,52 @@ class AergoWallet:
         """
         if account_addr is None:
             account_addr = self.get_wallet_address(account_name)
-        asset_address_origin = self.config_data(
-            'networks', to_chain, 'tokens', asset_name, 'addr')
+        return self.get_unlockable_balances(
+            from_chain, to_chain, [(account_addr, asset_name)])[0]
+
+    def get_unlockable_balances(
+        self,
+        from_chain: str,
+        to_chain: str,
+        queries: List[Tuple[str, str]],
+    ) -> List[Tuple[int, int]]:
+        """ Get the (unlockable, pending) balances of many (account address,
+        asset name) pairs burnt on from_chain, in the order of queries.
+        """
+        return self._get_withdrawable_balances(
+            from_chain, to_chain, to_chain, queries,
+            "_sv__burns-", "_sv__unlocks-"
+        )
+
+    def _get_withdrawable_balances(
+        self,
+        from_chain: str,
+        to_chain: str,
+        origin_chain: str,
+        queries: List[Tuple[str, str]],
+        deposit_key: str,
+        withdraw_key: str,
+    ) -> List[Tuple[int, int]]:
         bridge_from = self.config_data(
             'networks', from_chain, 'bridges', to_chain, 'addr')
         bridge_to = self.config_data(
             'networks', to_chain, 'bridges', from_chain, 'addr')
-        aergo_from = self._connect_aergo(from_chain)
-        aergo_to = self._connect_aergo(to_chain)
-        withdrawable, pending = bridge_withdrawable_balance(
-            account_addr, asset_address_origin, bridge_from, bridge_to,
-            aergo_from, aergo_to, "_sv__burns-", "_sv__unlocks-"
-        )
-        aergo_from.disconnect()
-        aergo_to.disconnect()
-        return withdrawable, pending
+        asset_queries = [
+            (account_addr,
+             self.config_data(
+                 'networks', origin_chain, 'tokens', asset_name, 'addr'))
+            for account_addr, asset_name in queries
+        ]
+        aergo_from, aergo_to = self._connect_withdrawal(from_chain, to_chain)
+        try:
+            balances = bridge_withdrawable_balances(
+                asset_queries, bridge_from, bridge_to, aergo_from, aergo_to,
+                deposit_key, withdraw_key, self._proof_cache(from_chain)
+            )
+        finally:
+            self._pool.release(aergo_from)
+            self._pool.release(aergo_to)
+        return balances
 
     def get_bridge_tempo(
         self,
@@ -337,16 +641,21 @@ class AergoWallet:
             return t_anchor, t_final
         logger.info(
             "getting latest t_anchor and t_final from bridge contract...")
-        if aergo is None:
-            aergo = self._connect_aergo(to_chain)
         if bridge_address is None:
             bridge_address = self.config_data(
                 'networks', to_chain, 'bridges', from_chain, 'addr')
+        pooled = aergo is None
+        if pooled:
+            aergo = self._connect_aergo(to_chain)
         # Get bridge information
-        bridge_info = aergo.query_sc_state(bridge_address,
-                                           ["_sv__tAnchor",
-                                            "_sv__tFinal",
-                                            ])
+        try:
+            bridge_info = aergo.query_sc_state(bridge_address,
+                                               ["_sv__tAnchor",
+                                                "_sv__tFinal",
+                                                ])
+        finally:
+            if pooled:
+                self._pool.release(aergo)
         if not bridge_info.account.state_proof.inclusion:
             raise InvalidArgumentsError(
                 "Contract doesnt exist in state, check contract deployed and "
@@ -359,7 +668,6 @@ class AergoWallet:
                                         bridge_info)
         t_anchor, t_final = [int(item.value)
                              for item in bridge_info.var_proofs]
-        aergo.disconnect()
         self.config_data(
             'networks', to_chain, 'bridges', from_chain, "t_anchor",
             value=t_anchor)
@@ -371,10 +679,20 @@ class AergoWallet:
 
     def wait_finalization(
         self,
-        network_name: str
-    ) -> None:
-        aergo = self._connect_aergo(network_name)
-        wait_finalization(aergo)
+        network_name: str,
+        height: int = None,
+        timeout: float = None,
+    ) -> int:
+        """ Wait until height (the current best block by default) is final
+        on network_name and return the last irreversible block.
+        Concurrent waits on the same network share one block stream.
+        """
+        with self._finality_lock:
+            waiter = self._finality_waiters.get(network_name)
+            if waiter is None:
+                waiter = FinalityWaiter(self._connect_aergo(network_name))
+                self._finality_waiters[network_name] = waiter
+        return waiter.wait(height, timeout)
 
     def transfer(
         self,
@@ -391,28 +709,31 @@ class AergoWallet:
         """
         aergo = self.get_aergo(network_name, privkey_name, privkey_pwd,
                                skip_state=True)
-        sender = str(aergo.account.address)
-        balance, asset_addr = self.get_balance(
-            asset_name, network_name, asset_origin_chain, account_addr=sender
-        )
-        if asset_name == 'aergo':
-            gas_limit = 300000
-            if balance < value + gas_limit * self.gas_price:
-                raise InsufficientBalanceError("not enough balance")
-        else:
-            gas_limit = 300000
-            if balance < value:
-                raise InsufficientBalanceError("not enough token balance")
-            aer_balance, _ = self.get_balance(
-                'aergo', network_name, account_addr=sender
+        try:
+            sender = str(aergo.account.address)
+            balance, asset_addr = self.get_balance(
+                asset_name, network_name, asset_origin_chain,
+                account_addr=sender
             )
-            if aer_balance < gas_limit * self.gas_price:
-                err = "not enough aer balance to pay tx fee"
-                raise InsufficientBalanceError(err)
+            if asset_name == 'aergo':
+                gas_limit = 300000
+                if balance < value + gas_limit * self.gas_price:
+                    raise InsufficientBalanceError("not enough balance")
+            else:
+                gas_limit = 300000
+                if balance < value:
+                    raise InsufficientBalanceError("not enough token balance")
+                aer_balance, _ = self.get_balance(
+                    'aergo', network_name, account_addr=sender
+                )
+                if aer_balance < gas_limit * self.gas_price:
+                    err = "not enough aer balance to pay tx fee"
+                    raise InsufficientBalanceError(err)
 
-        tx_hash = transfer(value, to, asset_addr, aergo, sender, gas_limit,
-                           self.gas_price)
-        aergo.disconnect()
+            tx_hash = transfer(value, to, asset_addr, aergo, sender, gas_limit,
+                               self.gas_price)
+        finally:
+            self._pool.release(aergo)
         logger.info("Transfer success: %s", tx_hash)
         return tx_hash
 
@@ -430,25 +751,27 @@ class AergoWallet:
         config_data
         """
         aergo = self.get_aergo(network_name, privkey_name, privkey_pwd)
-        if receiver is None:
-            receiver = str(aergo.account.address)
-        logger.info("  > Sender Address: %s", receiver)
+        try:
+            if receiver is None:
+                receiver = str(aergo.account.address)
+            logger.info("  > Sender Address: %s", receiver)
 
-        gas_limit = 0
-        sc_address = deploy_token(payload_str, aergo, receiver, total_supply,
-                                  gas_limit, self.gas_price)
+            gas_limit = 0
+            sc_address = deploy_token(payload_str, aergo, receiver,
+                                      total_supply, gas_limit, self.gas_price)
 
-        logger.info("------ Store address in config.json -----------")
-        self.config_data(
-            'networks', network_name, 'tokens', asset_name, value={})
-        self.config_data(
-            'networks', network_name, 'tokens', asset_name, 'addr',
-            value=sc_address)
-        self.config_data(
-            'networks', network_name, 'tokens', asset_name, 'pegs',
-            value={})
-        self.save_config()
-        aergo.disconnect()
+            logger.info("------ Store address in config.json -----------")
+            self.config_data(
+                'networks', network_name, 'tokens', asset_name, value={})
+            self.config_data(
+                'networks', network_name, 'tokens', asset_name, 'addr',
+                value=sc_address)
+            self.config_data(
+                'networks', network_name, 'tokens', asset_name, 'pegs',
+                value={})
+            self.save_config()
+        finally:
+            self._pool.release(aergo)
         return sc_address
 
     def transfer_to_sidechain(
@@ -477,7 +800,7 @@ class AergoWallet:
         )
         logger.info("pending mint: %s", mintable + pending)
         logger.info("waiting finalisation ...")
-        self.wait_finalization(from_chain)
+        self.wait_finalization(from_chain, lock_height)
 
         self.finalize_transfer_mint(
             from_chain, to_chain, asset_name, receiver, lock_height,
@@ -510,7 +833,7 @@ class AergoWallet:
         )
         logger.info("pending unlock: %s", unlockable + pending)
         logger.info("waiting finalisation ...")
-        self.wait_finalization(from_chain)
+        self.wait_finalization(from_chain, burn_height)
 
         self.finalize_transfer_unlock(
             from_chain, to_chain, asset_name, receiver, burn_height,
@@ -531,42 +854,140 @@ class AergoWallet:
         """
         logger.info(from_chain + ' -> ' + to_chain)
         aergo_from = self.get_aergo(from_chain, privkey_name, privkey_pwd)
-        sender = str(aergo_from.account.address)
-        if receiver is None:
-            receiver = sender
+        try:
+            sender = str(aergo_from.account.address)
+            if receiver is None:
+                receiver = sender
+            bridge_from = self.config_data(
+                'networks', from_chain, 'bridges', to_chain, 'addr')
+            asset_address = self.config_data(
+                'networks', from_chain, 'tokens', asset_name, 'addr')
+
+            gas_limit = 300000
+            balance = get_balance(sender, asset_address, aergo_from)
+            if balance < amount:
+                raise InsufficientBalanceError("not enough token balance")
+            logger.info(
+                "\U0001f4b0 %s balance on origin before transfer: %s",
+                asset_name, balance / 10**18
+            )
+
+            aer_balance = get_balance(sender, 'aergo', aergo_from)
+            if aer_balance < gas_limit * self.gas_price:
+                err = "not enough aer balance to pay tx fee"
+                raise InsufficientBalanceError(err)
+
+            lock_height, tx_hash = lock(aergo_from, bridge_from,
+                                        receiver, amount, asset_address,
+                                        gas_limit, self.gas_price)
+            logger.info('\U0001f512 Lock success: %s', tx_hash)
+
+            # remaining balance on origin : aer or asset
+            balance = get_balance(sender, asset_address, aergo_from)
+            logger.info(
+                "\U0001f4b0 remaining %s balance on origin after transfer: %s",
+                asset_name, balance / 10**18
+            )
+        finally:
+            self._pool.release(aergo_from)
+        return lock_height, tx_hash
+
+    def initiate_many(
+        self,
+        from_chain: str,
+        to_chain: str,
+        transfers: List[Tuple[str, int, str]],
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        on_receipt: Callable[[int, int, str], None] = None,
+    ) -> List[Tuple[Optional[int], Optional[str], Optional[str]]]:
+        """ Initiate many (asset name, amount, receiver) transfers from
+        from_chain to to_chain by locking native assets of from_chain and
+        burning assets pegged from to_chain.
+        Balances are checked for the total amounts, then all txs are
+        submitted together with consecutive nonces.
+        on_receipt(index, deposit height, tx hash) is called for each
+        successful transfer as its receipt arrives.
+        Returns a (deposit height, tx hash, error) tuple for each transfer.
+        """
+        if len(transfers) == 0:
+            return []
+        logger.info(from_chain + ' -> ' + to_chain)
         bridge_from = self.config_data(
             'networks', from_chain, 'bridges', to_chain, 'addr')
-        asset_address = self.config_data(
-            'networks', from_chain, 'tokens', asset_name, 'addr')
-
-        gas_limit = 300000
-        balance = get_balance(sender, asset_address, aergo_from)
-        if balance < amount:
-            raise InsufficientBalanceError("not enough token balance")
-        logger.info(
-            "\U0001f4b0 %s balance on origin before transfer: %s",
-            asset_name, balance / 10**18
-        )
+        results: List[Tuple[Optional[int], Optional[str], Optional[str]]] = []
+        aergo_from = self.get_aergo(from_chain, privkey_name, privkey_pwd)
+        try:
+            sender = str(aergo_from.account.address)
 
-        aer_balance = get_balance(sender, 'aergo', aergo_from)
-        if aer_balance < gas_limit * self.gas_price:
-            err = "not enough aer balance to pay tx fee"
-            raise InsufficientBalanceError(err)
+            calls: List[Tuple[str, str, List]] = []
+            # asset address -> total amount sent
+            totals: Dict[str, int] = {}
+            for asset_name, amount, receiver in transfers:
+                if receiver is None:
+                    receiver = sender
+                if not is_aergo_address(receiver):
+                    raise InvalidArgumentsError(
+                        "Receiver {} must be an Aergo address".format(receiver)
+                    )
+                try:
+                    asset_address = self.config_data(
+                        'networks', from_chain, 'tokens', asset_name, 'addr')
+                    calls.append((asset_address, "transfer",
+                                  [bridge_from, {"_bignum": str(amount)},
+                                   receiver]))
+                except KeyError:
+                    try:
+                        asset_address = self.config_data(
+                            'networks', to_chain, 'tokens', asset_name, 'pegs',
+                            from_chain)
+                    except KeyError:
+                        raise InvalidArgumentsError(
+                            "Asset {} not registered between {} and {}"
+                            .format(asset_name, from_chain, to_chain))
+                    calls.append((bridge_from, "burn",
+                                  [receiver, {"_bignum": str(amount)},
+                                   asset_address]))
+                totals[asset_address] = totals.get(asset_address, 0) + amount
 
-        lock_height, tx_hash = lock(aergo_from, bridge_from,
-                                    receiver, amount, asset_address, gas_limit,
-                                    self.gas_price)
-        logger.info('\U0001f512 Lock success: %s', tx_hash)
+            gas_limit = 300000
+            assets = list(totals)
+            balances = get_balances(
+                [(sender, asset) for asset in assets + ['aergo']], aergo_from)
+            for asset_address, balance in zip(assets, balances):
+                if balance < totals[asset_address]:
+                    raise InsufficientBalanceError(
+                        "not enough token balance for {}"
+                        .format(asset_address))
+            if balances[-1] < len(calls) * gas_limit * self.gas_price:
+                err = "not enough aer balance to pay tx fees"
+                raise InsufficientBalanceError(err)
 
-        # remaining balance on origin : aer or asset
-        balance = get_balance(sender, asset_address, aergo_from)
+            committed = send_sc_calls(aergo_from, calls, gas_limit,
+                                      self.gas_price)
+            for i, (tx_hash, err) in enumerate(committed):
+                if tx_hash is None:
+                    results.append((None, None, err))
+                    continue
+                result = aergo_from.wait_tx_result(tx_hash)
+                if result is None or \
+                        result.status != herapy.TxResultStatus.SUCCESS:
+                    results.append((None, tx_hash,
+                                    "{} Tx execution failed : {}"
+                                    .format(calls[i][1], result)))
+                    continue
+                # get precise deposit height
+                deposit_height = aergo_from.get_tx(tx_hash).block.height
+                results.append((deposit_height, tx_hash, None))
+                if on_receipt is not None:
+                    on_receipt(i, deposit_height, tx_hash)
+        finally:
+            self._pool.release(aergo_from)
         logger.info(
-            "\U0001f4b0 remaining %s balance on origin after transfer: %s",
-            asset_name, balance / 10**18
+            "Initiated %s/%s transfers",
+            len([1 for _, _, err in results if err is None]), len(transfers)
         )
-
-        aergo_from.disconnect()
-        return lock_height, tx_hash
+        return results
 
     def finalize_transfer_mint(
         self,
@@ -576,7 +997,8 @@ class AergoWallet:
         receiver: str = None,
         lock_height: int = 0,
         privkey_name: str = 'default',
-        privkey_pwd: str = None
+        privkey_pwd: str = None,
+        lock_proof=None,
     ) -> Tuple[str, str]:
         """
         Finalize a transfer of assets to a sidechain by minting then
@@ -585,57 +1007,65 @@ class AergoWallet:
         The amount to mint is the difference between total deposit and
         already minted amount.
         Bridge tempo is taken from config_data
+        lock_proof is built if not given.
         """
         logger.info(from_chain + ' -> ' + to_chain)
-        aergo_from = self._connect_aergo(from_chain)
-        aergo_to = self.get_aergo(to_chain, privkey_name, privkey_pwd)
-        tx_sender = str(aergo_to.account.address)
-        if receiver is None:
-            receiver = tx_sender
-        bridge_from = self.config_data(
-            'networks', from_chain, 'bridges', to_chain, 'addr')
-        bridge_to = self.config_data(
-            'networks', to_chain, 'bridges', from_chain, 'addr')
-        asset_address = self.config_data(
-            'networks', from_chain, 'tokens', asset_name, 'addr')
-        save_pegged_token_address = False
+        aergo_from, aergo_to = self._connect_withdrawal(
+            from_chain, to_chain, privkey_name, privkey_pwd)
         try:
-            token_pegged = self.config_data(
-                'networks', from_chain, 'tokens', asset_name, 'pegs', to_chain)
+            tx_sender = str(aergo_to.account.address)
+            if receiver is None:
+                receiver = tx_sender
+            bridge_from = self.config_data(
+                'networks', from_chain, 'bridges', to_chain, 'addr')
+            bridge_to = self.config_data(
+                'networks', to_chain, 'bridges', from_chain, 'addr')
+            asset_address = self.config_data(
+                'networks', from_chain, 'tokens', asset_name, 'addr')
+            save_pegged_token_address = False
+            try:
+                token_pegged = self.config_data(
+                    'networks', from_chain, 'tokens', asset_name, 'pegs',
+                    to_chain)
+                balance = get_balance(receiver, token_pegged, aergo_to)
+                logger.info(
+                    "\U0001f4b0 %s balance on destination before transfer :"
+                    " %s",
+                    asset_name, balance / 10**18
+                )
+            except KeyError:
+                logger.info("Pegged token unknow by wallet")
+                save_pegged_token_address = True
+
+            gas_limit = 300000
+            aer_balance = get_balance(tx_sender, 'aergo', aergo_to)
+            if aer_balance < gas_limit * self.gas_price:
+                err = "not enough aer balance to pay tx fee"
+                raise InsufficientBalanceError(err)
+
+            if lock_proof is None:
+                lock_proof = build_lock_proof(
+                    aergo_from, aergo_to, receiver, bridge_from, bridge_to,
+                    lock_height, asset_address,
+                    self._proof_cache(from_chain), self._event_mux(to_chain),
+                    self._anchor_index(from_chain, to_chain)
+                )
+                logger.info("\u2699 Built lock proof")
+            token_pegged, tx_hash = mint(
+                aergo_to, receiver, lock_proof, asset_address, bridge_to,
+                gas_limit, self.gas_price
+            )
+            logger.info('\u26cf Mint success: %s', tx_hash)
+
+            # new balance on sidechain
             balance = get_balance(receiver, token_pegged, aergo_to)
             logger.info(
-                "\U0001f4b0 %s balance on destination before transfer : %s",
+                "\U0001f4b0 %s balance on destination after transfer : %s",
                 asset_name, balance / 10**18
             )
-        except KeyError:
-            logger.info("Pegged token unknow by wallet")
-            save_pegged_token_address = True
-
-        gas_limit = 300000
-        aer_balance = get_balance(tx_sender, 'aergo', aergo_to)
-        if aer_balance < gas_limit * self.gas_price:
-            err = "not enough aer balance to pay tx fee"
-            raise InsufficientBalanceError(err)
-
-        lock_proof = build_lock_proof(aergo_from, aergo_to, receiver,
-                                      bridge_from, bridge_to, lock_height,
-                                      asset_address)
-        logger.info("\u2699 Built lock proof")
-        token_pegged, tx_hash = mint(
-            aergo_to, receiver, lock_proof, asset_address, bridge_to,
-            gas_limit, self.gas_price
-        )
-        logger.info('\u26cf Mint success: %s', tx_hash)
-
-        # new balance on sidechain
-        balance = get_balance(receiver, token_pegged, aergo_to)
-        logger.info(
-            "\U0001f4b0 %s balance on destination after transfer : %s",
-            asset_name, balance / 10**18
-        )
-
-        aergo_from.disconnect()
-        aergo_to.disconnect()
+        finally:
+            self._pool.release(aergo_from)
+            self._pool.release(aergo_to)
 
         # record mint address in file
         if save_pegged_token_address:
@@ -660,39 +1090,42 @@ class AergoWallet:
         """
         logger.info(from_chain + ' -> ' + to_chain)
         aergo_from = self.get_aergo(from_chain, privkey_name, privkey_pwd)
-        sender = str(aergo_from.account.address)
-        if receiver is None:
-            receiver = sender
-        bridge_from = self.config_data(
-            'networks', from_chain, 'bridges', to_chain, 'addr')
-        token_pegged = self.config_data(
-            'networks', to_chain, 'tokens', asset_name, 'pegs', from_chain)
-        balance = get_balance(sender, token_pegged, aergo_from)
-        logger.info(
-            "\U0001f4b0 %s balance on sidechain before transfer: %s",
-            asset_name, balance / 10**18
-        )
-        if balance < amount:
-            raise InsufficientBalanceError("not enough balance")
-
-        gas_limit = 300000
-        aer_balance = get_balance(sender, 'aergo', aergo_from)
-        if aer_balance < gas_limit * self.gas_price:
-            err = "not enough aer balance to pay tx fee"
-            raise InsufficientBalanceError(err)
+        try:
+            sender = str(aergo_from.account.address)
+            if receiver is None:
+                receiver = sender
+            bridge_from = self.config_data(
+                'networks', from_chain, 'bridges', to_chain, 'addr')
+            token_pegged = self.config_data(
+                'networks', to_chain, 'tokens', asset_name, 'pegs', from_chain)
+            balance = get_balance(sender, token_pegged, aergo_from)
+            logger.info(
+                "\U0001f4b0 %s balance on sidechain before transfer: %s",
+                asset_name, balance / 10**18
+            )
+            if balance < amount:
+                raise InsufficientBalanceError("not enough balance")
 
-        burn_height, tx_hash = burn(aergo_from, bridge_from, receiver, amount,
-                                    token_pegged, gas_limit, self.gas_price)
-        logger.info('\U0001f525 Burn success: %s', tx_hash)
+            gas_limit = 300000
+            aer_balance = get_balance(sender, 'aergo', aergo_from)
+            if aer_balance < gas_limit * self.gas_price:
+                err = "not enough aer balance to pay tx fee"
+                raise InsufficientBalanceError(err)
 
-        # remaining balance on sidechain
-        balance = get_balance(sender, token_pegged, aergo_from)
-        logger.info(
-            "\U0001f4b0 remaining %s balance on sidechain after transfer: %s",
-            asset_name, balance / 10**18
-        )
+            burn_height, tx_hash = burn(aergo_from, bridge_from, receiver,
+                                        amount, token_pegged, gas_limit,
+                                        self.gas_price)
+            logger.info('\U0001f525 Burn success: %s', tx_hash)
 
-        aergo_from.disconnect()
+            # remaining balance on sidechain
+            balance = get_balance(sender, token_pegged, aergo_from)
+            logger.info(
+                "\U0001f4b0 remaining %s balance on sidechain after transfer:"
+                " %s",
+                asset_name, balance / 10**18
+            )
+        finally:
+            self._pool.release(aergo_from)
 
         return burn_height, tx_hash
 
@@ -704,7 +1137,8 @@ class AergoWallet:
         receiver: str = None,
         burn_height: int = 0,
         privkey_name: str = 'default',
-        privkey_pwd: str = None
+        privkey_pwd: str = None,
+        burn_proof=None,
     ) -> str:
         """
         Finalize a transfer of assets from a sidechain by unlocking then
@@ -713,51 +1147,218 @@ class AergoWallet:
         The amount to unlock is the difference between total burn and
         already unlocked amount.
         Bridge tempo is taken from config_data
+        burn_proof is built if not given.
         """
         logger.info(from_chain + ' -> ' + to_chain)
-        aergo_from = self._connect_aergo(from_chain)
-        aergo_to = self.get_aergo(to_chain, privkey_name, privkey_pwd)
-        tx_sender = str(aergo_to.account.address)
-        if receiver is None:
-            receiver = tx_sender
-        bridge_to = self.config_data(
-            'networks', to_chain, 'bridges', from_chain, 'addr')
-        bridge_from = self.config_data(
-            'networks', from_chain, 'bridges', to_chain, 'addr')
-        asset_address = self.config_data(
-            'networks', to_chain, 'tokens', asset_name, 'addr')
+        aergo_from, aergo_to = self._connect_withdrawal(
+            from_chain, to_chain, privkey_name, privkey_pwd)
+        try:
+            tx_sender = str(aergo_to.account.address)
+            if receiver is None:
+                receiver = tx_sender
+            bridge_to = self.config_data(
+                'networks', to_chain, 'bridges', from_chain, 'addr')
+            bridge_from = self.config_data(
+                'networks', from_chain, 'bridges', to_chain, 'addr')
+            asset_address = self.config_data(
+                'networks', to_chain, 'tokens', asset_name, 'addr')
 
-        burn_proof = build_burn_proof(aergo_from, aergo_to, receiver,
-                                      bridge_from, bridge_to, burn_height,
-                                      asset_address)
-        logger.info("\u2699 Built burn proof")
+            if burn_proof is None:
+                burn_proof = build_burn_proof(
+                    aergo_from, aergo_to, receiver, bridge_from, bridge_to,
+                    burn_height, asset_address,
+                    self._proof_cache(from_chain), self._event_mux(to_chain),
+                    self._anchor_index(from_chain, to_chain)
+                )
+                logger.info("\u2699 Built burn proof")
 
-        balance = get_balance(receiver, asset_address, aergo_to)
-        logger.info(
-            "\U0001f4b0 %s balance on destination before transfer: %s",
-            asset_name, balance / 10**18
-        )
+            balance = get_balance(receiver, asset_address, aergo_to)
+            logger.info(
+                "\U0001f4b0 %s balance on destination before transfer: %s",
+                asset_name, balance / 10**18
+            )
 
-        gas_limit = 300000
-        aer_balance = get_balance(tx_sender, 'aergo', aergo_to)
-        if aer_balance < gas_limit * self.gas_price:
-            err = "not enough aer balance to pay tx fee"
-            raise InsufficientBalanceError(err)
+            gas_limit = 300000
+            aer_balance = get_balance(tx_sender, 'aergo', aergo_to)
+            if aer_balance < gas_limit * self.gas_price:
+                err = "not enough aer balance to pay tx fee"
+                raise InsufficientBalanceError(err)
 
-        tx_hash = unlock(aergo_to, receiver, burn_proof, asset_address,
-                         bridge_to, gas_limit, self.gas_price)
-        logger.info('\U0001f513 Unlock success: %s', tx_hash)
+            tx_hash = unlock(aergo_to, receiver, burn_proof, asset_address,
+                             bridge_to, gas_limit, self.gas_price)
+            logger.info('\U0001f513 Unlock success: %s', tx_hash)
 
-        # new balance on origin
-        balance = get_balance(receiver, asset_address, aergo_to)
+            # new balance on origin
+            balance = get_balance(receiver, asset_address, aergo_to)
+            logger.info(
+                "\U0001f4b0 %s balance on destination after transfer: %s",
+                asset_name, balance / 10**18
+            )
+        finally:
+            self._pool.release(aergo_to)
+            self._pool.release(aergo_from)
+        return tx_hash
+
+    def _withdrawal_functions(
+        self,
+        from_chain: str,
+        to_chain: str,
+        transfers: List[Tuple[str, str, int]],
+    ) -> List[Tuple[str, str]]:
+        """ Get the (bridge function, token origin) of each transfer. """
+        withdrawals: List[Tuple[str, str]] = []
+        for asset_name, _, _ in transfers:
+            try:
+                token_origin = self.config_data(
+                    'networks', from_chain, 'tokens', asset_name, 'addr')
+                withdrawals.append(("mint", token_origin))
+                continue
+            except KeyError:
+                pass
+            try:
+                self.config_data(
+                    'networks', to_chain, 'tokens', asset_name, 'pegs',
+                    from_chain)
+                token_origin = self.config_data(
+                    'networks', to_chain, 'tokens', asset_name, 'addr')
+            except KeyError:
+                raise InvalidArgumentsError(
+                    "Asset {} not registered between {} and {}"
+                    .format(asset_name, from_chain, to_chain))
+            withdrawals.append(("unlock", token_origin))
+        return withdrawals
+
+    def build_withdrawal_proofs(
+        self,
+        from_chain: str,
+        to_chain: str,
+        transfers: List[Tuple[str, str, int]],
+    ) -> List[Optional[object]]:
+        """
+        Build the mint/unlock proofs of many (asset name, receiver, deposit
+        height) transfers from from_chain to to_chain against a single
+        anchor including the highest deposit height.
+        A proof is None when the receiver has nothing to withdraw.
+        """
+        if len(transfers) == 0:
+            return []
+        withdrawals = self._withdrawal_functions(
+            from_chain, to_chain, transfers)
+        bridge_from = self.config_data(
+            'networks', from_chain, 'bridges', to_chain, 'addr')
+        bridge_to = self.config_data(
+            'networks', to_chain, 'bridges', from_chain, 'addr')
+        deposit_height = max(height for _, _, height in transfers)
+        proofs: List[Optional[object]] = [None] * len(transfers)
+        aergo_from, aergo_to = self._connect_withdrawal(from_chain, to_chain)
+        try:
+            for func_name, build_proofs in [("mint", build_lock_proofs),
+                                            ("unlock", build_burn_proofs)]:
+                indexes = [i for i, (func, _) in enumerate(withdrawals)
+                           if func == func_name]
+                if len(indexes) == 0:
+                    continue
+                var_proofs = build_proofs(
+                    aergo_from, aergo_to,
+                    [(transfers[i][1], withdrawals[i][1]) for i in indexes],
+                    bridge_from, bridge_to, deposit_height,
+                    self._proof_cache(from_chain), self._event_mux(to_chain),
+                    self._anchor_index(from_chain, to_chain)
+                )
+                for i, proof in zip(indexes, var_proofs):
+                    proofs[i] = proof
+        finally:
+            self._pool.release(aergo_from)
+            self._pool.release(aergo_to)
+        logger.info("\u2699 Built %s deposit proofs",
+                    len([1 for proof in proofs if proof is not None]))
+        return proofs
+
+    def finalize_many(
+        self,
+        from_chain: str,
+        to_chain: str,
+        transfers: List[Tuple[str, str, int]],
+        privkey_name: str = 'default',
+        privkey_pwd: str = None,
+        proofs: List[Optional[object]] = None,
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Finalize many (asset name, receiver, deposit height) transfers
+        from from_chain to to_chain by minting native assets of from_chain
+        and unlocking assets pegged on from_chain.
+        The proofs are built with build_withdrawal_proofs if not given,
+        the mint/unlock txs are submitted together with consecutive nonces
+        and then waited for.
+        Returns a (tx hash, error) pair for each transfer, error is None
+        when the tx executed successfully.
+        """
+        if len(transfers) == 0:
+            return []
+        logger.info(from_chain + ' -> ' + to_chain)
+        bridge_to = self.config_data(
+            'networks', to_chain, 'bridges', from_chain, 'addr')
+        withdrawals = self._withdrawal_functions(
+            from_chain, to_chain, transfers)
+        if proofs is None:
+            proofs = self.build_withdrawal_proofs(
+                from_chain, to_chain, transfers)
+
+        aergo_to = self.get_aergo(to_chain, privkey_name, privkey_pwd)
+        try:
+            tx_sender = str(aergo_to.account.address)
+            gas_limit = 300000
+            aer_balance = get_balance(tx_sender, 'aergo', aergo_to)
+            if aer_balance < len(transfers) * gas_limit * self.gas_price:
+                err = "not enough aer balance to pay tx fees"
+                raise InsufficientBalanceError(err)
+
+            results: List[Tuple[Optional[str], Optional[str]]] = [
+                (None, NO_DEPOSIT_ERROR)
+            ] * len(transfers)
+            indexes = [i for i in range(len(transfers))
+                       if proofs[i] is not None]
+            calls = [
+                (bridge_to, withdrawals[i][0],
+                 withdraw_args(transfers[i][1], withdrawals[i][1], proofs[i]))
+                for i in indexes
+            ]
+            committed = send_sc_calls(aergo_to, calls, gas_limit,
+                                      self.gas_price)
+            new_pegs: Dict[str, str] = {}
+            for i, (tx_hash, err) in zip(indexes, committed):
+                if tx_hash is None:
+                    results[i] = (tx_hash, err)
+                    continue
+                result = aergo_to.wait_tx_result(tx_hash)
+                if result is None or \
+                        result.status != herapy.TxResultStatus.SUCCESS:
+                    results[i] = (tx_hash, "{} asset Tx execution failed : {}"
+                                  .format(withdrawals[i][0], result))
+                    continue
+                results[i] = (tx_hash, None)
+                if withdrawals[i][0] == "mint":
+                    new_pegs[transfers[i][0]] = json.loads(result.detail)[0]
+        finally:
+            self._pool.release(aergo_to)
         logger.info(
-            "\U0001f4b0 %s balance on destination after transfer: %s",
-            asset_name, balance / 10**18
+            "Finalized %s/%s transfers",
+            len([1 for _, err in results if err is None]), len(transfers)
         )
 
-        aergo_to.disconnect()
-        aergo_from.disconnect()
-        return tx_hash
+        # record mint addresses in file
+        pegs = self.config_data('networks', from_chain, 'tokens')
+        new_pegs = {asset_name: token_pegged
+                    for asset_name, token_pegged in new_pegs.items()
+                    if to_chain not in pegs[asset_name]['pegs']}
+        if len(new_pegs) > 0:
+            logger.info("------ Store mint address in config.json -----------")
+            for asset_name, token_pegged in new_pegs.items():
+                self.config_data(
+                    'networks', from_chain, 'tokens', asset_name, 'pegs',
+                    to_chain, value=token_pegged)
+            self.save_config()
+        return results
 
     def bridge_transfer(
         self,
@@ -1,15 +1,38 @@
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
 import json
-import time
 from typing import (
+    Dict,
+    List,
+    Optional,
     Tuple,
 )
 
 import aergo.herapy as herapy
 
+from aergo.herapy.obj.transaction import (
+    TxType,
+)
 from aergo.herapy.utils.encoding import (
     decode_b58_check,
 )
 
+from aergo_wallet.anchor_index import (
+    AnchorIndex,
+)
+from aergo_wallet.proof_cache import (
+    ProofCache,
+)
+from aergo_wallet.event_mux import (
+    EventMux,
+)
+from aergo_wallet.smt import (
+    verify_sc_state,
+)
+from aergo_wallet.finality import (
+    FinalityWaiter,
+)
 from aergo_wallet.exceptions import (
     InvalidArgumentsError,
     TxError,
@@ -21,6 +44,13 @@ logger = logging.getLogger(__name__)
 
 # Wallet utils are made to be used with a custom herapy provider
 
+# maximum number of storage keys queried in a single query_sc_state request
+QUERY_CHUNK_SIZE = 100
+# maximum number of txs committed in a single batch_tx request
+TX_BATCH_SIZE = 100
+# error of a withdrawal without deposit in the anchored state
+NO_DEPOSIT_ERROR = "No tokens deposited for this account reference"
+
 
 def get_balance(
     account_addr: str,
@@ -52,6 +82,91 @@ def get_balance(
     return int(balance)
 
 
+def query_sc_state_chunked(
+    aergo: herapy.Aergo,
+    sc_address: str,
+    storage_keys: List[str],
+    root: bytes = b'',
+    compressed: bool = True,
+    chunk_size: int = QUERY_CHUNK_SIZE,
+    verify: bool = False,
+    cache: ProofCache = None,
+) -> List:
+    """ Query many storage keys of a contract with as few query_sc_state
+    requests as possible and return the variable proofs in the order of
+    storage_keys.
+    If verify is True, every response is verified against root.
+    Proofs at an explicit root are taken from cache when given.
+    """
+    var_proofs: List = []
+    # verified trie nodes are shared by the chunks
+    verifiers: Dict = {}
+    for i in range(0, len(storage_keys), chunk_size):
+        if cache is None:
+            state = aergo.query_sc_state(
+                sc_address, storage_keys[i:i + chunk_size], root=root,
+                compressed=compressed
+            )
+        else:
+            state = cache.query_sc_state(
+                aergo, sc_address, storage_keys[i:i + chunk_size], root=root,
+                compressed=compressed
+            )
+        if verify and not verify_sc_state(root, state, verifiers):
+            raise InvalidMerkleProofError(
+                "Unable to verify proof of {}".format(sc_address))
+        if not state.account.state_proof.inclusion:
+            raise InvalidArgumentsError(
+                "Contract doesnt exist in state, check contract deployed and "
+                "chain synced {}".format(state))
+        var_proofs.extend(state.var_proofs)
+    return var_proofs
+
+
+def get_balances(
+    queries: List[Tuple[str, str]],
+    aergo: herapy.Aergo,
+    max_workers: int = 8,
+) -> List[int]:
+    """ Get the balances of many (account address, asset address) pairs on
+    the network of aergo and return them in the order of queries.
+    Token balances are grouped per contract and queried together, aer
+    balances are queried concurrently.
+    """
+    for account_addr, _ in queries:
+        if not is_aergo_address(account_addr):
+            raise InvalidArgumentsError(
+                "Account {} must be an Aergo address".format(account_addr)
+            )
+    # asset address -> accounts to query
+    accounts: Dict[str, List[str]] = {}
+    for account_addr, asset_addr in queries:
+        asset_accounts = accounts.setdefault(asset_addr, [])
+        if account_addr not in asset_accounts:
+            asset_accounts.append(account_addr)
+
+    balances: Dict[Tuple[str, str], int] = {}
+    aer_accounts = accounts.pop("aergo", [])
+    with ThreadPoolExecutor(max_workers) as executor:
+        aer_balances = executor.map(
+            lambda addr: aergo.get_account(address=addr).balance,
+            aer_accounts
+        )
+        for account_addr, balance in zip(aer_accounts, aer_balances):
+            balances[(account_addr, "aergo")] = int(balance)
+    for asset_addr, asset_accounts in accounts.items():
+        var_proofs = query_sc_state_chunked(
+            aergo, asset_addr,
+            ["_sv__balances-" + addr for addr in asset_accounts]
+        )
+        for account_addr, var_proof in zip(asset_accounts, var_proofs):
+            balance = 0
+            if var_proof.inclusion:
+                balance = json.loads(var_proof.value)['_bignum']
+            balances[(account_addr, asset_addr)] = int(balance)
+    return [balances[query] for query in queries]
+
+
 def transfer(
     value: int,
     to: str,
@@ -92,6 +207,102 @@ def transfer(
     return str(tx.tx_hash)
 
 
+def send_sc_calls(
+    aergo: herapy.Aergo,
+    calls: List[Tuple[str, str, List]],
+    gas_limit: int,
+    gas_price: int,
+    batch_size: int = TX_BATCH_SIZE,
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """ Sign many (contract address, function name, args) calls with
+    consecutive nonces and commit them in batches without waiting for
+    their execution.
+    Returns (tx hash, None) for committed txs and (None, error) for the
+    others. After a rejected tx the following batches are not submitted.
+    The txs of the same batch accepted by the node behind the rejected one
+    are committed: the nonce of the rejected tx is filled with an empty
+    transfer to the sender so that they are executed.
+    """
+    aergo.get_account()  # get the latest nonce for making tx
+    committed: List[Tuple[Optional[str], Optional[str]]] = []
+    nonce = aergo.account.nonce
+    for i in range(0, len(calls), batch_size):
+        txs = [
+            aergo.new_call_sc_tx(
+                sc_address, func_name, args=args, nonce=nonce + 1 + j,
+                gas_limit=gas_limit, gas_price=gas_price
+            )
+            for j, (sc_address, func_name, args)
+            in enumerate(calls[i:i + batch_size])
+        ]
+        _, results = aergo.batch_tx(txs)
+        rejected: List[int] = []
+        last_accepted = 0
+        for tx, result in zip(txs, results):
+            if result.status == herapy.CommitStatus.TX_OK:
+                committed.append((str(tx.tx_hash), None))
+                last_accepted = tx.nonce
+            else:
+                committed.append(
+                    (None, "Tx commit failed : {}".format(result)))
+                rejected.append(tx.nonce)
+        if len(rejected) > 0:
+            _fill_nonce_gaps(
+                aergo, [n for n in rejected if n < last_accepted],
+                gas_limit, gas_price
+            )
+            # herapy increased the account nonce for accepted txs only
+            aergo.account.nonce = max(aergo.account.nonce, last_accepted)
+            break
+        nonce += len(txs)
+    committed.extend(
+        [(None, "Not submitted after a rejected tx")]
+        * (len(calls) - len(committed))
+    )
+    return committed
+
+
+def _fill_nonce_gaps(
+    aergo: herapy.Aergo,
+    nonces: List[int],
+    gas_limit: int,
+    gas_price: int,
+) -> None:
+    """ Commit an empty transfer to the sender at each nonce left by a
+    rejected tx, the txs accepted behind it wait for that nonce in the
+    mempool.
+    """
+    if len(nonces) == 0:
+        return
+    sender = bytes(aergo.account.address)
+    txs = [
+        aergo.generate_tx(to_address=sender, nonce=nonce, amount=0,
+                          gas_limit=gas_limit, gas_price=gas_price,
+                          tx_type=TxType.TRANSFER)
+        for nonce in nonces
+    ]
+    _, results = aergo.batch_tx(txs)
+    for tx, result in zip(txs, results):
+        if result.status != herapy.CommitStatus.TX_OK:
+            logger.warning(
+                "Failed to fill nonce %s, the txs behind it wait in the "
+                "mempool: %s", tx.nonce, result)
+
+
+def withdraw_args(
+    receiver: str,
+    token_origin: str,
+    deposit_proof,
+) -> List:
+    """ Arguments of a bridge mint or unlock call given the variable proof
+    of the receiver's deposit.
+    """
+    ap = [node.hex() for node in deposit_proof.auditPath]
+    balance = deposit_proof.value.decode('utf-8')[1:-1]
+    ubig_balance = {'_bignum': str(balance)}
+    return [receiver, ubig_balance, token_origin, ap]
+
+
 def bridge_withdrawable_balance(
     account_addr: str,
     asset_address_origin: str,
@@ -101,73 +312,87 @@ def bridge_withdrawable_balance(
     aergo_to: herapy.Aergo,
     deposit_key: str,
     withdraw_key: str,
+    cache_from: ProofCache = None,
 ) -> Tuple[int, int]:
-    account_ref = account_addr + asset_address_origin
-    # total_deposit : total latest deposit including pending
-    _, block_height = aergo_from.get_blockchain_status()
-    block_from = aergo_from.get_block_headers(
-        block_height=block_height, list_size=1)
-    root_from = block_from[0].blocks_root_hash
-
-    deposit_proof = aergo_from.query_sc_state(
-        bridge_from, [deposit_key + account_ref],
-        root=root_from, compressed=False
-    )
-    if not deposit_proof.account.state_proof.inclusion:
-        raise InvalidArgumentsError(
-            "Contract doesnt exist in state, check contract deployed and "
-            "chain synced {}".format(deposit_proof))
-    total_deposit = 0
-    if deposit_proof.var_proofs[0].inclusion:
-        total_deposit = int(deposit_proof.var_proofs[0].value
-                            .decode('utf-8')[1:-1])
-
-    # get total withdrawn and last anchor height
-    withdraw_proof = aergo_to.query_sc_state(
-        bridge_to, ["_sv__anchorHeight", withdraw_key + account_ref],
-        compressed=False
-    )
-    if not withdraw_proof.account.state_proof.inclusion:
-        raise InvalidArgumentsError(
-            "Contract doesnt exist in state, check contract deployed and "
-            "chain synced {}".format(withdraw_proof))
-    if not withdraw_proof.var_proofs[0].inclusion:
-        raise InvalidArgumentsError("Cannot query last anchored height",
-                                    withdraw_proof)
-    total_withdrawn = 0
-    if withdraw_proof.var_proofs[1].inclusion:
-        total_withdrawn = int(withdraw_proof.var_proofs[1].value
-                              .decode('utf-8')[1:-1])
-    last_anchor_height = int(withdraw_proof.var_proofs[0].value)
-
-    # get anchored deposit : total deposit before the last anchor
-    block_from = aergo_from.get_block_headers(
-        block_height=last_anchor_height, list_size=1)
-    root_from = block_from[0].blocks_root_hash
-    deposit_proof = aergo_from.query_sc_state(
-        bridge_from, [deposit_key + account_ref],
-        root=root_from, compressed=False
-    )
-    if not deposit_proof.account.state_proof.inclusion:
-        raise InvalidArgumentsError(
-            "Contract doesnt exist in state, check contract deployed and "
-            "chain synced {}".format(deposit_proof))
-    anchored_deposit = 0
-    if deposit_proof.var_proofs[0].inclusion:
-        anchored_deposit = int(deposit_proof.var_proofs[0].value
-                               .decode('utf-8')[1:-1])
-    withdrawable_balance = anchored_deposit - total_withdrawn
-    pending = total_deposit - anchored_deposit
-    return withdrawable_balance, pending
+    return bridge_withdrawable_balances(
+        [(account_addr, asset_address_origin)], bridge_from, bridge_to,
+        aergo_from, aergo_to, deposit_key, withdraw_key, cache_from
+    )[0]
+
+
+def bridge_withdrawable_balances(
+    queries: List[Tuple[str, str]],
+    bridge_from: str,
+    bridge_to: str,
+    aergo_from: herapy.Aergo,
+    aergo_to: herapy.Aergo,
+    deposit_key: str,
+    withdraw_key: str,
+    cache_from: ProofCache = None,
+) -> List[Tuple[int, int]]:
+    """ Get the (withdrawable, pending) balances of many (account address,
+    asset address on origin) pairs, in the order of queries.
+    The total deposits at the latest state are queried while the withdrawn
+    amounts and anchored deposits are queried on the other side.
+    Anchored deposits don't change so they are taken from cache_from
+    (the cache of the aergo_from chain) when given.
+    """
+    account_refs = [account_addr + asset_address_origin
+                    for account_addr, asset_address_origin in queries]
+    deposit_keys = [deposit_key + ref for ref in account_refs]
+    with ThreadPoolExecutor(1) as executor:
+        # total_deposit : total latest deposit including pending
+        total_deposits_future = executor.submit(
+            query_sc_state_chunked, aergo_from, bridge_from, deposit_keys)
+
+        # get total withdrawn and last anchor height
+        withdraw_proofs = query_sc_state_chunked(
+            aergo_to, bridge_to,
+            ["_sv__anchorHeight"] + [withdraw_key + ref
+                                     for ref in account_refs]
+        )
+        if not withdraw_proofs[0].inclusion:
+            raise InvalidArgumentsError("Cannot query last anchored height",
+                                        withdraw_proofs[0])
+        last_anchor_height = int(withdraw_proofs[0].value)
+
+        # get anchored deposit : total deposit before the last anchor
+        root_from = get_block_root(aergo_from, last_anchor_height,
+                                   cache_from)
+        anchored_deposits = query_sc_state_chunked(
+            aergo_from, bridge_from, deposit_keys, root=root_from,
+            cache=cache_from)
+        total_deposits = total_deposits_future.result()
+
+    balances = []
+    for total_deposit, total_withdrawn, anchored_deposit in zip(
+        total_deposits, withdraw_proofs[1:], anchored_deposits
+    ):
+        total_deposit = _bridge_balance(total_deposit)
+        total_withdrawn = _bridge_balance(total_withdrawn)
+        anchored_deposit = _bridge_balance(anchored_deposit)
+        withdrawable_balance = anchored_deposit - total_withdrawn
+        pending = total_deposit - anchored_deposit
+        balances.append((withdrawable_balance, pending))
+    return balances
+
+
+def _bridge_balance(var_proof) -> int:
+    """ Parse a bridge storage value ("\"<amount>\"") to int."""
+    if not var_proof.inclusion:
+        return 0
+    return int(var_proof.value.decode('utf-8')[1:-1])
 
 
 def wait_finalization(
-    aergo: herapy.Aergo
-) -> None:
-    status = aergo.get_status()
-    lib = status.consensus_info.status['LibNo']
-    height = status.best_block_height
-    time.sleep(height - lib)
+    aergo: herapy.Aergo,
+    height: int = None,
+    timeout: float = None,
+) -> int:
+    """ Wait until height (the current best block by default) is at or
+    below the last irreversible block and return the LIB.
+    """
+    return FinalityWaiter(aergo).wait(height, timeout)
 
 
 def build_deposit_proof(
@@ -178,7 +403,10 @@ def build_deposit_proof(
     bridge_to: str,
     deposit_height: int,
     token_origin: str,
-    key_word: str
+    key_word: str,
+    cache_from: ProofCache = None,
+    events_to: EventMux = None,
+    anchors_to: AnchorIndex = None,
 ) -> herapy.obj.sc_state.SCState:
     """ Check the last anchored root includes the lock and build
     a lock proof for that root
@@ -187,7 +415,105 @@ def build_deposit_proof(
         raise InvalidArgumentsError(
             "Receiver {} must be an Aergo address".format(receiver)
         )
-    # check last merged height
+    last_merged_height_to = wait_anchor(aergo_to, bridge_to, deposit_height,
+                                        events_to)
+    # get inclusion proof of lock in last merged block
+    root_from = get_anchored_root(aergo_from, last_merged_height_to,
+                                  cache_from, anchors_to)
+    account_ref = receiver + token_origin
+    if cache_from is None:
+        proof = aergo_from.query_sc_state(
+            bridge_from, [key_word + account_ref],
+            root=root_from, compressed=False
+        )
+    else:
+        proof = cache_from.query_sc_state(
+            aergo_from, bridge_from, [key_word + account_ref],
+            root=root_from, compressed=False
+        )
+    if not verify_sc_state(root_from, proof):
+        raise InvalidMerkleProofError("Unable to verify {} proof"
+                                      .format(key_word))
+    if not proof.account.state_proof.inclusion:
+        raise InvalidMerkleProofError(
+            "Contract doesnt exist in state, check contract deployed and "
+            "chain synced {}".format(proof))
+    if not proof.var_proofs[0].inclusion:
+        raise InvalidMerkleProofError(
+            "{}: {}".format(NO_DEPOSIT_ERROR, proof))
+    return proof
+
+
+def build_deposit_proofs(
+    aergo_from: herapy.Aergo,
+    aergo_to: herapy.Aergo,
+    account_refs: List[Tuple[str, str]],
+    bridge_from: str,
+    bridge_to: str,
+    deposit_height: int,
+    key_word: str,
+    cache_from: ProofCache = None,
+    events_to: EventMux = None,
+    anchors_to: AnchorIndex = None,
+) -> List:
+    """ Wait for an anchor including deposit_height (the highest deposit
+    height) and build the deposit proofs of many (receiver, token_origin)
+    pairs against that single anchored root.
+    Returns the verified variable proofs in the order of account_refs, or
+    None for a pair that has no deposit.
+    """
+    for receiver, _ in account_refs:
+        if not is_aergo_address(receiver):
+            raise InvalidArgumentsError(
+                "Receiver {} must be an Aergo address".format(receiver)
+            )
+    last_merged_height_to = wait_anchor(aergo_to, bridge_to, deposit_height,
+                                        events_to)
+    root_from = get_anchored_root(aergo_from, last_merged_height_to,
+                                  cache_from, anchors_to)
+    var_proofs = query_sc_state_chunked(
+        aergo_from, bridge_from,
+        [key_word + receiver + token_origin
+         for receiver, token_origin in account_refs],
+        root=root_from, compressed=False, verify=True, cache=cache_from
+    )
+    return [var_proof if var_proof.inclusion else None
+            for var_proof in var_proofs]
+
+
+def get_block_root(
+    aergo: herapy.Aergo,
+    height: int,
+    cache: ProofCache = None,
+) -> bytes:
+    """ Return the blocks state root of a finalized height."""
+    if cache is not None:
+        return cache.block_root(aergo, height)
+    block = aergo.get_block_headers(block_height=height, list_size=1)
+    return block[0].blocks_root_hash
+
+
+def get_anchored_root(
+    aergo_from: herapy.Aergo,
+    height: int,
+    cache_from: ProofCache = None,
+    anchors_to: AnchorIndex = None,
+) -> bytes:
+    """ Return the root of aergo_from anchored at height, from the anchor
+    index when it has recorded that anchor.
+    """
+    if anchors_to is not None:
+        root = anchors_to.root_at(height)
+        if root is not None:
+            return root
+    return get_block_root(aergo_from, height, cache_from)
+
+
+def get_anchor_height(
+    aergo_to: herapy.Aergo,
+    bridge_to: str,
+) -> int:
+    """ Return the last height of the other chain anchored on bridge_to."""
     anchor_info = aergo_to.query_sc_state(bridge_to, ["_sv__anchorHeight"])
     if not anchor_info.account.state_proof.inclusion:
         raise InvalidArgumentsError(
@@ -196,41 +522,53 @@ def build_deposit_proof(
     if not anchor_info.var_proofs[0].inclusion:
         raise InvalidArgumentsError("Cannot query last anchored height",
                                     anchor_info)
-    last_merged_height_to = int(anchor_info.var_proofs[0].value)
+    return int(anchor_info.var_proofs[0].value)
+
+
+def wait_anchor(
+    aergo_to: herapy.Aergo,
+    bridge_to: str,
+    min_height: int,
+    events_to: EventMux = None,
+) -> int:
+    """ Wait until bridge_to has anchored a block of at least min_height
+    and return the last anchored height.
+    With events_to, the newAnchor stream is shared with the other waiters.
+    """
+    if events_to is not None:
+        # subscribe before checking the anchored height so no anchor is
+        # missed
+        with events_to.subscribe(bridge_to, "newAnchor") as anchors:
+            last_merged_height_to = get_anchor_height(aergo_to, bridge_to)
+            while last_merged_height_to < min_height:
+                logger.info(
+                    "deposit not recorded in current anchor, waiting new "
+                    "anchor event... / deposit height : %s / last anchor "
+                    "height : %s ", min_height, last_merged_height_to
+                )
+                last_merged_height_to = max(
+                    last_merged_height_to, anchors.get().arguments[1])
+        return last_merged_height_to
+    # check last merged height
+    last_merged_height_to = get_anchor_height(aergo_to, bridge_to)
+    if last_merged_height_to >= min_height:
+        return last_merged_height_to
     _, current_height = aergo_to.get_blockchain_status()
     # waite for anchor containing our transfer
     stream = aergo_to.receive_event_stream(bridge_to, "newAnchor",
                                            start_block_no=current_height)
-    while last_merged_height_to < deposit_height:
-        logger.info(
-            "deposit not recorded in current anchor, waiting new anchor "
-            "event... / deposit height : %s / last anchor height : %s ",
-            deposit_height, last_merged_height_to
-        )
-        new_anchor_event = next(stream)
-        last_merged_height_to = new_anchor_event.arguments[1]
-    stream.stop()
-    # get inclusion proof of lock in last merged block
-    merge_block_from = aergo_from.get_block_headers(
-        block_height=last_merged_height_to, list_size=1)
-    root_from = merge_block_from[0].blocks_root_hash
-    account_ref = receiver + token_origin
-    proof = aergo_from.query_sc_state(
-        bridge_from, [key_word + account_ref],
-        root=root_from, compressed=False
-    )
-    if not proof.verify_proof(root_from):
-        raise InvalidMerkleProofError("Unable to verify {} proof"
-                                      .format(key_word))
-    if not proof.account.state_proof.inclusion:
-        raise InvalidMerkleProofError(
-            "Contract doesnt exist in state, check contract deployed and "
-            "chain synced {}".format(proof))
-    if not proof.var_proofs[0].inclusion:
-        raise InvalidMerkleProofError(
-            "No tokens deposited for this account reference: {}"
-            .format(proof))
-    return proof
+    try:
+        while last_merged_height_to < min_height:
+            logger.info(
+                "deposit not recorded in current anchor, waiting new anchor "
+                "event... / deposit height : %s / last anchor height : %s ",
+                min_height, last_merged_height_to
+            )
+            new_anchor_event = next(stream)
+            last_merged_height_to = new_anchor_event.arguments[1]
+    finally:
+        stream.cancel()
+    return last_merged_height_to
 
 
 def is_aergo_address(address: str):
@@ -0,0 +1,58 @@
+import threading
+import time
+from types import (
+    SimpleNamespace,
+)
+
+from aergo_bridge_operator.op_utils import (
+    StateReader,
+)
+
+
+class _Node:
+    """ Aergo client answering query_sc_state after delay seconds."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.queries = []
+
+    def query_sc_state(self, contract, storage_keys, root=b''):
+        self.queries.append(list(storage_keys))
+        time.sleep(self.delay)
+        return SimpleNamespace(
+            account=SimpleNamespace(
+                state_proof=SimpleNamespace(inclusion=False)),
+            var_proofs=[key + "_value" for key in storage_keys]
+        )
+
+
+def test_single_read_not_delayed():
+    reader = StateReader(_Node(), window=1)
+    start = time.monotonic()
+    values, _ = reader.read("contract", ["a", "b"])
+    assert time.monotonic() - start < 0.5
+    assert values == ["a_value", "b_value"]
+
+
+def test_concurrent_reads_coalesced():
+    node = _Node(delay=0.2)
+    reader = StateReader(node, window=0.1)
+    results = {}
+
+    def read(keys):
+        results[keys[0]] = reader.read("contract", keys)[0]
+
+    # the first read is in flight when the others start, they are
+    # collected in one batch
+    threads = [threading.Thread(target=read, args=(["a"],))]
+    threads[0].start()
+    time.sleep(0.05)
+    for keys in [["b"], ["c", "b"]]:
+        t = threading.Thread(target=read, args=(keys,))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    assert node.queries == [["a"], ["b", "c"]]
+    assert results == {"a": ["a_value"], "b": ["b_value"],
+                       "c": ["c_value", "b_value"]}
@@ -0,0 +1,117 @@
+import aergo.herapy as herapy
+import pytest
+
+from aergo_wallet.anchor_index import (
+    AnchorIndex,
+)
+from aergo_wallet.wallet_utils import (
+    get_block_root,
+)
+
+from test_simulator import (  # noqa: F401
+    _anchor,
+    sides,
+)
+
+
+def _root(height):
+    return height.to_bytes(32, 'big')
+
+
+def test_append_many(tmp_path):
+    path = str(tmp_path / "anchors.idx")
+    index = AnchorIndex(path, writable=True)
+    reader = AnchorIndex(path)
+    try:
+        assert index.last() is None
+        assert reader.last() is None
+        # anchors not higher than the last one are ignored
+        assert index.append_many([
+            (10, _root(10), 12, b"\x01" * 32),
+            (20, _root(20), 22, b"\x02" * 32),
+            (15, _root(15), 23, b"\x03" * 32),
+            (20, _root(21), 24, b"\x04" * 32),
+            (30, _root(30), 32, b"\x05" * 32),
+        ]) == 3
+        assert not index.append(30, _root(30), 33, b"\x06" * 32)
+        assert index.append(40, _root(40), 42, b"\x07" * 32)
+
+        # the reader remaps the file when it grows
+        assert len(reader) == 4
+        assert reader.last() == (40, _root(40), 42, b"\x07" * 32)
+        assert reader.find(20) == (20, _root(20), 22, b"\x02" * 32)
+        assert reader.find(25) is None
+        assert reader.root_at(30) == _root(30)
+        assert reader.root_at(35) is None
+        assert reader.covering(5)[0] == 10
+        assert reader.covering(10)[0] == 10
+        assert reader.covering(11)[0] == 20
+        assert reader.covering(41) is None
+        assert [a[0] for a in reader.anchors(15, 30)] == [20, 30]
+        assert [a[0] for a in reader.anchors()] == [10, 20, 30, 40]
+        with pytest.raises(ValueError):
+            reader.append(50, _root(50), 52, b"\x08" * 32)
+
+        # a record still being written is ignored by readers
+        with open(path, "ab") as f:
+            f.write(b"\x00" * 10)
+        assert len(reader) == 4
+        assert reader.last()[0] == 40
+    finally:
+        reader.close()
+        index.close()
+    # and dropped when the index is reopened for writing
+    index = AnchorIndex(path, writable=True)
+    try:
+        assert index.append(50, _root(50), 52, b"\x08" * 32)
+        assert [a[0] for a in index.anchors()] == [10, 20, 30, 40, 50]
+    finally:
+        index.close()
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "anchors.idx"
+    path.write_bytes(b"not an anchor index file")
+    with pytest.raises(ValueError):
+        AnchorIndex(str(path))
+
+
+def test_oracle_anchors(sides, tmp_path):  # noqa: F811
+    side1, side2 = sides
+    path = str(tmp_path / "anchors.idx")
+    index = AnchorIndex(path, writable=True)
+    reader = AnchorIndex(path)
+    try:
+        heights = []
+        for _ in range(3):
+            height, result = _anchor(side2, side1)
+            assert result.status == herapy.TxResultStatus.SUCCESS, \
+                result.detail
+            heights.append(height)
+        _, best_height = side2.aergo.get_blockchain_status()
+        assert index.backfill(side2.aergo, side2.oracle, best_height) == 3
+        assert index.backfill(side2.aergo, side2.oracle, best_height) == 0
+
+        assert len(reader) == 3
+        assert reader.last()[0] == heights[-1]
+        for height in heights:
+            assert reader.root_at(height) == \
+                get_block_root(side1.aergo, height)
+            assert reader.find(height)[2] <= best_height
+        assert reader.find(heights[0] + 1) is None
+        assert reader.covering(heights[0] - 1)[0] == heights[0]
+        assert reader.covering(heights[0] + 1)[0] == heights[1]
+        assert reader.covering(heights[-1] + 1) is None
+
+        # anchors received from the oracle events are appended
+        height, _ = _anchor(side2, side1)
+        events = side2.aergo.get_events(
+            side2.oracle, "newAnchor", start_block_no=best_height + 1)
+        assert index.append_events(events) == 1
+        assert reader.last()[0] == height
+        assert reader.root_at(height) == get_block_root(side1.aergo, height)
+        assert [a[0] for a in reader.anchors(heights[1])] == \
+            heights[1:] + [height]
+    finally:
+        reader.close()
+        index.close()
@@ -0,0 +1,89 @@
+import time
+
+import aergo.herapy as herapy
+import pytest
+
+from aergo_wallet.event_mux import (
+    EventMux,
+)
+
+from test_simulator import (  # noqa: F401
+    _call,
+    sides,
+)
+
+
+def _transfer(side, receiver, amount):
+    result = _call(side.aergo, side.token, "transfer", receiver,
+                   {"_bignum": str(amount)})
+    assert result.status == herapy.TxResultStatus.SUCCESS, result.detail
+
+
+def _amounts(subscription, count):
+    return [int(subscription.get(timeout=5).arguments[2]['_bignum'])
+            for _ in range(count)]
+
+
+def _wait(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def mux(sides):  # noqa: F811
+    side1, _ = sides
+    mux = EventMux(side1.aergo, retry_delay=0.2)
+    yield mux
+    mux.close()
+
+
+def test_fan_out(sides, mux):  # noqa: F811
+    side1, side2 = sides
+    with mux.subscribe(side1.token, "transfer") as first, \
+            mux.subscribe(side1.token, "transfer") as second, \
+            mux.subscribe(side1.token, "approve") as other:
+        # one stream per contract and event name
+        assert len(mux._feeds) == 2
+        _transfer(side1, side2.address, 1)
+        _transfer(side1, side2.address, 2)
+        assert _amounts(first, 2) == [1, 2]
+        assert _amounts(second, 2) == [1, 2]
+        with pytest.raises(TimeoutError):
+            other.get(timeout=0.1)
+    # closed subscriptions stop receiving events
+    _transfer(side1, side2.address, 3)
+    with pytest.raises(TimeoutError):
+        first.get(timeout=0.1)
+
+
+def test_drop_oldest(sides, mux):  # noqa: F811
+    side1, side2 = sides
+    with mux.subscribe(side1.token, "transfer", max_queue=2) as slow, \
+            mux.subscribe(side1.token, "transfer") as fast:
+        for amount in [1, 2, 3, 4]:
+            _transfer(side1, side2.address, amount)
+        # a slow subscriber doesn't block the others
+        assert _amounts(fast, 4) == [1, 2, 3, 4]
+        _wait(lambda: slow.dropped == 2)
+        assert _amounts(slow, 2) == [3, 4]
+
+
+def test_resume_without_duplicates(sides, mux):  # noqa: F811
+    side1, side2 = sides
+    with mux.subscribe(side1.token, "transfer") as events:
+        _transfer(side1, side2.address, 1)
+        assert _amounts(events, 1) == [1]
+        # interrupt the node stream, the event emitted meanwhile is
+        # received after reconnecting from the block of the last event
+        for stream in list(side1.chain._event_streams):
+            stream.cancel()
+        _transfer(side1, side2.address, 2)
+        assert _amounts(events, 1) == [2]
+        _wait(lambda: len(side1.chain._event_streams) == 1)
+        _transfer(side1, side2.address, 3)
+        assert _amounts(events, 1) == [3]
+        with pytest.raises(TimeoutError):
+            events.get(timeout=0.3)
+        assert events.dropped == 0
@@ -0,0 +1,84 @@
+import queue
+import threading
+from types import (
+    SimpleNamespace,
+)
+
+from aergo.herapy.grpc import (
+    blockchain_pb2,
+    rpc_pb2,
+)
+from aergo.herapy.obj.block_stream import (
+    BlockStream,
+)
+
+from aergo_wallet.finality import (
+    FinalityWaiter,
+)
+
+
+class _GrpcStream:
+    """ Server stream of block metadata fed by the test."""
+
+    def __init__(self):
+        self.blocks = queue.Queue()
+        self._cancelled = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        block = self.blocks.get()
+        if block is None:
+            raise StopIteration
+        return block
+
+    def cancel(self):
+        self._cancelled = True
+        self.blocks.put(None)
+
+    def cancelled(self):
+        return self._cancelled
+
+
+class _Node:
+    """ Aergo client of a node producing blocks with a LIB 2 blocks behind.
+    """
+
+    def __init__(self):
+        self.height = 10
+        self.streams = []
+
+    def get_status(self):
+        return SimpleNamespace(
+            best_block_height=self.height,
+            consensus_info=SimpleNamespace(
+                status={'LibNo': self.height - 2}),
+        )
+
+    def receive_block_meta_stream(self):
+        # same as herapy 2.0.1
+        stream = _GrpcStream()
+        self.streams.append(stream)
+        return BlockStream(stream)
+
+    def new_block(self):
+        self.height += 1
+        header = blockchain_pb2.BlockHeader(blockNo=self.height)
+        for stream in self.streams:
+            stream.blocks.put(rpc_pb2.BlockMetadata(
+                hash=bytes(32), header=header, txcount=0))
+
+
+def test_wait_finality():
+    node = _Node()
+    waiter = FinalityWaiter(node)
+    assert waiter.wait(8, timeout=1) == 8
+
+    def produce():
+        for _ in range(3):
+            node.new_block()
+    threading.Timer(0.1, produce).start()
+    # the LIB is refreshed by the block metadata stream
+    assert waiter.wait(11, timeout=2) == 11
+    assert node.streams[0].cancelled()
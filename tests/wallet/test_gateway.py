@@ -0,0 +1,163 @@
+import json
+import time
+import urllib.request
+
+import aergo.herapy as herapy
+import pytest
+
+from aergo_wallet.gateway import (
+    BridgeGateway,
+)
+from aergo_wallet.transfer_to_sidechain import (
+    build_lock_proof,
+    lock,
+    mint,
+)
+from aergo_wallet.wallet import (
+    AergoWallet,
+)
+from aergo_wallet.wallet_utils import (
+    get_anchor_height,
+)
+
+from test_simulator import (  # noqa: F401
+    T_ANCHOR,
+    T_FINAL,
+    _anchor,
+    _call,
+    _sign,
+    sides,
+)
+
+
+@pytest.fixture
+def gateway(sides):  # noqa: F811
+    side1, side2 = sides
+    networks = {}
+    for name, side, other in [("mainnet", side1, "sidechain"),
+                              ("sidechain", side2, "mainnet")]:
+        networks[name] = {
+            "ip": side.chain.serve(),
+            "bridges": {other: {"addr": side.bridge, "oracle": side.oracle,
+                                "t_anchor": T_ANCHOR, "t_final": T_FINAL}},
+            "tokens": {},
+        }
+    networks["mainnet"]["tokens"]["token1"] = {"addr": side1.token,
+                                               "pegs": {}}
+    wallet = AergoWallet(None, {"networks": networks, "wallet": {}})
+    gateway = BridgeGateway(wallet, "mainnet", "sidechain", 0, "localhost")
+    # the status and balances are read at an anchored state
+    _anchor(side2, side1)
+    _anchor(side1, side2)
+    yield gateway
+    if len(gateway._threads) > 0:
+        gateway.stop()
+    gateway.httpd.server_close()
+    wallet.close()
+    side1.chain.stop()
+    side2.chain.stop()
+
+
+def _wait_invalidated(gateway, key):
+    deadline = time.monotonic() + 5
+    while key in gateway._cache:
+        assert time.monotonic() < deadline, key
+        time.sleep(0.01)
+
+
+def test_handle(sides, gateway):  # noqa: F811
+    side1, side2 = sides
+    status, response = gateway.handle("/status/mainnet/sidechain")
+    assert status == 200
+    assert response["anchor_height"] == \
+        get_anchor_height(side2.aergo, side2.bridge)
+    assert response["t_anchor"] == T_ANCHOR
+    assert response["t_final"] == T_FINAL
+    assert response["validators"] == [str(v.address)
+                                      for v in side2.validators]
+    # query strings are ignored
+    assert gateway.handle("/status/mainnet/sidechain?a=1") == \
+        (200, response)
+
+    path = "/balance/mainnet/sidechain/{}/token1".format(side2.address)
+    assert gateway.handle(path) == \
+        (200, {"withdrawable": "0", "pending": "0"})
+
+    status, _ = gateway.handle("/status/mainnet/mainnet")
+    assert status == 400
+    status, _ = gateway.handle("/status/other/sidechain")
+    assert status == 400
+    status, _ = gateway.handle(
+        "/balance/mainnet/sidechain/{}/token2".format(side2.address))
+    assert status == 400
+    status, _ = gateway.handle("/status/mainnet")
+    assert status == 404
+    status, _ = gateway.handle("/transfers")
+    assert status == 404
+
+
+def test_invalidation(sides, gateway):  # noqa: F811
+    side1, side2 = sides
+    gateway.start()
+    host, port = gateway.httpd.server_address[:2]
+    with urllib.request.urlopen(
+            "http://{}:{}/status/mainnet/sidechain".format(host, port)) as r:
+        assert r.status == 200
+        anchor_height = json.loads(r.read())["anchor_height"]
+    status_key = ("status", "mainnet", "sidechain")
+    assert status_key in gateway._cache
+    path = "/balance/mainnet/sidechain/{}/token1".format(side2.address)
+    balance_key = ("balance", "mainnet", "sidechain", side2.address,
+                   "token1")
+    gateway.handle(path)
+    assert balance_key in gateway._cache
+
+    # a deposit invalidates the balances of its receiver
+    lock_height, _ = lock(side1.aergo, side1.bridge, side2.address, 5,
+                          side1.token, 0, 0)
+    _wait_invalidated(gateway, balance_key)
+    assert status_key in gateway._cache
+    assert gateway.handle(path) == \
+        (200, {"withdrawable": "0", "pending": "5"})
+
+    # an anchor invalidates the status and balances of its direction
+    other_key = ("status", "sidechain", "mainnet")
+    gateway.handle("/status/sidechain/mainnet")
+    height, _ = _anchor(side2, side1)
+    _wait_invalidated(gateway, status_key)
+    _wait_invalidated(gateway, balance_key)
+    assert other_key in gateway._cache
+    _, response = gateway.handle("/status/mainnet/sidechain")
+    assert response["anchor_height"] == height > anchor_height
+    assert gateway.handle(path) == \
+        (200, {"withdrawable": "5", "pending": "0"})
+
+    # a withdrawal invalidates the balances of its receiver
+    lock_proof = build_lock_proof(
+        side1.aergo, side2.aergo, side2.address, side1.bridge, side2.bridge,
+        lock_height, side1.token)
+    mint(side2.aergo, side2.address, lock_proof, side1.token, side2.bridge,
+         0, 0)
+    _wait_invalidated(gateway, balance_key)
+    assert gateway.handle(path) == \
+        (200, {"withdrawable": "0", "pending": "0"})
+
+    # a settings update invalidates the status
+    gateway.handle("/status/mainnet/sidechain")
+    indexes, sigs = _sign(side2, "10", "A")
+    result = _call(side2.aergo, side2.oracle, "tAnchorUpdate", 10, indexes,
+                   sigs)
+    assert result.status == herapy.TxResultStatus.SUCCESS, result.detail
+    _wait_invalidated(gateway, status_key)
+    assert other_key in gateway._cache
+    _, response = gateway.handle("/status/mainnet/sidechain")
+    assert response["t_anchor"] == 10
+
+    # after dropped events anything could have changed
+    gateway.handle(path)
+    for subscription in gateway._subscriptions:
+        subscription.dropped += 1
+    lock(side1.aergo, side1.bridge, side1.address, 1, side1.token, 0, 0)
+    _wait_invalidated(gateway, balance_key)
+    _wait_invalidated(gateway, status_key)
+    _wait_invalidated(gateway, other_key)
@@ -0,0 +1,101 @@
+import pytest
+
+from aergo_wallet.exceptions import (
+    InvalidArgumentsError,
+)
+from aergo_wallet.indexer import (
+    BridgeIndexer,
+)
+from aergo_wallet.transfer_from_sidechain import (
+    build_burn_proof,
+    burn,
+    unlock,
+)
+from aergo_wallet.transfer_to_sidechain import (
+    build_lock_proof,
+    lock,
+    mint,
+)
+from aergo_wallet.wallet import (
+    AergoWallet,
+)
+
+from test_simulator import (  # noqa: F401
+    _anchor,
+    sides,
+)
+
+
+@pytest.fixture
+def indexer(sides, tmp_path):  # noqa: F811
+    side1, side2 = sides
+    config = {
+        "networks": {
+            "mainnet": {"bridges": {"sidechain": {"addr": side1.bridge}}},
+            "sidechain": {"bridges": {"mainnet": {"addr": side2.bridge}}},
+        }
+    }
+    wallet = AergoWallet(None, config)
+    indexer = BridgeIndexer(wallet, str(tmp_path / "bridge_index.db"),
+                            "mainnet", "sidechain")
+    yield indexer
+    indexer.close()
+    wallet.close()
+
+
+def _backfill(indexer, network, side):
+    _, best_height = side.aergo.get_blockchain_status()
+    indexer.backfill(network, side.aergo, best_height)
+
+
+def test_backfill_balances(sides, indexer):  # noqa: F811
+    side1, side2 = sides
+    amount = 10**18
+    lock_height, _ = lock(side1.aergo, side1.bridge, side2.address, amount,
+                          side1.token, 0, 0)
+    _backfill(indexer, "mainnet", side1)
+    _backfill(indexer, "sidechain", side2)
+    assert indexer.balances("mainnet", "sidechain") == {
+        (side2.address, side1.token): (0, amount)}
+
+    _anchor(side2, side1)
+    lock(side1.aergo, side1.bridge, side2.address, 2, side1.token, 0, 0)
+    _backfill(indexer, "sidechain", side2)
+    # the anchored deposits of mainnet are not all indexed yet
+    with pytest.raises(InvalidArgumentsError):
+        indexer.balances("mainnet", "sidechain")
+    _backfill(indexer, "mainnet", side1)
+    assert indexer.balance("mainnet", "sidechain", side2.address,
+                           side1.token) == (amount, 2)
+
+    lock_proof = build_lock_proof(
+        side1.aergo, side2.aergo, side2.address, side1.bridge, side2.bridge,
+        lock_height, side1.token)
+    token_pegged, _ = mint(side2.aergo, side2.address, lock_proof,
+                           side1.token, side2.bridge, 0, 0)
+    _backfill(indexer, "sidechain", side2)
+    assert indexer.balance("mainnet", "sidechain", side2.address,
+                           side1.token) == (0, 2)
+
+    burn_height, _ = burn(side2.aergo, side2.bridge, side1.address, amount,
+                          token_pegged, 0, 0)
+    _backfill(indexer, "sidechain", side2)
+    # burns are indexed with the origin of the pegged token
+    assert indexer.balances("sidechain", "mainnet") == {
+        (side1.address, side1.token): (0, amount)}
+
+    _anchor(side1, side2)
+    _backfill(indexer, "mainnet", side1)
+    _backfill(indexer, "sidechain", side2)
+    assert indexer.balance("sidechain", "mainnet", side1.address,
+                           side1.token) == (amount, 0)
+
+    burn_proof = build_burn_proof(
+        side2.aergo, side1.aergo, side1.address, side2.bridge, side1.bridge,
+        burn_height, side1.token)
+    unlock(side1.aergo, side1.address, burn_proof, side1.token,
+           side1.bridge, 0, 0)
+    _backfill(indexer, "mainnet", side1)
+    assert indexer.balances("sidechain", "mainnet") == {}
+    assert indexer.balances("mainnet", "sidechain") == {
+        (side2.address, side1.token): (0, 2)}
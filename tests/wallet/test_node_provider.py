@@ -0,0 +1,103 @@
+import time
+
+from aergo.herapy.errors.exception import (
+    CommunicationException,
+)
+import pytest
+
+from aergo_wallet.metrics import (
+    MetricsRegistry,
+)
+from aergo_wallet.node_provider import (
+    NodeProvider,
+)
+
+
+class _Node:
+    """ Aergo client of a node answering after delay seconds, or failing
+    while down.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.down = False
+        self.account = None
+        self.reads = 0
+        self.sent = []
+
+    def _check(self):
+        if self.down:
+            raise CommunicationException("node down")
+
+    def connect(self, target):
+        self._check()
+
+    def disconnect(self):
+        pass
+
+    def get_blockchain_status(self):
+        self.reads += 1
+        time.sleep(self.delay)
+        self._check()
+        return self, 10
+
+    def send_tx(self, tx):
+        self._check()
+        self.sent.append((tx, self.account))
+        return tx
+
+
+def _provider(*nodes, **kwargs):
+    provider = NodeProvider(
+        "mainnet", ["node{}".format(i) for i in range(len(nodes))],
+        MetricsRegistry(), **kwargs
+    )
+    for endpoint, node in zip(provider._endpoints, nodes):
+        endpoint.aergo = node
+    provider.connect()
+    return provider
+
+
+def test_hedged_read():
+    slow, fast = _Node(delay=1), _Node()
+    provider = _provider(slow, fast, hedge_after=0.05)
+    # the slow node measured faster is asked first
+    provider._endpoints[0].latency = 0.001
+    provider._endpoints[1].latency = 0.01
+    start = time.monotonic()
+    node, _ = provider.get_blockchain_status()
+    assert node is fast
+    assert time.monotonic() - start < 0.5
+    assert slow.reads == 1
+
+
+def test_read_failover():
+    failing, healthy = _Node(), _Node()
+    provider = _provider(failing, healthy, retry_after=60)
+    failing.down = True
+    node, _ = provider.get_blockchain_status()
+    assert node is healthy
+    assert failing.reads == 1
+    # the failed node is asked last until retry_after
+    node, _ = provider.get_blockchain_status()
+    assert node is healthy
+    assert failing.reads == 1
+
+
+def test_write_failover():
+    primary, other = _Node(), _Node()
+    provider = _provider(primary, other)
+    provider.account = "account"
+    assert provider.send_tx("tx1") == "tx1"
+    primary.down = True
+    # the submission is retried on the next node with the account
+    assert provider.send_tx("tx2") == "tx2"
+    assert primary.sent == [("tx1", "account")]
+    assert other.sent == [("tx2", "account")]
+    assert provider.account == "account"
+    assert provider.send_tx("tx3") == "tx3"
+    assert other.sent[-1] == ("tx3", "account")
+    # no node left
+    other.down = True
+    with pytest.raises(CommunicationException):
+        provider.send_tx("tx4")
@@ -0,0 +1,268 @@
+import hashlib
+
+import aergo.herapy as herapy
+from aergo.herapy.obj.transaction import (
+    TxType,
+)
+from aergo.herapy.utils.encoding import (
+    decode_address,
+)
+import pytest
+
+from aergo_bridge_operator.op_utils import (
+    query_tempo,
+    query_validators,
+)
+from aergo_wallet.exceptions import (
+    TxError,
+)
+from aergo_wallet.simulator import (
+    MAX_TX_SIZE,
+    read_bytecode,
+    simulated_networks,
+)
+from aergo_wallet.transfer_from_sidechain import (
+    build_burn_proof,
+    burn,
+    unlock,
+)
+from aergo_wallet.transfer_to_sidechain import (
+    build_lock_proof,
+    lock,
+    mint,
+)
+from aergo_wallet.wallet_utils import (
+    get_balance,
+    get_block_root,
+    send_sc_calls,
+)
+
+T_ANCHOR = 3
+T_FINAL = 0
+SUPPLY = 500 * 10**18
+
+
+def _deploy(aergo, code_file, args):
+    payload = read_bytecode("contracts/" + code_file)
+    tx, _ = aergo.deploy_sc(amount=0, payload=payload, args=args)
+    result = aergo.wait_tx_result(tx.tx_hash)
+    assert result.status == herapy.TxResultStatus.CREATED, result.detail
+    return result.contract_address
+
+
+def _call(aergo, contract, function, *args):
+    tx, _ = aergo.call_sc(contract, function, args=args)
+    return aergo.wait_tx_result(tx.tx_hash)
+
+
+class _Side:
+    def __init__(self, chain, validators):
+        self.chain = chain
+        self.aergo = herapy.Aergo()
+        self.aergo.new_account()
+        chain.connect(self.aergo)
+        chain.fund(str(self.aergo.account.address), SUPPLY)
+        self.aergo.get_account()
+        self.address = str(self.aergo.account.address)
+        self.validators = validators
+        self.bridge = _deploy(self.aergo, "bridge_bytecode.txt",
+                              [T_ANCHOR, T_FINAL])
+
+
+def _connect_bridges(side1, side2):
+    for side, other in [(side1, side2), (side2, side1)]:
+        bridge_trie_key = "0x" + hashlib.sha256(
+            decode_address(other.bridge)).digest().hex()
+        side.oracle = _deploy(
+            side.aergo, "oracle_bytecode.txt",
+            [[str(v.address) for v in side.validators], side.bridge,
+             bridge_trie_key, T_ANCHOR, T_FINAL]
+        )
+        result = _call(side.aergo, side.bridge, "oracleUpdate", side.oracle)
+        assert result.status == herapy.TxResultStatus.SUCCESS, result.detail
+
+
+def _sign(side, data, kind, signers=None):
+    """ Sign data with the validators of the side oracle like the
+    validators sign the proposer messages.
+    """
+    aergo = side.aergo
+    nonce = int(aergo.query_sc_state(
+        side.oracle, ["_sv__nonce"]).var_proofs[0].value)
+    contract_id = aergo.query_sc_state(
+        side.oracle, ["_sv__contractId"]).var_proofs[0].value[1:-1]
+    msg = data + str(nonce) + contract_id.decode('utf-8') + kind
+    h = hashlib.sha256(msg.encode('utf-8')).digest()
+    if signers is None:
+        signers = side.validators[:2]
+    indexes = [side.validators.index(v) + 1 for v in signers]
+    sigs = ["0x" + v.private_key.sign_msg(h).hex() for v in signers]
+    return indexes, sigs
+
+
+def _anchor(side_to, side_from, signers=None):
+    """ Anchor the current state of side_from on side_to like the proposer
+    and validators.
+    """
+    aergo_from = side_from.aergo
+    side_from.chain.mine(T_ANCHOR + 1)
+    _, height = aergo_from.get_blockchain_status()
+    root = get_block_root(aergo_from, height)
+    indexes, sigs = _sign(
+        side_to, "{},{}".format(root.hex(), height), "R", signers)
+    state = aergo_from.get_account(address=side_from.bridge, proof=True,
+                                   root=root, compressed=False)
+    proto = "0x" + state.state_proof.state.SerializeToString().hex()
+    ap = [node.hex() for node in state.state_proof.auditPath]
+    return height, _call(side_to.aergo, side_to.oracle,
+                         "newStateAndBridgeAnchor", "0x" + root.hex(),
+                         height, indexes, sigs, proto, ap)
+
+
+@pytest.fixture
+def sides():
+    chains = simulated_networks('mainnet', 'sidechain')
+    validators = []
+    for _ in range(3):
+        validators.append(herapy.Account())
+    side1 = _Side(chains['mainnet'], validators)
+    side2 = _Side(chains['sidechain'], validators)
+    _connect_bridges(side1, side2)
+    side1.token = _deploy(side1.aergo, "token_bytecode.txt",
+                          [{"_bignum": str(SUPPLY)}, side1.address])
+    return side1, side2
+
+
+def test_bridge_transfer(sides):
+    side1, side2 = sides
+    amount = 10**18
+    lock_height, _ = lock(side1.aergo, side1.bridge, side2.address, amount,
+                          side1.token, 0, 0)
+    _, result = _anchor(side2, side1)
+    assert result.status == herapy.TxResultStatus.SUCCESS, result.detail
+
+    lock_proof = build_lock_proof(
+        side1.aergo, side2.aergo, side2.address, side1.bridge, side2.bridge,
+        lock_height, side1.token)
+    token_pegged, _ = mint(side2.aergo, side2.address, lock_proof,
+                           side1.token, side2.bridge, 0, 0)
+    assert get_balance(side2.address, token_pegged, side2.aergo) == amount
+    # a deposit is withdrawn once
+    with pytest.raises(TxError):
+        mint(side2.aergo, side2.address, lock_proof, side1.token,
+             side2.bridge, 0, 0)
+
+    burn_height, _ = burn(side2.aergo, side2.bridge, side1.address, amount,
+                          token_pegged, 0, 0)
+    _, result = _anchor(side1, side2)
+    assert result.status == herapy.TxResultStatus.SUCCESS, result.detail
+    burn_proof = build_burn_proof(
+        side2.aergo, side1.aergo, side1.address, side2.bridge, side1.bridge,
+        burn_height, side1.token)
+    unlock(side1.aergo, side1.address, burn_proof, side1.token,
+           side1.bridge, 0, 0)
+    assert get_balance(side1.address, side1.token, side1.aergo) == SUPPLY
+    assert get_balance(side2.address, token_pegged, side2.aergo) == 0
+
+
+def test_anchor_checks(sides):
+    side1, side2 = sides
+    height, result = _anchor(side2, side1, side2.validators[:1])
+    assert result.status == herapy.TxResultStatus.ERROR
+    assert "2/3 validators must sign" in result.detail
+    _, result = _anchor(side2, side1, side2.validators[1:])
+    assert result.status == herapy.TxResultStatus.SUCCESS, result.detail
+    # the next anchor must be t_anchor blocks later
+    side1.chain.mine(T_ANCHOR + 1)
+    _, best = side1.aergo.get_blockchain_status()
+    root = get_block_root(side1.aergo, best)
+    result = _call(side2.aergo, side2.oracle, "newStateAnchor",
+                   "0x" + root.hex(), height + 1, [1, 2], ["0x00", "0x00"])
+    assert result.status == herapy.TxResultStatus.ERROR
+    assert "Next anchor height not reached" in result.detail
+
+
+def test_settings(sides):
+    side1, _ = sides
+    assert query_tempo(side1.aergo, side1.bridge, ["_sv__tAnchor"]) == \
+        [T_ANCHOR]
+    assert query_validators(side1.aergo, side1.oracle) == \
+        [str(v.address) for v in side1.validators]
+    indexes, sigs = _sign(side1, "10", "A", side1.validators[:1])
+    result = _call(side1.aergo, side1.oracle, "tAnchorUpdate", 10, indexes,
+                   sigs)
+    assert result.status == herapy.TxResultStatus.ERROR
+    indexes, sigs = _sign(side1, "10", "A")
+    result = _call(side1.aergo, side1.oracle, "tAnchorUpdate", 10, indexes,
+                   sigs)
+    assert result.status == herapy.TxResultStatus.SUCCESS, result.detail
+    assert query_tempo(side1.aergo, side1.bridge, ["_sv__tAnchor"]) == [10]
+    # signatures are valid for one nonce
+    result = _call(side1.aergo, side1.oracle, "tAnchorUpdate", 10, indexes,
+                   sigs)
+    assert result.status == herapy.TxResultStatus.ERROR
+
+
+def test_pending_spend():
+    chain = simulated_networks('mainnet')['mainnet']
+    aergo = herapy.Aergo()
+    aergo.new_account()
+    chain.connect(aergo)
+    chain.fund(str(aergo.account.address), 10)
+    aergo.get_account()
+    receiver = herapy.Account().address
+    nonce = aergo.account.nonce
+    txs = [
+        aergo.generate_tx(to_address=bytes(receiver), nonce=nonce + i + 1,
+                          amount=6, tx_type=TxType.TRANSFER)
+        for i in range(2)
+    ]
+    # the balance covers each tx but not both
+    _, results = aergo.batch_tx(txs)
+    assert results[0].status == herapy.CommitStatus.TX_OK
+    assert results[1].status == herapy.CommitStatus.TX_INSUFFICIENT_BALANCE
+    assert get_balance(str(receiver), 'aergo', aergo) == 6
+
+
+def test_send_sc_calls_after_rejection(sides):
+    side1, _ = sides
+    aergo = side1.aergo
+    receiver = str(herapy.Account().address)
+    call = (side1.token, "transfer", [receiver, {"_bignum": "1"}])
+    too_large = (side1.token, "transfer",
+                 [receiver, {"_bignum": "1"}, "0" * MAX_TX_SIZE])
+    committed = send_sc_calls(aergo, [call, too_large, call, call, call],
+                              0, 0, batch_size=4)
+    assert committed[1][0] is None
+    assert "size of tx exceeds max length" in committed[1][1]
+    # the txs accepted by the node behind the rejected nonce are committed
+    # and executed, the next batch is not submitted
+    assert committed[4] == (None, "Not submitted after a rejected tx")
+    for tx_hash, err in committed[:1] + committed[2:4]:
+        assert err is None
+        result = aergo.wait_tx_result(tx_hash)
+        assert result.status == herapy.TxResultStatus.SUCCESS
+    assert get_balance(receiver, side1.token, aergo) == 3
+    # the calls not submitted can be sent again with the next nonces
+    committed = send_sc_calls(aergo, [call], 0, 0)
+    result = aergo.wait_tx_result(committed[0][0])
+    assert result.status == herapy.TxResultStatus.SUCCESS
+    assert get_balance(receiver, side1.token, aergo) == 4
+
+
+def test_served_chain():
+    chain = simulated_networks('mainnet')['mainnet']
+    target = chain.serve()
+    try:
+        aergo = herapy.Aergo()
+        aergo.new_account()
+        aergo.connect(target)
+        chain.fund(str(aergo.account.address), SUPPLY)
+        aergo.get_account()
+        token = _deploy(aergo, "token_bytecode.txt",
+                        [{"_bignum": str(SUPPLY)}, str(aergo.account.address)])
+        assert get_balance(str(aergo.account.address), token, aergo) == \
+            SUPPLY
+        aergo.disconnect()
+    finally:
+        chain.stop()
@@ -0,0 +1,160 @@
+import hashlib
+
+from aergo.herapy.utils import merkle_proof as mp
+
+from aergo_wallet.smt import (
+    DEFAULT_NODE,
+    BatchVerifier,
+    SparseMerkleTrie,
+    audit_path,
+    bit_is_set,
+    compress,
+    leaf_hash,
+    verify_deposit_proof,
+    verify_inclusion,
+)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).digest()
+
+
+def _trie(leaves, depth=0):
+    """ Root of an aergo sparse merkle trie of {trie key: value hash} where
+    a subtree with a single leaf is a shortcut to that leaf.
+    """
+    if len(leaves) == 0:
+        return DEFAULT_NODE
+    if len(leaves) == 1:
+        (key, value), = leaves.items()
+        return leaf_hash(key, value, depth)
+    left = {k: v for k, v in leaves.items() if not bit_is_set(k, depth)}
+    right = {k: v for k, v in leaves.items() if bit_is_set(k, depth)}
+    return _sha256(_trie(left, depth + 1) + _trie(right, depth + 1))
+
+
+def _proof(leaves, key):
+    """ Uncompressed audit path of key, the top sibling is last."""
+    ap = []
+    depth = 0
+    while len(leaves) > 1:
+        left = {k: v for k, v in leaves.items() if not bit_is_set(k, depth)}
+        right = {k: v for k, v in leaves.items() if bit_is_set(k, depth)}
+        if bit_is_set(key, depth):
+            ap.insert(0, _trie(left, depth + 1))
+            leaves = right
+        else:
+            ap.insert(0, _trie(right, depth + 1))
+            leaves = left
+        depth += 1
+    return ap
+
+
+def _compress(ap):
+    height = len(ap)
+    bitmap = bytearray((height + 7) // 8)
+    nodes = []
+    for i, node in enumerate(ap):
+        if node != DEFAULT_NODE:
+            bitmap[i // 8] |= 1 << (7 - i % 8)
+            nodes.append(node)
+    return nodes, bytes(bitmap), height
+
+
+def _deposits(count):
+    values = {}
+    for i in range(count):
+        storage_key = "_sv__locks-AmReceiver{}Token".format(i)
+        values[storage_key] = '"{}"'.format(i * 10**18)
+    leaves = {_sha256(k.encode('latin-1')): _sha256(v.encode('latin-1'))
+              for k, v in values.items()}
+    return values, leaves
+
+
+def test_verify_inclusion_matches_herapy():
+    values, leaves = _deposits(50)
+    root = _trie(leaves)
+    for storage_key, value in values.items():
+        trie_key = _sha256(storage_key.encode('latin-1'))
+        ap = _proof(leaves, trie_key)
+        assert mp.verify_inclusion(ap, root, trie_key,
+                                   _sha256(value.encode('latin-1')))
+        assert verify_inclusion(root, trie_key, value.encode('latin-1'), ap)
+        assert not verify_inclusion(root, trie_key, b'"1"', ap)
+
+
+def test_verify_inclusion_single_leaf():
+    """ A trie with one key is the leaf itself, hashed with height
+    byte(256) = 0 like in aergo.
+    """
+    values, leaves = _deposits(1)
+    (storage_key, value), = values.items()
+    trie_key = _sha256(storage_key.encode('latin-1'))
+    root = _sha256(trie_key + leaves[trie_key] + bytes([0]))
+    assert _trie(leaves) == root
+    assert verify_inclusion(root, trie_key, value.encode('latin-1'), [])
+    assert verify_deposit_proof(root, "_locks", "AmReceiver0Token", value, [])
+
+
+def test_verify_deposit_proof_hex_audit_path():
+    values, leaves = _deposits(10)
+    root = _trie(leaves)
+    trie_key = _sha256(b"_sv__locks-AmReceiver3Token")
+    ap = [node.hex() for node in _proof(leaves, trie_key)]
+    value = values["_sv__locks-AmReceiver3Token"]
+    assert verify_deposit_proof(root, "_locks", "AmReceiver3Token", value, ap)
+    assert not verify_deposit_proof(root, "_locks", "AmReceiver4Token", value,
+                                    ap)
+
+
+def test_compressed_audit_path():
+    _, leaves = _deposits(20)
+    for trie_key in leaves:
+        ap = _proof(leaves, trie_key)
+        assert audit_path(*_compress(ap)) == ap
+
+
+def test_batch_verifier():
+    _, leaves = _deposits(100)
+    root = _trie(leaves)
+    verifier = BatchVerifier(root)
+    for _ in range(2):
+        for trie_key, value_hash in leaves.items():
+            ap = _proof(leaves, trie_key)
+            leaf = leaf_hash(trie_key, value_hash, len(ap))
+            assert verifier.verify(trie_key, leaf, ap)
+    # a wrong leaf on a known path is rejected
+    trie_key, value_hash = next(iter(leaves.items()))
+    ap = _proof(leaves, trie_key)
+    leaf = leaf_hash(trie_key, _sha256(b'"7"'), len(ap))
+    assert not verifier.verify(trie_key, leaf, ap)
+    # a verified subtree can't be used at another position
+    other_key = bytes([trie_key[0] ^ 0x80]) + trie_key[1:]
+    leaf = leaf_hash(trie_key, value_hash, len(ap))
+    assert not verifier.verify(other_key, leaf, ap)
+
+
+def test_sparse_merkle_trie():
+    values, leaves = _deposits(60)
+    trie = SparseMerkleTrie().update(
+        {_sha256(k.encode('latin-1')): v.encode('latin-1')
+         for k, v in values.items()})
+    assert trie.root == _trie(leaves)
+    for trie_key in leaves:
+        leaf, ap = trie.prove(trie_key)
+        assert leaf.key == trie_key
+        assert ap == _proof(leaves, trie_key)
+        assert compress(ap) == _compress(ap)[:2]
+    # updates and deletes return a new trie, the old one is unchanged
+    deleted = list(leaves)[:30]
+    updated = trie.update({key: None for key in deleted})
+    remaining = {k: v for k, v in leaves.items() if k not in deleted}
+    assert updated.root == _trie(remaining)
+    assert trie.root == _trie(leaves)
+    assert updated.get(deleted[0]) is None
+    # exclusion proof of a deleted key
+    leaf, ap = updated.prove(deleted[0])
+    assert mp.verify_exclusion(updated.root, ap, deleted[0], leaf.key,
+                               leaf.value_hash)
+    assert SparseMerkleTrie().root == b''
+    assert updated.update({key: None for key in remaining}).root == b''
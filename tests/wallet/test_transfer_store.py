@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from aergo_wallet.transfer_store import (
+    ANCHORED,
+    FAILED,
+    FINALIZED,
+    INITIATED,
+    TransferStore,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TransferStore(str(tmp_path / "transfers.db"))
+    yield store
+    store.close()
+
+
+def test_import_json(tmp_path, store):
+    json_path = str(tmp_path / "pending_transfers.json")
+    pending = {
+        "1": ["mainnet", "sidechain2", "token1", "AmReceiver1", 12],
+        "2": ["sidechain2", "mainnet", "token1", "AmReceiver2", 7],
+    }
+    with open(json_path, "w") as f:
+        json.dump(pending, f)
+    assert store.import_json(json_path) == 2
+    transfers = store.pending()
+    assert [(t['from_chain'], t['to_chain'], t['asset_name'], t['receiver'],
+             t['deposit_height']) for t in transfers] == [
+        ("sidechain2", "mainnet", "token1", "AmReceiver2", 7),
+        ("mainnet", "sidechain2", "token1", "AmReceiver1", 12),
+    ]
+    assert all(t['status'] == INITIATED for t in transfers)
+    assert all(t['amount'] is None for t in transfers)
+    # the file is imported once even if the cli writes it again
+    assert store.import_json(json_path) == 0
+    assert len(store.pending()) == 2
+    # the import is recorded in the database
+    store.close()
+    reopened = TransferStore(store.path)
+    try:
+        assert reopened.import_json(json_path) == 0
+        assert reopened.import_json(str(tmp_path / "missing.json")) == 0
+    finally:
+        reopened.close()
+
+
+def test_status_changes(store):
+    first, second, other = store.add_many([
+        ("mainnet", "sidechain2", "token1", "AmReceiver1", 10, 5, "tx1"),
+        ("mainnet", "sidechain2", "token1", "AmReceiver1", 20, 6, "tx2"),
+        ("mainnet", "sidechain2", "token1", "AmReceiver2", 10, 7, "tx3"),
+    ])
+    reverse = store.add("sidechain2", "mainnet", "token1", "AmReceiver1", 10)
+    assert store.get(first)['amount'] == "5"
+
+    # deposits are anchored up to the anchor height in one direction
+    assert store.mark_anchored("mainnet", "sidechain2", 15) == 2
+    assert store.get(first)['status'] == ANCHORED
+    assert store.get(other)['status'] == ANCHORED
+    assert store.get(second)['status'] == INITIATED
+    assert store.get(reverse)['status'] == INITIATED
+    assert store.mark_anchored("mainnet", "sidechain2", 15) == 0
+    assert [t['id'] for t in store.pending(status=(ANCHORED,))] == \
+        [first, other]
+
+    # a withdrawal finalizes the pending deposits of its receiver
+    assert store.mark_finalized("mainnet", "sidechain2", "token1",
+                                "AmReceiver1", 20, "mint_tx") == 2
+    for transfer_id in [first, second]:
+        transfer = store.get(transfer_id)
+        assert transfer['status'] == FINALIZED
+        assert transfer['finalize_tx'] == "mint_tx"
+    assert store.get(other)['status'] == ANCHORED
+    assert store.get(reverse)['status'] == INITIATED
+    # finalized deposits are not finalized again
+    assert store.mark_finalized("mainnet", "sidechain2", "token1",
+                                "AmReceiver1", 20, "mint_tx2") == 0
+
+    store.mark_failed(other, "mint asset Tx execution failed")
+    transfer = store.get(other)
+    assert transfer['status'] == FAILED
+    assert transfer['error'] == "mint asset Tx execution failed"
+    assert [t['id'] for t in store.pending()] == [reverse]
+    assert [t['id'] for t in store.pending(receiver="AmReceiver2")] == []
+
+    store.remove(reverse)
+    with pytest.raises(KeyError):
+        store.get(reverse)
+    assert store.pending() == []